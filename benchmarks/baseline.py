@@ -0,0 +1,70 @@
+"""
+Helpers for the benchmarks which compare their results with a JSON baseline.
+
+A baseline stores the measurements of a benchmark by name, together with the Python version and the platform they
+were taken on. The measurements are compared only on the same kind of machine, so a new baseline has to be recorded
+(`--update-baseline`) when the benchmark is moved to another one or after an intended change.
+"""
+import json
+import platform
+import sys
+from pathlib import Path
+
+BASELINES_DIR = Path(__file__).parent / 'baselines'
+
+
+def load_baseline(path: Path) -> dict:
+    """
+    Returns:
+        dict: The measurements of the baseline by name, empty if there is no baseline yet or if it was recorded
+              with another Python version or on another platform.
+    """
+    if not path.exists():
+        return {}
+    baseline = json.loads(path.read_text())
+    recorded_on = (baseline.get('python'), baseline.get('platform'))
+    running_on = (platform.python_version(), sys.platform)
+    if recorded_on != running_on:
+        print(f'Comparison with the baseline {path} skipped, it was recorded with Python {recorded_on[0]} on '
+              f'{recorded_on[1]}, not with Python {running_on[0]} on {running_on[1]}')
+        return {}
+    return baseline['results']
+
+
+def write_baseline(path: Path, results: dict):
+    """
+    Writes the measurements as the new baseline.
+
+    Args:
+        path (Path): The JSON file of the baseline.
+        results (dict): The measurements by name.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {'python': platform.python_version(), 'platform': sys.platform, 'results': results}
+    path.write_text(json.dumps(baseline, indent=2) + '\n')
+    print(f'Baseline written to {path}')
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> [str]:
+    """
+    Compares measurements in which lower is better (e.g. times) with the baseline.
+
+    Args:
+        results (dict): The measurements by name.
+        baseline (dict): The measurements of the baseline by name.
+        tolerance (float): The allowed increase, e.g. 0.25 for 25%.
+
+    Returns:
+        list[str]: The measurements which are higher than the baseline by more than the tolerance.
+    """
+    return [f'{name}: {value:.1f} > {baseline[name]:.1f} + {tolerance:.0%}' for name, value in results.items()
+            if baseline.get(name) is not None and value > baseline[name] * (1 + tolerance)]
+
+
+def format_row(name: str, value: float, unit: str, baseline: dict) -> str:
+    """
+    Returns:
+        str: A line of the results with the baseline value, if there is one.
+    """
+    reference = baseline.get(name)
+    return f'{name:<45} {value:10.1f} {unit}' + (f' (baseline {reference:.1f})' if reference is not None else '')
@@ -0,0 +1,74 @@
+"""
+Benchmark of the compression of the API responses: the same image search is sent to the local stub with every
+`Accept-Encoding` policy, and the bytes of the response bodies on the wire and once decoded, the compression ratio
+and the time spent decompressing them are reported per request, as measured by the request timings of the client.
+
+The stub runs on the loopback interface, where transferring the bytes costs next to nothing, so the time a policy
+would save on a real link is estimated from the saved bytes and the `--link-mbps` bandwidth and weighed against
+its decompression time.
+
+Usage:
+    python -m benchmarks.bench_compression [--number 500] [--limit 25] [--link-mbps 10]
+"""
+import argparse
+import logging
+import time
+
+from interfaces.the_cat_api_client import TheCatAPIClient
+from utils.capture import CapturePolicy
+from utils.stub_server import TheCatAPIStub
+from utils.timing import TimingCollector
+
+API_KEY = 'benchmark-key'
+POLICIES = ('identity', 'gzip', 'deflate')
+WARMUP_CALLS = 20
+
+
+def run_policy(base_url: str, accept_encoding: str, number: int, limit: int) -> tuple:
+    """
+    Returns:
+        tuple: The aggregated `EndpointTimings` of the searches and the wall time of a call in microseconds.
+    """
+    client = TheCatAPIClient(base_url, API_KEY, CapturePolicy('off'))
+    client.accept_encoding = accept_encoding
+    collector = TimingCollector()
+    for _ in range(WARMUP_CALLS):
+        client.images_search(params={'limit': limit}).json()
+    client.timing_hooks.append(collector)
+    start = time.perf_counter()
+    for _ in range(number):
+        client.images_search(params={'limit': limit}).json()
+    elapsed = time.perf_counter() - start
+    client.session.close()
+    return collector.take()['GET /images/search'], elapsed / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=500, help='number of searches per policy')
+    parser.add_argument('--limit', type=int, default=25, help='number of images per search')
+    parser.add_argument('--link-mbps', type=float, default=10.0,
+                        help='bandwidth in Mbit/s of the link the saved transfer time is estimated for')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+    stub = TheCatAPIStub().start()
+    try:
+        results = {policy: run_policy(stub.base_url, policy, args.number, args.limit) for policy in POLICIES}
+    finally:
+        stub.stop()
+
+    identity_bytes = results['identity'][0].body_bytes / args.number
+    print(f'{"policy":<10} {"wire B":>9} {"decoded B":>10} {"ratio":>7} {"decode us":>10} {"us/call":>9} '
+          f'{"net saved us @ " + format(args.link_mbps, "g") + " Mbit/s":>26}')
+    for policy, (timings, per_call) in results.items():
+        wire = timings.body_bytes / args.number
+        decoded = timings.decoded_bytes / args.number
+        decode_us = timings.decode / args.number * 1e6
+        saved_us = (identity_bytes - wire) * 8 / args.link_mbps
+        print(f'{policy:<10} {wire:9.0f} {decoded:10.0f} {decoded / wire:6.1f}x {decode_us:10.1f} {per_call:9.1f} '
+              f'{saved_us - decode_us:26.1f}')
+
+
+if __name__ == '__main__':
+    main()
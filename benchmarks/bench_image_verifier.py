@@ -0,0 +1,52 @@
+"""
+Benchmark of the image file verification: a page of 25 images of the local stub is verified sequentially and
+concurrently, with the peak memory traced by `tracemalloc`. The concurrent verification should take about as long
+as a single download, while the peak memory stays about the same for small and large images.
+
+Usage:
+    python -m benchmarks.bench_image_verifier [--latency 0.2] [--images 25]
+"""
+import argparse
+import time
+import tracemalloc
+
+from utils.image_verifier import ImageVerifier
+from utils.stub_server import TheCatAPIStub
+
+
+def run(verifier: ImageVerifier, images: list) -> tuple:
+    """
+    Returns:
+        tuple: The wall time in seconds, the peak of traced memory in bytes and the number of invalid images.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = verifier.verify(images)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, sum(not result.ok for result in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.2, help='delay of every stub response in seconds')
+    parser.add_argument('--images', type=int, default=25, help='number of verified images')
+    args = parser.parse_args()
+
+    stub = TheCatAPIStub(latency=args.latency).start()
+    try:
+        images = stub.images[:args.images]
+        total_size = sum(image['width'] * image['height'] // 16 for image in images)
+        print(f'{len(images)} images, about {total_size / 1e6:.1f} MB in total, {args.latency}s latency')
+        for name, concurrency in (('sequential', 1), ('concurrent', len(images))):
+            verifier = ImageVerifier(concurrency)
+            elapsed, peak, invalid = run(verifier, images)
+            verifier.close()
+            print(f'{name:<12} {elapsed:8.2f} s {peak / 1e6:8.2f} MB peak {invalid:4} invalid')
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark of the per-request overhead of the framework: the same image search is sent to the local stub by a raw
+`requests.Session`, by a bare `APIClient` and by `TheCatAPIClient` (an Allure step, attachments and logs) with
+Allure off and on. The difference to the raw session is the time spent in the framework.
+
+"Allure on" registers an in-memory listener which receives every step and attachment like the Allure reporter
+does, so the cost of rendering them is measured without the disk I/O of writing the results.
+
+The microseconds per call are compared with a baseline, the benchmark fails (exit status 1) if a case is slower
+than the baseline by more than the tolerance. Record a new baseline with `--update-baseline`.
+
+Usage:
+    python -m benchmarks.bench_overhead [--number 1000] [--repeat 3] [--tolerance 0.25] [--update-baseline]
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import allure_commons
+import requests
+
+from benchmarks.baseline import BASELINES_DIR, format_row, load_baseline, regressions, write_baseline
+from interfaces.api_client import APIClient
+from interfaces.the_cat_api_client import TheCatAPIClient
+from utils.capture import CapturePolicy
+from utils.stub_server import TheCatAPIStub
+
+API_KEY = 'benchmark-key'
+WARMUP_CALLS = 50
+
+
+class MemoryAllureListener:
+    """
+    An Allure listener which keeps the steps and attachments of the benchmark in memory.
+    """
+
+    def __init__(self):
+        self.steps = 0
+        self.attached_bytes = 0
+
+    @allure_commons.hookimpl
+    def start_step(self, uuid, title, params):
+        self.steps += 1
+
+    @allure_commons.hookimpl
+    def stop_step(self, uuid, exc_type, exc_val, exc_tb):
+        pass
+
+    @allure_commons.hookimpl
+    def attach_data(self, body, name, attachment_type, extension):
+        self.attached_bytes += len(body)
+
+
+def time_calls(call, number: int, repeat: int) -> float:
+    """
+    Returns:
+        float: The best time of a call in microseconds.
+    """
+    for _ in range(WARMUP_CALLS):
+        call()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=1000, help='number of requests per repetition')
+    parser.add_argument('--repeat', type=int, default=3, help='number of repetitions, the best one is kept')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against the baseline, e.g. 0.25 for 25%%')
+    parser.add_argument('--baseline', type=Path, default=BASELINES_DIR / 'overhead.json',
+                        help='JSON file of the baseline')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    # the log records are created like in a test run, but they aren't written anywhere
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+    stub = TheCatAPIStub().start()
+    try:
+        session = requests.Session()
+        session.headers['x-api-key'] = API_KEY
+        search_url = f'{stub.base_url}/images/search'
+        bare_client = APIClient(stub.base_url, CapturePolicy('off'))
+        bare_client.session.headers['x-api-key'] = API_KEY
+        client = TheCatAPIClient(stub.base_url, API_KEY, CapturePolicy('full'))
+        listener = MemoryAllureListener()
+
+        cases = {
+            'raw requests.Session': lambda: session.get(search_url).json(),
+            'APIClient': lambda: bare_client.get('/images/search').json(),
+            'TheCatAPIClient (Allure off)': lambda: client.images_search().json(),
+        }
+        results = {name: time_calls(call, args.number, args.repeat) for name, call in cases.items()}
+        allure_commons.plugin_manager.register(listener)
+        try:
+            results['TheCatAPIClient (Allure on)'] = time_calls(lambda: client.images_search().json(),
+                                                                args.number, args.repeat)
+        finally:
+            allure_commons.plugin_manager.unregister(listener)
+    finally:
+        stub.stop()
+
+    baseline = load_baseline(args.baseline)
+    raw = results['raw requests.Session']
+    for name, value in results.items():
+        print(f'{format_row(name, value, "us/call", baseline)}  {1e6 / value:8.0f} rps  '
+              f'+{value - raw:7.1f} us over raw')
+    print(f'Allure on: {listener.steps} steps, {listener.attached_bytes / 1e6:.1f} MB attached')
+
+    if args.update_baseline:
+        write_baseline(args.baseline, results)
+        return
+    failures = regressions(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f'REGRESSION {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark of reading a response the way a test does: the body is logged, captured and then parsed by a couple
+of assertions. A plain `requests.Response` decodes the text and parses the JSON again on every access, while
+`interfaces.api_response.APIResponse` does both once, optionally with the orjson backend.
+
+Usage:
+    python -m benchmarks.bench_response [--number 2000] [--images 25] [--reads 3]
+"""
+import argparse
+import json
+import timeit
+import tracemalloc
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from benchmarks.bench_validators import make_search_response
+from interfaces.api_response import APIResponse, json_loads
+
+
+def make_response(body: bytes) -> requests.Response:
+    """
+    Builds a response of `/images/search` whose body is already read, like the ones returned by the session.
+    """
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.reason = 'OK'
+    resp.url = 'https://api.thecatapi.com/v1/images/search'
+    resp.headers = CaseInsensitiveDict({'Content-Type': 'application/json; charset=utf-8',
+                                        'Pagination-Count': '1000', 'Pagination-Page': '0',
+                                        'Pagination-Limit': '25'})
+    resp.encoding = 'utf-8'
+    resp._content = body
+    resp._content_consumed = True
+    return resp
+
+
+def read_raw(body: bytes, reads: int):
+    resp = make_response(body)
+    resp.text  # logged
+    resp.text  # captured
+    for _ in range(reads):
+        resp.json()
+
+
+def read_wrapped(body: bytes, reads: int, loads):
+    resp = APIResponse(make_response(body), loads)
+    resp.text
+    resp.text
+    for _ in range(reads):
+        resp.json()
+
+
+def peak_memory(case) -> int:
+    """
+    Returns:
+        int: The peak of memory traced by `tracemalloc` while reading one response, in bytes.
+    """
+    tracemalloc.start()
+    case()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=2000, help='number of read responses per case')
+    parser.add_argument('--images', type=int, default=25, help='number of images in the response body')
+    parser.add_argument('--reads', type=int, default=3, help='number of json() calls per response')
+    args = parser.parse_args()
+
+    body = json.dumps(make_search_response(args.images)).encode()
+    cases = {'requests.Response': lambda: read_raw(body, args.reads)}
+    for backend in ('json', 'orjson'):
+        try:
+            loads = json_loads(backend)
+        except ImportError as e:
+            print(f'Skipping {backend} backend: {e}')
+            continue
+        cases[f'APIResponse ({backend})'] = lambda loads=loads: read_wrapped(body, args.reads, loads)
+
+    print(f'{len(body) / 1024:.1f} KiB body, text read twice, json() called {args.reads} times')
+    baseline = None
+    for name, case in cases.items():
+        per_call = min(timeit.repeat(case, number=args.number, repeat=3)) / args.number * 1e6
+        baseline = baseline or per_call
+        print(f'{name:<25} {per_call:10.1f} us/response {baseline / per_call:8.1f}x '
+              f'{peak_memory(case) / 1024:8.1f} KiB peak')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark of the start-up cost of the framework: the import time of its main modules and the time of collecting
+the tests (`pytest --collect-only`), each measured in fresh interpreters. Collecting the tests must not load the
+HTTP or the validation stack (`requests`, `urllib3`, `jsonschema`, `yaml`, `jsonref`), they are imported only
+by the fixtures and functions which use them.
+
+The results are compared with a baseline, the benchmark fails (exit status 1) if a measurement is slower than
+the baseline by more than the tolerance or if collecting loads a heavy module. Record a new baseline with
+`--update-baseline` after an intended change, on the machine the benchmark is run on.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeat 5] [--tolerance 0.5] [--update-baseline]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.baseline import BASELINES_DIR, format_row, load_baseline, regressions, write_baseline
+
+ROOT = Path(__file__).parent.parent
+MODULES = ('tests.conftest', 'tests.test_images', 'tests.test_load', 'interfaces.the_cat_api_client',
+           'utils.validators')
+HEAVY_MODULES = ('requests', 'urllib3', 'jsonschema', 'yaml', 'jsonref')
+
+IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps(time.perf_counter() - start))
+'''
+COLLECT_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import pytest
+status = pytest.main(['--collect-only', '-q', '-p', 'no:cacheprovider', '--html={reports}/report.html',
+                      '--alluredir={reports}/allure'])
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, int(status), sorted(name for name in {heavy!r} if name in sys.modules)]))
+'''
+
+
+def run_script(script: str):
+    """
+    Runs a script in a fresh interpreter in the root of the repository.
+
+    Returns:
+        The JSON value printed on the last line of the output.
+    """
+    output = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def measure(repeat: int) -> tuple:
+    """
+    Returns:
+        tuple: The median times in milliseconds by name and the heavy modules loaded by the collection.
+    """
+    results = {}
+    for module in MODULES:
+        times = [run_script(IMPORT_SCRIPT.format(module=module)) for _ in range(repeat)]
+        results[f'import {module}'] = statistics.median(times) * 1000
+
+    with tempfile.TemporaryDirectory() as reports:
+        runs = [run_script(COLLECT_SCRIPT.format(reports=reports, heavy=HEAVY_MODULES)) for _ in range(repeat)]
+    if any(status != 0 for _, status, _ in runs):
+        raise RuntimeError('Collecting the tests failed, run `pytest --collect-only` to see why')
+    results['pytest --collect-only'] = statistics.median(elapsed for elapsed, _, _ in runs) * 1000
+    return results, runs[0][2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters per measurement')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed slowdown against the baseline, e.g. 0.5 for 50%%')
+    parser.add_argument('--baseline', type=Path, default=BASELINES_DIR / 'startup.json',
+                        help='JSON file of the baseline')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    results, heavy_modules = measure(args.repeat)
+    baseline = load_baseline(args.baseline)
+    for name, value in results.items():
+        print(format_row(name, value, 'ms', baseline))
+
+    if args.update_baseline:
+        write_baseline(args.baseline, results)
+        return
+
+    failures = regressions(results, baseline, args.tolerance)
+    if heavy_modules:
+        failures.append(f'collecting the tests loads {", ".join(heavy_modules)}')
+    for failure in failures:
+        print(f'REGRESSION {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
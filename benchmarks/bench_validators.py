@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of schema validation: `jsonschema.validate` (the schema is checked and a validator is built on
+every call) vs. the compiled validators of `utils.validators.ValidatorRegistry`, and the item by item validation
+of a list response which collects all errors (`validate_items`), the first time and when the items are known
+to be valid, e.g. on a rerun.
+
+Usage:
+    python -m benchmarks.bench_validators [--number 2000] [--items 25]
+"""
+import argparse
+import timeit
+
+from jsonschema import validate
+
+from utils.swagger import load_swagger
+from utils.validators import ValidatorRegistry
+
+SCHEMA_PATH = ['components', 'schemas', 'ImagesSearchAuthorizedResponse']
+
+
+def make_search_response(size: int = 25) -> list:
+    """
+    Builds an image search response of the given size, which conforms to `ImagesSearchAuthorizedResponse`.
+    """
+    return [
+        {
+            'id': f'image{i}',
+            'url': f'https://cdn2.thecatapi.com/images/image{i}.jpg',
+            'width': 1200,
+            'height': 800,
+            'breeds': [{'id': 'beng', 'name': 'Bengal'}],
+            'categories': [],
+        }
+        for i in range(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=2000, help='number of validations per case')
+    parser.add_argument('--items', type=int, default=25, help='number of images in the validated response')
+    args = parser.parse_args()
+
+    swagger = load_swagger()
+    schema = ValidatorRegistry(swagger).get_schema(SCHEMA_PATH)
+    data = make_search_response(args.items)
+
+    cases = {'jsonschema.validate': lambda: validate(instance=data, schema=schema)}
+    for backend in ('jsonschema', 'fastjsonschema'):
+        registry = ValidatorRegistry(swagger, backend=backend)
+        try:
+            registry.get(SCHEMA_PATH)  # compile outside of the measured loop
+        except ImportError as e:
+            print(f'Skipping {backend} backend: {e}')
+            continue
+        cases[f'compiled ({backend})'] = lambda registry=registry: registry.validate(data, SCHEMA_PATH)
+        uncached = ValidatorRegistry(swagger, backend=backend, valid_items_size=0)
+        cached = ValidatorRegistry(swagger, backend=backend, valid_items_size=args.items)
+        cases[f'items ({backend})'] = lambda registry=uncached: registry.validate_items(data, SCHEMA_PATH)
+        cases[f'items, rerun ({backend})'] = lambda registry=cached: registry.validate_items(data, SCHEMA_PATH)
+
+    baseline = None
+    for name, case in cases.items():
+        per_call = min(timeit.repeat(case, number=args.number, repeat=3)) / args.number * 1e6
+        baseline = baseline or per_call
+        print(f'{name:<30} {per_call:10.1f} us/validation {baseline / per_call:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
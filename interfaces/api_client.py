@@ -3,19 +3,47 @@ This module provides an abstract base class for interacting with APIs, allowing
 (GET, POST, PUT, DELETE) using the `requests` library. The module can be used as a foundation for
 building API clients by extending its functionality.
 
-Logging is integrated using a custom logger from `utils.log`.
+Logging is integrated using a custom logger from `utils.log`, Allure attachments are controlled by a capture policy
+from `utils.capture`. The phase timings of every request are passed to the timing hooks (see `utils.timing`).
 """
 import json
+import re
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Optional
 
 import requests
 import allure
 from allure import attachment_type as at
-
-from utils.log import create_logger
+from urllib3.util.request import ACCEPT_ENCODING
+
+from interfaces.api_response import APIResponse, json_loads
+from utils.adapters import TimingHTTPAdapter
+from utils.capture import CapturePolicy
+from utils.config import (API_ACCEPT_ENCODING, API_CAPTURE_MODE, API_CAPTURE_SAMPLE_RATE, API_CAPTURE_MAX_BODY_SIZE,
+                          API_JSON_BACKEND, API_POOL_MAXSIZE, API_MAX_RETRIES_ON_429, API_MAX_RETRY_DELAY,
+                          LOG_BODY_PREVIEW_SIZE)
+from utils.log import BodyPreview, create_logger
+from utils.rate_limiter import FileTokenBucket
+from utils.response_cache import ResponseCache
+from utils.timing import TimingHook, TimingRecord, timed_request
 
 # Initialize a logger for the module
 logger = create_logger('api')
 
+# the content codings the responses can be decoded from, brotli and zstd only if their packages are installed
+CONTENT_CODINGS = (*ACCEPT_ENCODING.split(','), 'identity', '*')
+
+
+@lru_cache(maxsize=None)
+def _template_pattern(template: str) -> re.Pattern:
+    """
+    Returns:
+        re.Pattern: The pattern matching the endpoints of a template, e.g. '/images/{image_id}'.
+    """
+    return re.compile(re.sub(r'\\{\w+\\}', '[^/]+', re.escape(template)) + '$')
+
 
 class APIClient:
     """
@@ -23,17 +51,49 @@ class APIClient:
 
     Attributes:
         base_url (str): The base URL for the API. This must be set by subclasses or instances.
+        capture_policy (CapturePolicy): The policy for attaching request and response details to Allure reports.
+        response_cache (ResponseCache): The cache of the responses of safe requests, None disables caching.
+        rate_limiter (FileTokenBucket): The limiter every request (including retries) takes a token from,
+                                        None disables rate limiting.
+        max_retries_on_429 (int): The number of retries of a request answered with '429 Too Many Requests'.
+        max_retry_delay (float): The maximum delay in seconds before a retry.
+        json_loads (Callable): The function JSON bodies are parsed with, by default the one of the backend
+                               configured by `API_JSON_BACKEND`.
+        accept_encoding (str): The `Accept-Encoding` header of the requests, configured by `API_ACCEPT_ENCODING`.
+        timing_hooks (list[TimingHook]): Callables which receive the `TimingRecord` of every request, e.g.
+                                         `utils.timing.TimingCollector`. Requests aren't timed without hooks.
+        endpoint_templates (tuple[str]): Templates of the endpoints with path parameters, e.g. '/images/{image_id}',
+                                         the timings of the matching endpoints are reported under the template.
     """
+    endpoint_templates = ()
 
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, capture_policy: CapturePolicy = None, response_cache: ResponseCache = None,
+                 rate_limiter: FileTokenBucket = None):
         """
         Initializes an APIClient instance with a session and default settings.
 
         Args:
             base_url (str): The base URL for the API.
+            capture_policy (CapturePolicy, optional): The policy for attaching request and response details to
+                                                      Allure reports. By default, it's configured by the
+                                                      `API_CAPTURE_*` environment variables.
+            response_cache (ResponseCache, optional): The cache of the responses of safe requests, disabled
+                                                      by default.
+            rate_limiter (FileTokenBucket, optional): The limiter shared with other clients and processes,
+                                                      disabled by default.
         """
         self._session = requests.Session()
         self.base_url = base_url
+        self.capture_policy = capture_policy or CapturePolicy(
+            API_CAPTURE_MODE, API_CAPTURE_SAMPLE_RATE, API_CAPTURE_MAX_BODY_SIZE)
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        self.max_retries_on_429 = API_MAX_RETRIES_ON_429
+        self.max_retry_delay = API_MAX_RETRY_DELAY
+        self.json_loads = json_loads(API_JSON_BACKEND)
+        self.timing_hooks: [TimingHook] = []
+        self.accept_encoding = API_ACCEPT_ENCODING
+        self.configure_pool(API_POOL_MAXSIZE)
 
     @property
     def session(self):
@@ -45,8 +105,103 @@ class APIClient:
         """
         return self._session
 
+    @property
+    def accept_encoding(self) -> str:
+        """
+        The `Accept-Encoding` header sent with every request, e.g. 'gzip', 'gzip, deflate' or 'identity' for
+        uncompressed responses. The sizes of the response bodies on the wire and decoded and the time of decoding
+        them are recorded by the timing hooks.
+
+        Raises:
+            ValueError: If the header contains a content coding the responses can't be decoded from.
+        """
+        return self._session.headers['Accept-Encoding']
+
+    @accept_encoding.setter
+    def accept_encoding(self, value: str):
+        codings = [coding.split(';')[0].strip().lower() for coding in value.split(',')]
+        unsupported = [coding for coding in codings if coding not in CONTENT_CODINGS]
+        if unsupported:
+            raise ValueError(f'Unsupported content coding(s) {", ".join(unsupported)} in Accept-Encoding {value!r}, '
+                             f'the supported ones are {", ".join(CONTENT_CODINGS)}')
+        self._session.headers['Accept-Encoding'] = value
+
+    def configure_pool(self, pool_maxsize: int):
+        """
+        Mounts HTTP(S) adapters whose connection pools keep up to `pool_maxsize` connections per host, which
+        has to be at least the number of threads sending requests with this client at once. The adapters measure
+        the connection phases of the timed requests.
+
+        Args:
+            pool_maxsize (int): The number of connections kept per host.
+        """
+        adapter = TimingHTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def _endpoint_template(self, endpoint: str) -> str:
+        """
+        Returns:
+            str: The first template in `endpoint_templates` which matches the endpoint or the endpoint itself.
+        """
+        for template in self.endpoint_templates:
+            if _template_pattern(template).match(endpoint):
+                return template
+        return endpoint
+
+    def _retry_delay(self, resp: requests.Response, attempt: int) -> float:
+        """
+        Calculates the delay before retrying a request answered with '429 Too Many Requests'.
+
+        Args:
+            resp (requests.Response): The '429' response.
+            attempt (int): The number of the failed attempt, starting from 0.
+
+        Returns:
+            float: The delay in seconds from the `Retry-After` header (seconds or an HTTP date) or, without it,
+                   an exponential backoff, capped by `max_retry_delay`.
+        """
+        retry_after = resp.headers.get('Retry-After')
+        delay = 2 ** attempt * 0.5
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    pass
+        return min(max(delay, 0.0), self.max_retry_delay)
+
+    def _send_with_retries(self, method_function, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request, taking a token from the rate limiter before every attempt, and retries it while the API
+        answers with '429 Too Many Requests'.
+
+        Args:
+            method_function: The session method to send the request with.
+            url (str): The full URL.
+            **kwargs: Parameters of the session method.
+
+        Returns:
+            requests.Response: The response of the last attempt.
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            resp = method_function(url, **kwargs)
+            if resp.status_code != 429 or attempt >= self.max_retries_on_429:
+                return resp
+            delay = self._retry_delay(resp, attempt)
+            logger.warning('Rate limited by the API, retrying in %.2fs (attempt %s of %s)',
+                           delay, attempt + 1, self.max_retries_on_429)
+            resp.close()
+            time.sleep(delay)
+            attempt += 1
+
     def _send_request(self, method: str, endpoint: str, params: dict = None, headers: dict = None,
-                            body: dict = None, **kwargs) -> requests.Response:
+                            body: dict = None, **kwargs) -> APIResponse:
         """
         Sends an HTTP request to the specified endpoint.
 
@@ -59,7 +214,7 @@ class APIClient:
             **kwargs: Additional parameters to pass to the request method.
 
         Returns:
-            requests.Response: The response object from the server.
+            APIResponse: The response object from the server.
 
         Raises:
             ValueError: If an unsupported HTTP method is specified.
@@ -78,26 +233,107 @@ class APIClient:
         if not method_function:
             raise ValueError(f'Unknown method {method}')
 
-        # Log the request details
-        logger.info(
-            f'Sending {method.upper()} request with parameters url={url}; headers={headers}; body={body}; params={params}')
-        allure.attach(json.dumps(url, indent=2), name='Request URL', attachment_type=at.TEXT)
-        allure.attach(json.dumps(headers, indent=2), name='Request Headers', attachment_type=at.JSON)
-        allure.attach(json.dumps(body, indent=2), name='Request Body', attachment_type=at.JSON)
-        allure.attach(json.dumps(params, indent=2), name='Request Params', attachment_type=at.JSON)
+        # Log the request details, the message is formatted by the log handler (see `utils.log`)
+        logger.info('Sending %s request with parameters url=%s; headers=%s; body=%s; params=%s',
+                    method.upper(), url, headers, body, params, extra={'method': method.upper(), 'url': url})
+        # Attachments are only rendered if the request is captured
+        capture = self.capture_policy.start()
+        if capture:
+            capture.add('Request URL', lambda: json.dumps(url, indent=2), at.TEXT)
+            capture.add('Request Headers', lambda: json.dumps(headers, indent=2), at.JSON)
+            capture.add('Request Body', lambda: json.dumps(body, indent=2), at.JSON)
+            capture.add('Request Params', lambda: json.dumps(params, indent=2), at.JSON)
+
+        record = TimingRecord(method, self._endpoint_template(endpoint)) if self.timing_hooks else None
+
+        # Serve safe requests from the response cache, if it's enabled, the arguments of `requests` (e.g. `stream`)
+        # aren't part of the cache key, so the requests which pass them bypass the cache
+        resp = cache_key = None
+        request_headers = headers
+        if (self.response_cache is not None and not kwargs
+                and self.response_cache.is_cacheable(method, endpoint, params)):
+            cache_key = self.response_cache.key(method, url, params, {**self._session.headers, **(headers or {})}, body)
+            resp, etag = self.response_cache.lookup(cache_key)
+            if etag:
+                headers = {**(headers or {}), 'If-None-Match': etag}
+
+        if resp is not None:
+            logger.info('Response is served from the cache')
+            if record:
+                record.source = 'cache'
+        else:
+            resp = self._send_timed(record, method_function, url, headers=headers, json=body, params=params,
+                                    **kwargs)
+            if cache_key:
+                cached = self.response_cache.store(cache_key, endpoint, resp)
+                if cached is None:
+                    # the response revalidated by '304 Not Modified' was evicted while the request was sent
+                    logger.info('Revalidated response is no longer cached, sending the request again')
+                    if record:
+                        # the revalidation is reported on its own, the request sent again gets a new record
+                        self._emit_timing(record, resp)
+                        record = TimingRecord(method, record.endpoint)
+                    resp.close()
+                    resp = self._send_timed(record, method_function, url, headers=request_headers, json=body,
+                                            params=params, **kwargs)
+                    cached = self.response_cache.store(cache_key, endpoint, resp)
+                resp = resp if cached is None else cached
+
+        # Log the response details, the body of a streamed response (`stream=True`) is left to the caller
+        streamed = not resp.response._content_consumed
+        logger.info('Response status - %s, response data - %s',
+                    resp.status_code, '<streamed>' if streamed else BodyPreview(resp, LOG_BODY_PREVIEW_SIZE),
+                    extra={'method': method.upper(), 'url': url, 'status': resp.status_code})
+        if capture:
+            capture.add('Response Status', lambda: str(resp.status_code), at.TEXT)
+            if not streamed:
+                capture.add('Response Body', lambda: resp.text, at.TEXT)
+            capture.commit()
+
+        if record:
+            self._emit_timing(record, resp)
+        return resp
 
-        # Send the request
-        resp = method_function(url, headers=headers, json=body, params=params, **kwargs)
+    def _send_timed(self, record: Optional[TimingRecord], method_function, url: str, **kwargs) -> APIResponse:
+        """
+        Sends a request with `_send_with_retries`, the connection phases are added to the timing record by
+        the adapter.
 
-        # Log the response details
-        logger.info(f'Response status - {resp.status_code}, response data - {resp.text}')
-        allure.attach(str(resp.status_code), name='Response Status', attachment_type=at.TEXT)
-        allure.attach(resp.text, name='Response Body', attachment_type=at.TEXT)
+        Args:
+            record (Optional[TimingRecord]): The timing record of the request, None if the timings are disabled.
+            method_function: The session method to send the request with.
+            url (str): The full URL.
+            **kwargs: Parameters of the session method.
 
-        return resp
+        Returns:
+            APIResponse: The response of the last attempt.
+        """
+        with timed_request(record):
+            try:
+                resp = self._send_with_retries(method_function, url, **kwargs)
+            except Exception:
+                if record:
+                    self._emit_timing(record, None)
+                raise
+        if record:
+            record.body_read(resp)
+        # the body is decoded and parsed at most once for the logs, the captures and the caller
+        return APIResponse(resp, self.json_loads)
+
+    def _emit_timing(self, record: TimingRecord, resp: APIResponse = None):
+        """
+        Completes the timing record of a request and passes it to the timing hooks.
+
+        Args:
+            record (TimingRecord): The record of the request.
+            resp (APIResponse, optional): The response, None if the request failed.
+        """
+        record.finish(None if resp is None else resp.response)
+        for hook in self.timing_hooks:
+            hook(record)
 
     @allure.step('Sending GET request to {endpoint}')
-    def get(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None, **kwargs) -> requests.Response:
+    def get(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None, **kwargs) -> APIResponse:
         """
         Sends a GET request to the specified endpoint.
 
@@ -109,12 +345,12 @@ class APIClient:
             **kwargs: Additional request parameters.
 
         Returns:
-            requests.Response: The response object.
+            APIResponse: The response object.
         """
         return self._send_request('get', endpoint, params, headers, body, **kwargs)
 
     @allure.step('Sending POST request to {endpoint}')
-    def post(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None, **kwargs) -> requests.Response:
+    def post(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None, **kwargs) -> APIResponse:
         """
         Sends a POST request to the specified endpoint.
 
@@ -126,12 +362,12 @@ class APIClient:
             **kwargs: Additional request parameters.
 
         Returns:
-            requests.Response: The response object.
+            APIResponse: The response object.
         """
         return self._send_request('post', endpoint, params, headers, body, **kwargs)
 
     @allure.step('Sending PUT request to {endpoint}')
-    def put(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None, **kwargs) -> requests.Response:
+    def put(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None, **kwargs) -> APIResponse:
         """
         Sends a PUT request to the specified endpoint.
 
@@ -143,12 +379,12 @@ class APIClient:
             **kwargs: Additional request parameters.
 
         Returns:
-            requests.Response: The response object.
+            APIResponse: The response object.
         """
         return self._send_request('put', endpoint, params, headers, body, **kwargs)
 
     @allure.step('Sending DELETE request to {endpoint}')
-    def delete(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None, **kwargs) -> requests.Response:
+    def delete(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None, **kwargs) -> APIResponse:
         """
         Sends a DELETE request to the specified endpoint.
 
@@ -160,6 +396,6 @@ class APIClient:
             **kwargs: Additional request parameters.
 
         Returns:
-            requests.Response: The response object.
+            APIResponse: The response object.
         """
         return self._send_request('delete', endpoint, params, headers, body, **kwargs)
@@ -0,0 +1,176 @@
+"""
+This module provides the response object returned by `interfaces.api_client.APIClient`.
+
+`APIResponse` wraps a `requests.Response` and keeps its decoded text and parsed JSON, so however many times a test
+(and the client's logging) reads them, the body is decoded at most once and parsed at most once. The JSON is parsed
+directly from the body bytes, optionally by a faster backend (`API_JSON_BACKEND=orjson`, requires
+`pip install orjson`). The pagination headers of TheCatAPI are exposed as typed fields.
+"""
+import json
+from functools import lru_cache
+from typing import Callable, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+JSON_BACKENDS = ('json', 'orjson')
+# marks the JSON body which isn't parsed yet, None is a valid JSON body
+_NOT_PARSED = object()
+
+
+@lru_cache(maxsize=None)
+def json_loads(backend: str = 'json') -> Callable[[bytes], object]:
+    """
+    Returns the function which parses JSON with the given backend.
+
+    Args:
+        backend (str, optional): 'json' (the standard library) or 'orjson'.
+
+    Returns:
+        Callable: A function which parses JSON from bytes or text.
+
+    Raises:
+        ValueError: If the backend is unknown.
+        ImportError: If the backend isn't installed.
+    """
+    if backend == 'json':
+        return json.loads
+    if backend == 'orjson':
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError('The orjson JSON backend requires `pip install orjson`')
+        return orjson.loads
+    raise ValueError(f'Unknown JSON backend {backend}, it has to be one of {JSON_BACKENDS}')
+
+
+def _int_header(headers: CaseInsensitiveDict, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class APIResponse:
+    """
+    A response of the API with the body decoded and parsed at most once.
+
+    The object returned by `json` is shared by all its callers, so it must not be modified. Attributes which
+    aren't defined here (e.g. `request` or `cookies`) are taken from the wrapped `requests.Response`. Like it,
+    the response is falsy if its status code is 4xx or 5xx and iterating over it yields the chunks of the body.
+
+    Attributes:
+        status_code (int): The HTTP status code.
+        reason (str): The reason phrase of the status.
+        headers (CaseInsensitiveDict): The response headers.
+        url (str): The final URL of the response.
+        pagination_count (Optional[int]): The `Pagination-Count` header, the number of all found items.
+        pagination_page (Optional[int]): The `Pagination-Page` header, the number of the returned page.
+        pagination_limit (Optional[int]): The `Pagination-Limit` header, the number of items per page.
+    """
+    __slots__ = ('status_code', 'reason', 'headers', 'url', 'pagination_count', 'pagination_page',
+                 'pagination_limit', '_response', '_loads', '_text', '_json')
+
+    def __init__(self, response: requests.Response, loads: Callable[[bytes], object] = json.loads):
+        """
+        Initializes an APIResponse instance.
+
+        Args:
+            response (requests.Response): The wrapped response, its body has to be read already unless
+                                          the request was streamed (`stream=True`).
+            loads (Callable, optional): The function the JSON body is parsed with, see `json_loads`.
+        """
+        self._response = response
+        self._loads = loads
+        self._text = None
+        self._json = _NOT_PARSED
+        self.status_code = response.status_code
+        self.reason = response.reason
+        self.headers = response.headers
+        self.url = response.url
+        self.pagination_count = _int_header(response.headers, 'Pagination-Count')
+        self.pagination_page = _int_header(response.headers, 'Pagination-Page')
+        self.pagination_limit = _int_header(response.headers, 'Pagination-Limit')
+
+    @property
+    def response(self) -> requests.Response:
+        """
+        Returns:
+            requests.Response: The wrapped response.
+        """
+        return self._response
+
+    @property
+    def content(self) -> bytes:
+        """
+        Returns:
+            bytes: The body of the response.
+        """
+        return self._response.content
+
+    @property
+    def text(self) -> str:
+        """
+        Returns:
+            str: The body decoded once by the charset of the response (UTF-8 for JSON without a charset).
+        """
+        if self._text is None:
+            response = self._response
+            if response.encoding is None and 'json' in response.headers.get('Content-Type', ''):
+                self._text = response.content.decode('utf-8', errors='replace')
+            else:
+                self._text = response.text
+        return self._text
+
+    def json(self):
+        """
+        Parses the JSON body once and returns the same object on every call.
+
+        Returns:
+            The parsed body.
+
+        Raises:
+            requests.JSONDecodeError: If the body isn't valid JSON.
+        """
+        if self._json is _NOT_PARSED:
+            try:
+                self._json = self._loads(self._response.content)
+            except ValueError as e:
+                raise requests.JSONDecodeError(getattr(e, 'msg', str(e)), getattr(e, 'doc', ''), getattr(e, 'pos', 0))
+        return self._json
+
+    @property
+    def ok(self) -> bool:
+        """
+        Returns:
+            bool: True if the status code is less than 400.
+        """
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        """
+        Raises:
+            requests.HTTPError: If the status code is 4xx or 5xx.
+        """
+        self._response.raise_for_status()
+
+    def close(self):
+        self._response.close()
+
+    def __bool__(self) -> bool:
+        # like `requests.Response`, `if resp:` checks the status code
+        return self.ok
+
+    def __iter__(self):
+        # the special methods aren't looked up by `__getattr__`
+        return iter(self._response)
+
+    def __getattr__(self, name: str):
+        # only called for the attributes which aren't slots, the private ones are never delegated
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._response, name)
+
+    def __repr__(self):
+        return f'<APIResponse [{self.status_code}]>'
@@ -0,0 +1,225 @@
+"""
+This module provides an asyncio counterpart of `interfaces.api_client.APIClient`, allowing many HTTP requests
+to be in flight at once.
+
+The asynchronous client wraps a regular (blocking) API client and runs its methods in worker threads, so
+session configuration, logging and Allure attachments behave exactly the same as in the synchronous client.
+On top of the usual `get/post/put/delete` surface it provides a `gather`-style batch API which sends N requests
+concurrently under a configurable concurrency cap.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+import requests
+
+from interfaces.api_client import APIClient
+from interfaces.api_response import APIResponse
+from utils.log import create_logger
+
+logger = create_logger('async-api')
+
+
+class AsyncAPIClient:
+    """
+    An asyncio wrapper around a synchronous `APIClient`.
+
+    Attributes:
+        max_concurrency (int): The maximum number of requests sent at once by `gather` and `batch`.
+    """
+
+    def __init__(self, client: APIClient, max_concurrency: int = 10):
+        """
+        Initializes an AsyncAPIClient instance and sizes the connection pool of the wrapped client's session
+        to the concurrency cap.
+
+        Args:
+            client (APIClient): The synchronous client used to send the requests.
+            max_concurrency (int, optional): The maximum number of requests sent at once.
+
+        Raises:
+            ValueError: If `max_concurrency` is less than 1.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f'Invalid max_concurrency {max_concurrency}, it has to be at least 1')
+
+        self._client = client
+        self.max_concurrency = max_concurrency
+
+        # without it the pool keeps fewer connections and discards the rest under higher concurrency
+        self._client.configure_pool(max_concurrency)
+
+    @property
+    def client(self) -> APIClient:
+        """
+        Provides access to the wrapped synchronous client.
+
+        Returns:
+            APIClient: The client used to send the requests.
+        """
+        return self._client
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        Provides access to the underlying `requests.Session` instance for advanced configurations.
+
+        Returns:
+            requests.Session: The session instance used for all requests.
+        """
+        return self._client.session
+
+    @property
+    def base_url(self) -> str:
+        """
+        Returns:
+            str: The base URL of the wrapped client.
+        """
+        return self._client.base_url
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        """
+        Runs a blocking client method in a worker thread of the running event loop.
+
+        Args:
+            func (Callable): The client method to call.
+            *args: Positional arguments for the method.
+            **kwargs: Keyword arguments for the method.
+
+        Returns:
+            The value returned by the method.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def gather(self, *aws: Awaitable, return_exceptions: bool = False) -> list:
+        """
+        Awaits the given request coroutines concurrently, keeping at most `max_concurrency` of them in flight.
+
+        Args:
+            *aws (Awaitable): Request coroutines, e.g. `client.get('/images/search')`.
+            return_exceptions (bool, optional): If True, exceptions are returned in place of the failed results
+                                                instead of being raised.
+
+        Returns:
+            list: The results in the same order as the given coroutines.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def limited(aw: Awaitable):
+            async with semaphore:
+                return await aw
+
+        logger.info('Sending a batch of %s requests with concurrency %s', len(aws), self.max_concurrency)
+        return await asyncio.gather(*(limited(aw) for aw in aws), return_exceptions=return_exceptions)
+
+    def batch(self, *aws: Awaitable, return_exceptions: bool = False) -> list:
+        """
+        Synchronous entry point for `gather`, intended for code which doesn't run an event loop (e.g. fixtures).
+
+        A new event loop with its own pool of `max_concurrency` worker threads is used for every batch, so it
+        can't be called from a coroutine.
+
+        Args:
+            *aws (Awaitable): Request coroutines, e.g. `client.get('/images/search')`.
+            return_exceptions (bool, optional): If True, exceptions are returned in place of the failed results
+                                                instead of being raised.
+
+        Returns:
+            list: The results in the same order as the given coroutines.
+
+        Raises:
+            RuntimeError: If it's called while an event loop is running, `gather` has to be awaited instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            # the coroutines are closed, so they aren't reported as never awaited
+            for aw in aws:
+                if asyncio.iscoroutine(aw):
+                    aw.close()
+            raise RuntimeError('batch() can\'t be called from a running event loop, await gather() instead')
+
+        async def run_batch():
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(self.max_concurrency, thread_name_prefix='api-batch'))
+            return await self.gather(*aws, return_exceptions=return_exceptions)
+
+        return asyncio.run(run_batch())
+
+    async def get(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None,
+                  **kwargs) -> APIResponse:
+        """
+        Sends a GET request to the specified endpoint.
+
+        Args:
+            endpoint (str): The API endpoint.
+            params (dict, optional): Query parameters to include in the request URL.
+            headers (dict, optional): Headers to include in the request.
+            body (dict, optional): JSON body (rarely used for GET requests).
+            **kwargs: Additional request parameters.
+
+        Returns:
+            APIResponse: The response object.
+        """
+        return await self._run(self._client.get, endpoint, params, headers, body, **kwargs)
+
+    async def post(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None,
+                   **kwargs) -> APIResponse:
+        """
+        Sends a POST request to the specified endpoint.
+
+        Args:
+            endpoint (str): The API endpoint.
+            params (dict, optional): Query parameters to include in the request URL.
+            headers (dict, optional): Headers to include in the request.
+            body (dict, optional): JSON body to include in the request.
+            **kwargs: Additional request parameters.
+
+        Returns:
+            APIResponse: The response object.
+        """
+        return await self._run(self._client.post, endpoint, params, headers, body, **kwargs)
+
+    async def put(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None,
+                  **kwargs) -> APIResponse:
+        """
+        Sends a PUT request to the specified endpoint.
+
+        Args:
+            endpoint (str): The API endpoint.
+            params (dict, optional): Query parameters to include in the request URL.
+            headers (dict, optional): Headers to include in the request.
+            body (dict, optional): JSON body to include in the request.
+            **kwargs: Additional request parameters.
+
+        Returns:
+            APIResponse: The response object.
+        """
+        return await self._run(self._client.put, endpoint, params, headers, body, **kwargs)
+
+    async def delete(self, endpoint: str, params: dict = None, headers: dict = None, body: dict = None,
+                     **kwargs) -> APIResponse:
+        """
+        Sends a DELETE request to the specified endpoint.
+
+        Args:
+            endpoint (str): The API endpoint.
+            params (dict, optional): Query parameters to include in the request URL.
+            headers (dict, optional): Headers to include in the request.
+            body (dict, optional): JSON body to include in the request.
+            **kwargs: Additional request parameters.
+
+        Returns:
+            APIResponse: The response object.
+        """
+        return await self._run(self._client.delete, endpoint, params, headers, body, **kwargs)
+
+    def close(self):
+        """
+        Closes the underlying session and all its pooled connections.
+        """
+        self._client.session.close()
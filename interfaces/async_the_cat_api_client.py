@@ -0,0 +1,79 @@
+"""
+This file contains an asyncio module to interact with TheCatAPI (https://documenter.getpostman.com/view/5578104/RWgqUxxh#intro).
+"""
+from interfaces.api_response import APIResponse
+from interfaces.async_api_client import AsyncAPIClient
+from interfaces.the_cat_api_client import TheCatAPIClient
+from utils.capture import CapturePolicy
+from utils.rate_limiter import FileTokenBucket
+from utils.response_cache import ResponseCache
+
+
+class AsyncTheCatAPIClient(AsyncAPIClient):
+    """
+    An asyncio client to interact with TheCatAPI.
+
+    This class extends the AsyncAPIClient to provide awaitable counterparts of the endpoint methods of
+    `TheCatAPIClient`, so that many of them can be sent at once with `gather` or `batch`.
+    """
+
+    def __init__(self, base_url: str, api_key: str, max_concurrency: int = 10, capture_policy: CapturePolicy = None,
+                 response_cache: ResponseCache = None, rate_limiter: FileTokenBucket = None):
+        """
+        Initializes an instance of AsyncTheCatAPIClient.
+
+        Args:
+            base_url (str): The base URL for TheCatAPI.
+            api_key (str): The API key for authenticating with TheCatAPI.
+            max_concurrency (int, optional): The maximum number of requests sent at once.
+            capture_policy (CapturePolicy, optional): The policy for attaching request and response details to
+                                                      Allure reports.
+            response_cache (ResponseCache, optional): The cache of the responses of safe requests.
+            rate_limiter (FileTokenBucket, optional): The limiter shared with other clients and processes.
+        """
+        super(AsyncTheCatAPIClient, self).__init__(
+            TheCatAPIClient(base_url, api_key, capture_policy, response_cache, rate_limiter), max_concurrency)
+
+    ### Images endpoints ###
+
+    async def images_search(self, **kwargs) -> APIResponse:
+        """
+        Searches for cat images using TheCatAPI.
+
+        Args:
+            **kwargs: Additional query parameters to be passed into the search.
+
+        Returns:
+            APIResponse: The response object from the server containing search results.
+        """
+        return await self._run(self._client.images_search, **kwargs)
+
+    async def images_get(self, image_id: str, **kwargs) -> APIResponse:
+        """
+        Retrieves an image by its ID from TheCatAPI.
+
+        Args:
+            image_id (str): The ID of the image to retrieve.
+            **kwargs: Additional query parameters for the request.
+
+        Returns:
+            APIResponse: The response object from the server containing the image data.
+        """
+        return await self._run(self._client.images_get, image_id, **kwargs)
+
+    ...
+
+    ### Favourites endpoints ###
+    ...
+
+    ### Breeds endpoints ###
+    ...
+
+    ### Votes endpoints ###
+    ...
+
+    ### Facts endpoints ###
+    ...
+
+    ### Webhooks endpoints ###
+    ...
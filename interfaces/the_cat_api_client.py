@@ -1,11 +1,19 @@
 """
 This file contains a module to interact with TheCatAPI (https://documenter.getpostman.com/view/5578104/RWgqUxxh#intro).
 """
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
 import allure
 from allure import attachment_type as at
 
 from interfaces.api_client import APIClient
+from utils.capture import CapturePolicy
 from utils.log import create_logger
+from utils.rate_limiter import FileTokenBucket
+from utils.response_cache import ResponseCache
 
 logger = create_logger('the-cat-api')
 
@@ -20,16 +28,23 @@ class TheCatAPIClient(APIClient):
     Attributes:
         base_url (str): The base URL for TheCatAPI.
     """
+    # the static endpoints go first, so they aren't matched by the templates with path parameters
+    endpoint_templates = ('/images/search', '/images/{image_id}')
 
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(self, base_url: str, api_key: str, capture_policy: CapturePolicy = None,
+                 response_cache: ResponseCache = None, rate_limiter: FileTokenBucket = None):
         """
         Initializes an instance of TheCatAPIClient.
 
         Args:
             base_url (str): The base URL for TheCatAPI.
             api_key (str): The API key for authenticating with TheCatAPI.
+            capture_policy (CapturePolicy, optional): The policy for attaching request and response details to
+                                                      Allure reports.
+            response_cache (ResponseCache, optional): The cache of the responses of safe requests.
+            rate_limiter (FileTokenBucket, optional): The limiter shared with other clients and processes.
         """
-        super(TheCatAPIClient, self).__init__(base_url)
+        super(TheCatAPIClient, self).__init__(base_url, capture_policy, response_cache, rate_limiter)
         self._session.headers.update({'x-api-key': api_key})
 
     ### Images endpoints ###
@@ -43,12 +58,15 @@ class TheCatAPIClient(APIClient):
             **kwargs: Additional query parameters to be passed into the search.
 
         Returns:
-            requests.Response: The response object from the server containing search results.
+            APIResponse: The response object from the server containing search results.
         """
         endpoint = '/images/search'
 
-        logger.info(f'Searching cat images with parameters {kwargs}')
-        allure.attach(str(kwargs), 'Search parameters', at.TEXT)
+        logger.info('Searching cat images with parameters %s', kwargs)
+        capture = self.capture_policy.start()
+        if capture:
+            capture.add('Search parameters', lambda: str(kwargs), at.TEXT)
+            capture.commit()
         resp = self.get(endpoint, **kwargs)
         return resp
 
@@ -62,14 +80,73 @@ class TheCatAPIClient(APIClient):
             **kwargs: Additional query parameters for the request.
 
         Returns:
-            requests.Response: The response object from the server containing the image data.
+            APIResponse: The response object from the server containing the image data.
         """
         endpoint = f'/images/{image_id}'
 
-        logger.info(f'Getting image by its id {image_id}')
+        logger.info('Getting image by its id %s', image_id)
         resp = self.get(endpoint, **kwargs)
         return resp
 
+    def images_iter(self, page_size: int = 25, prefetch: int = 2, **kwargs) -> Iterator[dict]:
+        """
+        Iterates lazily over all images found by `/images/search`, page by page.
+
+        The next `prefetch` pages are requested concurrently while the current one is consumed, so at most
+        `prefetch + 1` pages are held in memory no matter how many images are found. Stopping the iteration
+        (e.g. with `break` or `itertools.islice`) cancels the pages which weren't requested yet.
+
+        Args:
+            page_size (int, optional): The number of images per page, the API returns at most 25.
+            prefetch (int, optional): The number of pages requested ahead of the current one, at least 1.
+            **kwargs: Additional parameters for `images_search`. The query parameters `order` (ASC or DESC,
+                      ASC by default) and `page` (the first page, 0 by default) are taken into account.
+
+        Yields:
+            dict: The images.
+
+        Raises:
+            ValueError: If the random order is requested, since random results can't be paginated.
+            requests.HTTPError: If a page isn't returned successfully.
+        """
+        params = dict(kwargs.pop('params', None) or {})
+        params.setdefault('order', 'ASC')
+        if str(params['order']).upper() == 'RANDOM':
+            raise ValueError('Images in the RANDOM order can\'t be paginated, use ASC or DESC order')
+        params['limit'] = page_size
+        first_page = int(params.pop('page', 0))
+
+        def fetch(page: int):
+            resp = self.images_search(params={**params, 'page': page}, **kwargs)
+            resp.raise_for_status()
+            return resp
+
+        resp = fetch(first_page)
+        # the API caps the limit, the actual one is reported in the pagination headers
+        limit = resp.pagination_limit or page_size
+        total = resp.pagination_count
+        last_page = math.ceil(total / limit) - 1 if total is not None else None
+        logger.info('Iterating over %s images, %s images per page', total or 'unknown number of', limit)
+
+        prefetch = max(prefetch, 1)
+        executor = ThreadPoolExecutor(prefetch, thread_name_prefix='images-prefetch')
+        window = deque()
+        next_page = first_page + 1
+        try:
+            while True:
+                while len(window) < prefetch and (last_page is None or next_page <= last_page):
+                    window.append(executor.submit(fetch, next_page))
+                    next_page += 1
+
+                images = resp.json()
+                yield from images
+                # without the pagination headers the last page is the first one which isn't full
+                if not images or (last_page is None and len(images) < limit) or not window:
+                    return
+                resp = window.popleft().result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
     ...
 
     ### Favourites endpoints ###
@@ -1,18 +1,397 @@
 import json
+import logging
+import os
+import time
+import warnings
+from collections.abc import Mapping
 from pathlib import Path
 
 import allure
 import pytest
-import yaml
 from allure import attachment_type as at
-from jsonref import replace_refs
 
-from interfaces.the_cat_api_client import TheCatAPIClient
-from utils.config import THE_CAT_API_BASE_URL, THE_CAT_API_KEY
+from utils.capture import attach_pending, discard_pending
+from utils.cassette import Cassette, MODES as CASSETTE_MODES
+from utils.config import (THE_CAT_API_BASE_URL, THE_CAT_API_KEY, THE_CAT_API_MAX_CONCURRENCY, THE_CAT_API_RATE_LIMIT,
+                          THE_CAT_API_RATE_BURST, FUZZ_MAX_REQUESTS, IMAGE_VERIFIER_CONCURRENCY, LOG_JSON_FILE,
+                          TEST_DURATIONS_DB, API_ACCEPT_ENCODING)
+from utils.latency_budget import (MODES as LATENCY_BUDGET_MODES, LatencyBudget, LatencyBudgetRecorder,
+                                  LatencyBudgetWarning)
+from utils.log import JsonFormatter, start_queue_logging, stop_queue_logging
+from utils.rate_limiter import FileTokenBucket
+from utils.response_cache import ResponseCache
+from utils.scheduling import DurationSchedulingPlugin, DurationStore
+from utils.soak import SoakMonitor, SoakPlugin
+from utils.stub_server import TheCatAPIStub
+from utils.swagger import LazyMapping, load_swagger, swagger_cache_file
+from utils.timing import EndpointTimings, TimingCollector
+from utils.timing_plugin import RequestTimingsPlugin
+
+# the plugins are tested by running pytest on generated test modules
+pytest_plugins = ['pytester']
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('the-cat-api')
+    group.addoption('--stub', action='store_true',
+                    help='run the tests against a local stub of TheCatAPI generated from swagger.yaml')
+    group.addoption('--stub-latency', type=float, default=0.0,
+                    help='delay in seconds added to every response of the stub')
+    group.addoption('--stub-error-rate', type=float, default=0.0,
+                    help='share of the stub responses replaced with an injected error')
+    group.addoption('--stub-error-status', type=int, default=500,
+                    help='status code of the errors injected by the stub')
+    group.addoption('--stub-encodings', default='gzip,deflate',
+                    help='comma separated content codings the stub compresses its responses with, '
+                         'empty for uncompressed responses')
+    group.addoption('--accept-encoding', default=API_ACCEPT_ENCODING,
+                    help="Accept-Encoding header of the API requests, e.g. 'gzip' or 'identity' for uncompressed "
+                         "responses")
+    group.addoption('--rate-limit', type=float, default=THE_CAT_API_RATE_LIMIT,
+                    help='requests per second for all pytest-xdist workers together, 0 disables rate limiting')
+    group.addoption('--rate-burst', type=int, default=THE_CAT_API_RATE_BURST,
+                    help='maximum number of requests sent at once by all workers together')
+    group.addoption('--response-cache', action='store_true',
+                    help='serve repeated safe requests (except random image searches) from a response cache')
+    group.addoption('--response-cache-ttl', type=float, default=300,
+                    help='time to live of the cached responses in seconds')
+    group.addoption('--response-cache-revalidate', action='store_true',
+                    help='revalidate expired cached responses with If-None-Match instead of downloading them')
+    group.addoption('--attach-swagger', action='store_true',
+                    help='attach the whole dereferenced Swagger specification to the Allure report')
+    group.addoption('--cassette', default=None,
+                    help='JSON Lines file to record the API traffic to or replay it from')
+    group.addoption('--cassette-mode', choices=CASSETTE_MODES, default='replay',
+                    help='record - send and record all requests, replay - serve only recorded responses, '
+                         'auto - replay recorded responses and record the missing ones')
+    group.addoption('--log-json', default=LOG_JSON_FILE,
+                    help='JSON Lines file the framework logs are written to by a background thread instead of being '
+                         'captured by pytest, with pytest-xdist every worker writes its own file. An empty value '
+                         'disables it')
+    group.addoption('--timings-report', default='./test_reports/timings/request_timings.json',
+                    help='JSON file the request timings aggregated per test and per endpoint are written to, '
+                         'an empty value disables it')
+    group.addoption('--durations-db', default=TEST_DURATIONS_DB,
+                    help='SQLite database the durations, request counts and endpoints of the tests are saved to '
+                         'after every run, e.g. ./.cache/test_durations.sqlite3, not kept by default')
+    group.addoption('--schedule-by-duration', action='store_true',
+                    help='run the tests longest first by their durations in the previous runs and, with '
+                         'pytest-xdist (--dist load), distribute them across the workers by their expected durations')
+    group.addoption('--affected-by', action='append', default=[],
+                    help='run only the tests which called the endpoints of a client method (e.g. images_get) or '
+                         'of a Swagger path (e.g. /images/{image_id} or "GET /images/search") in their last run, '
+                         'tests without history always run. Can be repeated')
+    group.addoption('--latency-budget', choices=LATENCY_BUDGET_MODES, default='warn',
+                    help='fail - exceeded latency budgets fail the tests (used by performance runs), warn - they '
+                         'issue a warning (default), off - latency budgets aren\'t checked. A budget can override it '
+                         'with its mode')
+    group.addoption('--fuzz-budget', type=int, default=FUZZ_MAX_REQUESTS,
+                    help='maximum number of requests of the query parameter fuzzing tests')
+    group.addoption('--soak-duration', type=float, default=0.0,
+                    help='repeat the selected tests for this many seconds against the same session-scoped clients '
+                         'and report the latency, errors and resource usage over time, 0 disables it')
+    group.addoption('--soak-interval', type=float, default=60.0,
+                    help='seconds between two samples of the latency and resource usage of a soak run')
+    group.addoption('--soak-report', default='./test_reports/soak/soak_report.json',
+                    help='JSON file the summary and the timeline of a soak run are written to')
+    group.addoption('--load-duration', type=float, default=0.0,
+                    help='duration in seconds of the load tests (tests/test_load.py), 0 skips them')
+    group.addoption('--load-rps', type=float, default=None,
+                    help='target requests per second of the load tests, by default the workers send requests '
+                         'in a closed loop')
+    group.addoption('--load-concurrency', type=int, default=THE_CAT_API_MAX_CONCURRENCY,
+                    help='number of workers of the load tests')
+    group.addoption('--load-report', default='./test_reports/load/load_report.json',
+                    help='JSON file the latency histograms and percentiles of the load tests are written to')
+
+
+cassette_key = pytest.StashKey[Cassette]()
+response_cache_key = pytest.StashKey[ResponseCache]()
+swagger_startup_key = pytest.StashKey[str]()
+timing_collector_key = pytest.StashKey[TimingCollector]()
+latency_budget_recorder_key = pytest.StashKey[LatencyBudgetRecorder]()
+soak_monitor_key = pytest.StashKey[SoakMonitor]()
+# request timings of the setup of a test, reported together with its call
+pending_timings_key = pytest.StashKey[dict]()
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'latency_budget(p50_ms=None, p95_ms=None, p99_ms=None, max_ms=None, warmup=1, mode=None): '
+                   'limits the latency of the API calls made by the marked test or test class')
+    config.stash[timing_collector_key] = TimingCollector()
+    config.stash[latency_budget_recorder_key] = LatencyBudgetRecorder()
+    config.pluginmanager.register(RequestTimingsPlugin(config), 'request-timings')
+
+    if config.getoption('--soak-duration'):
+        if hasattr(config, 'workerinput') or config.getoption('dist', 'no') != 'no':
+            raise pytest.UsageError('--soak-duration runs the tests in one process, it can\'t be used with '
+                                    'pytest-xdist')
+        config.stash[soak_monitor_key] = SoakMonitor(config.getoption('--soak-interval'))
+        config.pluginmanager.register(SoakPlugin(config.stash[soak_monitor_key], config.getoption('--soak-duration'),
+                                                 config.getoption('--soak-report')), 'soak')
+
+    durations_db = config.getoption('--durations-db')
+    if durations_db:
+        config.pluginmanager.register(DurationSchedulingPlugin(config, DurationStore(durations_db)), 'test-durations')
+    elif config.getoption('--schedule-by-duration') or config.getoption('--affected-by'):
+        raise pytest.UsageError('--schedule-by-duration and --affected-by need the history of --durations-db')
+
+    log_json = config.getoption('--log-json')
+    if log_json:
+        path = Path(log_json)
+        worker = os.getenv('PYTEST_XDIST_WORKER')
+        if worker:
+            path = path.with_name(f'{path.stem}-{worker}{path.suffix}')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.FileHandler(path, mode='w', encoding='utf-8')
+        handler.setFormatter(JsonFormatter())
+        start_queue_logging(handler)
+
+
+def pytest_unconfigure(config):
+    stop_queue_logging()
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    swagger_startup = config.stash.get(swagger_startup_key, None)
+    if swagger_startup is not None:
+        terminalreporter.write_sep('-', 'swagger')
+        terminalreporter.write_line(swagger_startup)
+
+    response_cache = config.stash.get(response_cache_key, None)
+    if response_cache is not None:
+        stats = response_cache.stats()
+        terminalreporter.write_sep('-', 'response cache')
+        terminalreporter.write_line(', '.join(f'{name} - {value}' for name, value in stats.items()))
+
+    cassette = config.stash.get(cassette_key, None)
+    if cassette is None:
+        return
+    report = cassette.report()
+    terminalreporter.write_sep('-', f'cassette {report["path"]} ({report["mode"]})')
+    terminalreporter.write_line(f'{report["entries"]} recorded requests, {len(report["unused"])} unused')
+    for request in report['unused']:
+        terminalreporter.write_line(f'unused: {request}')
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    # the API calls of the fixtures set up for the test are attributed to it as well
+    item.config.stash[latency_budget_recorder_key].current_test = item.nodeid
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """
+    Attaches the request details kept by the 'on_failure' capture mode if a test phase fails and drops them
+    once the test is finished. Attaches the request timings of the test phase to its report.
+    """
+    outcome = yield
+    report = outcome.get_result()
+    if report.failed:
+        attach_pending()
+    if report.when == 'teardown':
+        discard_pending()
+
+    # the requests sent during the setup (e.g. by fixtures) are reported together with the call of the test
+    timings = item.stash.get(pending_timings_key, {})
+    for endpoint, endpoint_timings in item.config.stash[timing_collector_key].take().items():
+        timings.setdefault(endpoint, EndpointTimings()).merge(endpoint_timings)
+    item.stash[pending_timings_key] = timings if report.when == 'setup' and report.passed else {}
+    if item.stash[pending_timings_key] is not timings and timings:
+        report.user_properties.append(('request_timings', {endpoint: endpoint_timings.to_dict()
+                                                           for endpoint, endpoint_timings in timings.items()}))
+
+
+def _latency_budget_scope(request, node):
+    """
+    Counts the API calls made inside a node marked with `latency_budget` and checks its budget once the node
+    is finished. An exceeded budget fails the last test of the node or issues a `LatencyBudgetWarning`, depending
+    on the mode, and the slowest calls are listed.
+    """
+    marker = next((marker for marker in node.own_markers if marker.name == 'latency_budget'), None)
+    budget = LatencyBudget(**marker.kwargs) if marker else None
+    mode = budget and (budget.mode or request.config.getoption('--latency-budget'))
+    if not budget or mode == 'off':
+        yield
+        return
+
+    recorder = request.config.stash[latency_budget_recorder_key]
+    scope = recorder.start(node.nodeid, budget)
+    yield
+    recorder.stop(scope)
+
+    allure.attach(json.dumps(scope.to_dict(), indent=2), 'Latency budget', at.JSON)
+    violations = scope.violations()
+    if not violations:
+        return
+    message = f'Latency budget exceeded: {", ".join(violations)}\n{scope.summary()}'
+    if mode == 'fail':
+        pytest.fail(message, pytrace=False)
+    warnings.warn(LatencyBudgetWarning(message))
+
+
+@pytest.fixture(scope='class', autouse=True)
+def class_latency_budget(request):
+    """
+    Fixture that checks the latency budget of a test class marked with `latency_budget`, e.g.
+    `@pytest.mark.latency_budget(p95_ms=300)`. The budget applies to all API calls made by the tests of the class
+    and their fixtures, the first call of every endpoint is a warm-up call and isn't counted by default.
+    """
+    if request.cls is None:
+        yield
+        return
+    yield from _latency_budget_scope(request, request.node)
+
+
+@pytest.fixture(autouse=True)
+def function_latency_budget(request):
+    """
+    Fixture that checks the latency budget of a test marked with `latency_budget`.
+    """
+    yield from _latency_budget_scope(request, request.node)
+
+
+@pytest.fixture(scope='session')
+def cat_api_stub(request, swagger: Mapping):
+    """
+    Fixture that starts a local stub of TheCatAPI generated from the Swagger specification.
+
+    Latency and error injection are configured by the `--stub-latency`, `--stub-error-rate` and
+    `--stub-error-status` options, the compression of the responses by the `--stub-encodings` option.
+
+    Returns:
+        TheCatAPIStub: The running stub.
+    """
+    stub = TheCatAPIStub(
+        swagger,
+        latency=request.config.getoption('--stub-latency'),
+        error_rate=request.config.getoption('--stub-error-rate'),
+        error_status=request.config.getoption('--stub-error-status'),
+        encodings=tuple(filter(None, request.config.getoption('--stub-encodings').split(','))),
+    ).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture(scope='session')
+def cassette(request):
+    """
+    Fixture that loads the cassette passed with the `--cassette` option. The clients' traffic is recorded to or
+    replayed from it, depending on `--cassette-mode`. Unused recorded requests are listed in the terminal summary.
+
+    Returns:
+        Cassette | None: The cassette or None if the option isn't passed.
+    """
+    path = request.config.getoption('--cassette')
+    if not path:
+        yield None
+        return
+    cassette = Cassette(path, request.config.getoption('--cassette-mode'))
+    request.config.stash[cassette_key] = cassette
+    yield cassette
+    allure.attach(json.dumps(cassette.report(), indent=2), 'Cassette report', at.JSON)
 
 
 @pytest.fixture(scope='session')
-def cat_api_client(request):
+def rate_limiter(request, tmp_path_factory):
+    """
+    Fixture that creates the token bucket shared by all pytest-xdist workers of the run, if the `--rate-limit`
+    option (or `THE_CAT_API_RATE_LIMIT`) is set. Its state file is placed in the temporary directory common
+    to all workers.
+
+    Returns:
+        FileTokenBucket | None: The rate limiter or None if rate limiting is disabled.
+    """
+    rate = request.config.getoption('--rate-limit')
+    if not rate:
+        yield None
+        return
+    base_temp = tmp_path_factory.getbasetemp()
+    # workers get their own subdirectories of the directory of the run
+    root = base_temp.parent if os.getenv('PYTEST_XDIST_WORKER') else base_temp
+    limiter = FileTokenBucket(root / 'the-cat-api-rate-limit.json', rate, request.config.getoption('--rate-burst'))
+    yield limiter
+    allure.attach(f'{limiter.waited:.2f}s', 'Time waited for the rate limiter', at.TEXT)
+
+
+@pytest.fixture(scope='session')
+def response_cache(request):
+    """
+    Fixture that creates the response cache shared by the API clients if the `--response-cache` option is passed.
+    The cache statistics are shown in the terminal summary.
+
+    Returns:
+        ResponseCache | None: The cache or None if caching is disabled.
+    """
+    if not request.config.getoption('--response-cache'):
+        yield None
+        return
+    cache = ResponseCache(ttl=request.config.getoption('--response-cache-ttl'),
+                          revalidate=request.config.getoption('--response-cache-revalidate'))
+    request.config.stash[response_cache_key] = cache
+    yield cache
+    allure.attach(json.dumps(cache.stats(), indent=2), 'Response cache statistics', at.JSON)
+
+
+@pytest.fixture(scope='session')
+def the_cat_api_credentials(request) -> tuple:
+    """
+    Fixture that provides the base URL and the API key the clients are pointed at: TheCatAPI itself or,
+    with the `--stub` option, the local stub.
+
+    Returns:
+        tuple: The base URL and the API key.
+    """
+    if request.config.getoption('--stub'):
+        stub = request.getfixturevalue('cat_api_stub')
+        yield stub.base_url, THE_CAT_API_KEY or 'stub-api-key'
+    else:
+        yield THE_CAT_API_BASE_URL, THE_CAT_API_KEY
+
+
+def make_response(status_code: int, body: bytes = b'[]', headers: dict = None):
+    """
+    Builds a `requests.Response` whose body is already read, for the tests of the code which handles responses.
+    `requests` is imported here, so collecting the tests doesn't load the HTTP stack.
+
+    Args:
+        status_code (int): The status code.
+        body (bytes, optional): The body.
+        headers (dict, optional): The response headers.
+
+    Returns:
+        requests.Response: The response.
+    """
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.headers = CaseInsensitiveDict(headers or {})
+    resp._content = body
+    resp._content_consumed = True
+    return resp
+
+
+def _instrument_client(config, client, cassette: Cassette):
+    """
+    Applies the `--accept-encoding` policy to an API client, passes its request timings to the timing collector,
+    the latency budgets and the soak monitor and replays or records its requests with the cassette.
+    """
+    client.accept_encoding = config.getoption('--accept-encoding')
+    client.timing_hooks += [config.stash[timing_collector_key], config.stash[latency_budget_recorder_key]]
+    soak_monitor = config.stash.get(soak_monitor_key, None)
+    if soak_monitor is not None:
+        client.timing_hooks.append(soak_monitor)
+        soak_monitor.watch(client.session)
+    if cassette:
+        cassette.mount(client.session)
+
+
+@pytest.fixture(scope='session')
+def cat_api_client(request, cassette: Cassette, response_cache: ResponseCache, rate_limiter: FileTokenBucket):
     """
     Fixture that initializes the TheCatAPIClient instance with the base URL and API key for TheCatAPI.
 
@@ -22,25 +401,83 @@ def cat_api_client(request):
     Returns:
         TheCatAPIClient: The initialized API client for interacting with TheCatAPI.
     """
-    allure.attach(THE_CAT_API_BASE_URL, 'TheCatAPI URL', at.TEXT)
-    yield TheCatAPIClient(THE_CAT_API_BASE_URL, THE_CAT_API_KEY)
+    base_url, api_key = request.getfixturevalue('the_cat_api_credentials')
+    allure.attach(base_url, 'TheCatAPI URL', at.TEXT)
+    # the clients load the HTTP stack, so they are imported only when they are needed, not by the collection
+    from interfaces.the_cat_api_client import TheCatAPIClient
+
+    client = TheCatAPIClient(base_url, api_key, response_cache=response_cache, rate_limiter=rate_limiter)
+    _instrument_client(request.config, client, cassette)
+    yield client
+
+
+@pytest.fixture(scope='session')
+def async_cat_api_client(request, cassette: Cassette, response_cache: ResponseCache,
+                         rate_limiter: FileTokenBucket):
+    """
+    Fixture that initializes the AsyncTheCatAPIClient instance with the base URL and API key for TheCatAPI.
+
+    This fixture is scoped to the test session. Use its `batch` method to send all requests of a parametrized
+    test at once, e.g. from a class-scoped fixture, instead of one request per test case.
+
+    Returns:
+        AsyncTheCatAPIClient: The initialized asyncio API client for interacting with TheCatAPI.
+    """
+    base_url, api_key = request.getfixturevalue('the_cat_api_credentials')
+    allure.attach(base_url, 'TheCatAPI URL', at.TEXT)
+    from interfaces.async_the_cat_api_client import AsyncTheCatAPIClient
+
+    client = AsyncTheCatAPIClient(base_url, api_key, THE_CAT_API_MAX_CONCURRENCY, response_cache=response_cache,
+                                  rate_limiter=rate_limiter)
+    _instrument_client(request.config, client.client, cassette)
+    yield client
+    client.close()
 
 
 @pytest.fixture(scope='session')
-def swagger(request) -> dict:
+def image_verifier(cassette: Cassette):
+    """
+    Fixture that initializes the ImageVerifier instance, which downloads the image files referenced by the API
+    responses `IMAGE_VERIFIER_CONCURRENCY` (25 by default) at a time.
+
+    Returns:
+        ImageVerifier: The verifier of image files.
     """
-    Fixture that loads the Swagger YAML file, located in the 'test_data' folder, and replaces all `$ref`
-    occurrences with actual references using the `jsonref.replace_refs` method.
+    from utils.image_verifier import ImageVerifier
+
+    verifier = ImageVerifier(IMAGE_VERIFIER_CONCURRENCY)
+    if cassette:
+        cassette.mount(verifier.session)
+    yield verifier
+    verifier.close()
+
+
+@pytest.fixture(scope='session')
+def swagger(request) -> Mapping:
+    """
+    Fixture that loads the Swagger YAML file, located in the 'test_data' folder, with all `$ref` occurrences
+    replaced by actual references. The dereferenced specification is cached on disk by the hash of the file
+    (see `utils.swagger.load_swagger`), and its load time is shown in the terminal summary.
 
     This fixture is scoped to the test session, meaning it is created once per test session and shared
-    across all tests that need the Swagger data.
+    across all tests that need the Swagger data. The whole specification is attached to the Allure report
+    only with the `--attach-swagger` option.
 
     Returns:
-        dict: The Swagger data with all references replaced.
+        Mapping: The Swagger data with all references replaced, read-only and loaded on the first access to its
+                 parts if it comes from the cache.
     """
-    swagger_path = Path(__file__).parent.parent / 'test_data' / 'swagger.yaml'
-    with open(swagger_path, 'r') as f:
-        swagger_data = yaml.safe_load(f)
-    swagger_data_dereferenced = replace_refs(swagger_data)  # replaces all $ref occurrences with actual references
-    allure.attach(json.dumps(swagger_data_dereferenced, indent=2), 'Swagger', at.JSON)
+    cache_file = swagger_cache_file()
+    cache_hit = cache_file is not None and cache_file.exists()
+    start = time.perf_counter()
+    swagger_data_dereferenced = load_swagger()
+    startup = (f'Swagger loaded in {(time.perf_counter() - start) * 1000:.1f} ms '
+               f'({"from the cache" if cache_hit else "parsed from YAML"})')
+    request.config.stash[swagger_startup_key] = startup
+    allure.attach(startup, 'Swagger load time', at.TEXT)
+
+    if request.config.getoption('--attach-swagger'):
+        plain = swagger_data_dereferenced.to_dict() if isinstance(swagger_data_dereferenced, LazyMapping) \
+            else swagger_data_dereferenced
+        allure.attach(json.dumps(plain, indent=2), 'Swagger', at.JSON)
     yield swagger_data_dereferenced
@@ -0,0 +1,62 @@
+import pytest
+
+SEARCH = {'order': 'ASC', 'limit': 25}
+
+
+@pytest.fixture
+def timed_client(monkeypatch, cat_api_stub) -> tuple:
+    """
+    A client of a stub which compresses its responses with gzip only, together with the timing records of
+    its requests.
+    """
+    from interfaces.api_client import APIClient
+
+    monkeypatch.setattr(cat_api_stub, 'encodings', ('gzip',))
+    client = APIClient(cat_api_stub.base_url)
+    client.accept_encoding = 'gzip'
+    records = []
+    client.timing_hooks.append(records.append)
+    yield client, records
+    client.session.close()
+
+
+def test_decoding_is_timed(timed_client: tuple):
+    client, records = timed_client
+
+    resp = client.get('/images/search', params=SEARCH)
+
+    [record] = records
+    assert len(resp.json()) == 25
+    assert record.encoding == 'gzip'
+    assert 0 < record.body_bytes < record.decoded_bytes == len(resp.content)
+    assert record.decode > 0
+
+
+def test_decoding_isnt_timed_without_private_decoder_api(monkeypatch, timed_client: tuple):
+    """
+    If a version of urllib3 renames its private decoder API, the responses are still decoded and their bytes
+    accounted, only the time of decoding them isn't measured.
+    """
+    import utils.adapters
+
+    client, records = timed_client
+    monkeypatch.setattr(utils.adapters, '_DECODER_ATTRIBUTES', ('_setup_decoder', '_content_decoder'))
+
+    resp = client.get('/images/search', params=SEARCH)
+
+    [record] = records
+    assert len(resp.json()) == 25
+    assert 0 < record.body_bytes < record.decoded_bytes
+    assert record.decode == 0.0
+
+
+def test_decoder_is_wrapped_once_per_response(timed_client: tuple):
+    from utils.adapters import _TimedDecoder
+
+    client, records = timed_client
+
+    resp = client.get('/images/search', params=SEARCH, stream=True)
+
+    assert isinstance(resp.raw._decoder, _TimedDecoder)
+    assert not isinstance(resp.raw._decoder._decoder, _TimedDecoder)
+    assert len(resp.json()) == 25
@@ -0,0 +1,28 @@
+import pytest
+
+from tests.conftest import make_response
+
+
+def make_api_response(status_code: int, body: bytes = b'[]'):
+    from interfaces.api_response import APIResponse
+
+    return APIResponse(make_response(status_code, body, {'Content-Type': 'application/json; charset=utf-8'}))
+
+
+@pytest.mark.parametrize('status_code', [200, 201, 304])
+def test_successful_response_is_truthy(status_code: int):
+    assert make_api_response(status_code)
+
+
+@pytest.mark.parametrize('status_code', [400, 404, 429, 500])
+def test_error_response_is_falsy(status_code: int):
+    resp = make_api_response(status_code)
+
+    assert not resp
+    assert resp.ok is False
+
+
+def test_iterating_yields_the_body():
+    body = b'[' + b'{"id": "abc"}, ' * 20 + b'{}]'
+
+    assert b''.join(make_api_response(200, body)) == body
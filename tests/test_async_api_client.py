@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+SEARCH = {'order': 'ASC'}
+
+
+@pytest.fixture
+def async_client(cat_api_stub):
+    from interfaces.api_client import APIClient
+    from interfaces.async_api_client import AsyncAPIClient
+
+    client = AsyncAPIClient(APIClient(cat_api_stub.base_url), max_concurrency=3)
+    yield client
+    client.close()
+
+
+def test_gather_keeps_concurrency_cap(async_client):
+    in_flight, peak = 0, 0
+
+    async def tracked(aw):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            # keeps every request in flight long enough for the others to start
+            await asyncio.sleep(0.02)
+            return await aw
+        finally:
+            in_flight -= 1
+
+    responses = async_client.batch(*(tracked(async_client.get('/images/search', params=SEARCH)) for _ in range(10)))
+
+    assert [resp.status_code for resp in responses] == [200] * 10
+    assert peak == async_client.max_concurrency
+
+
+def test_results_keep_order_of_requests(async_client):
+    limits = [5, 1, 4, 2, 3]
+
+    responses = async_client.batch(*(async_client.get('/images/search', params={**SEARCH, 'limit': limit})
+                                     for limit in limits))
+
+    assert [len(resp.json()) for resp in responses] == limits
+
+
+def test_failed_request_is_raised(async_client):
+    import requests
+
+    from interfaces.api_client import APIClient
+    from interfaces.async_api_client import AsyncAPIClient
+
+    # nothing listens on the port, so the connection is refused
+    unreachable = AsyncAPIClient(APIClient('http://127.0.0.1:1/v1'))
+
+    with pytest.raises(requests.ConnectionError):
+        async_client.batch(async_client.get('/images/search', params=SEARCH), unreachable.get('/images/search'))
+
+
+def test_failed_request_is_returned_with_return_exceptions(async_client):
+    import requests
+
+    from interfaces.api_client import APIClient
+    from interfaces.async_api_client import AsyncAPIClient
+
+    unreachable = AsyncAPIClient(APIClient('http://127.0.0.1:1/v1'))
+
+    first, failed, last = async_client.batch(async_client.get('/images/search', params=SEARCH),
+                                             unreachable.get('/images/search'),
+                                             async_client.get('/images/search', params=SEARCH),
+                                             return_exceptions=True)
+
+    assert (first.status_code, last.status_code) == (200, 200)
+    assert isinstance(failed, requests.ConnectionError)
+
+
+def test_batch_in_running_loop_is_rejected(async_client):
+    request = async_client.get('/images/search', params=SEARCH)
+
+    async def main():
+        with pytest.raises(RuntimeError, match='await gather'):
+            async_client.batch(request)
+
+    asyncio.run(main())
+    # the coroutine was closed without being sent
+    assert request.cr_frame is None
+
+
+def test_gather_in_running_loop(async_client):
+    async def main():
+        return await async_client.gather(*(async_client.get('/images/search', params={**SEARCH, 'limit': limit})
+                                           for limit in (2, 1)))
+
+    assert [len(resp.json()) for resp in asyncio.run(main())] == [2, 1]
+
+
+def test_invalid_concurrency_is_rejected(cat_api_stub):
+    from interfaces.api_client import APIClient
+    from interfaces.async_api_client import AsyncAPIClient
+
+    with pytest.raises(ValueError, match='max_concurrency'):
+        AsyncAPIClient(APIClient(cat_api_stub.base_url), max_concurrency=0)
@@ -0,0 +1,125 @@
+import allure
+import allure_commons
+import pytest
+
+from utils.capture import (MAX_PENDING, CapturePolicy, attach_pending, discard_pending, dropped_count, pending_count,
+                           truncate)
+
+
+class AttachmentListener:
+    """
+    An Allure listener which collects the attachments, like `allure-pytest` does with `--alluredir`.
+    """
+
+    def __init__(self):
+        self.attachments = []
+
+    @allure_commons.hookimpl
+    def attach_data(self, body, name, attachment_type, extension):
+        self.attachments.append((name, body))
+
+
+@pytest.fixture
+def attachments():
+    listener = AttachmentListener()
+    allure_commons.plugin_manager.register(listener)
+    discard_pending()
+    yield listener.attachments
+    discard_pending()
+    allure_commons.plugin_manager.unregister(listener)
+
+
+def capture_request(policy: CapturePolicy, body: str = 'body'):
+    capture = policy.start()
+    if capture:
+        capture.add('Response Body', lambda: body)
+        capture.commit()
+    return capture
+
+
+@pytest.mark.parametrize('mode, captured', [('off', False), ('full', True), ('on_failure', True)])
+def test_modes_start_capture(attachments: list, mode: str, captured: bool):
+    assert (CapturePolicy(mode).start() is not None) == captured
+
+
+def test_full_mode_attaches_right_away(attachments: list):
+    capture_request(CapturePolicy('full'), 'cat')
+
+    assert attachments == [('Response Body', 'cat')]
+    assert pending_count() == 0
+
+
+def test_on_failure_mode_keeps_captures_until_outcome(attachments: list):
+    rendered = []
+    capture = CapturePolicy('on_failure').start()
+    capture.add('Response Body', lambda: rendered.append(1) or 'cat')
+    capture.commit()
+
+    assert (attachments, rendered, pending_count()) == ([], [], 1)
+    attach_pending()
+    assert attachments == [('Response Body', 'cat')]
+    assert pending_count() == 0
+
+
+def test_discarded_captures_are_not_rendered(attachments: list):
+    rendered = []
+    capture = CapturePolicy('on_failure').start()
+    capture.add('Response Body', lambda: rendered.append(1) or 'cat')
+    capture.commit()
+
+    discard_pending()
+    attach_pending()
+
+    assert (attachments, rendered, pending_count()) == ([], [], 0)
+
+
+def test_dropped_captures_are_counted_and_noted(attachments: list):
+    policy = CapturePolicy('on_failure')
+    for index in range(MAX_PENDING + 3):
+        capture_request(policy, str(index))
+
+    assert (pending_count(), dropped_count()) == (MAX_PENDING, 3)
+    attach_pending()
+    assert attachments[0] == ('Dropped captures',
+                              f'3 earlier capture(s) of the test were dropped, only the last {MAX_PENDING} are kept')
+    assert [body for _, body in attachments[1:]] == [str(index) for index in range(3, MAX_PENDING + 3)]
+    assert dropped_count() == 0
+
+
+def test_sampling_is_reproducible_with_seed(attachments: list):
+    def sampled(seed: int) -> list:
+        policy = CapturePolicy('sampled', sample_rate=0.3, seed=seed)
+        return [policy.start() is not None for _ in range(200)]
+
+    assert sampled(7) == sampled(7)
+    assert sampled(7) != sampled(8)
+    assert 30 < sum(sampled(7)) < 90
+
+
+@pytest.mark.parametrize('sample_rate, captured', [(0, 0), (1, 50)])
+def test_sample_rate_bounds(attachments: list, sample_rate: float, captured: int):
+    policy = CapturePolicy('sampled', sample_rate=sample_rate)
+
+    assert sum(policy.start() is not None for _ in range(50)) == captured
+
+
+def test_attachments_are_truncated(attachments: list):
+    capture_request(CapturePolicy('full', max_body_size=3), 'catalogue')
+
+    assert attachments == [('Response Body', 'cat... [truncated 6 characters]')]
+
+
+@pytest.mark.parametrize('text, max_size, truncated', [
+    ('cat', None, 'cat'),
+    ('cat', 3, 'cat'),
+    ('cats', 3, 'cat... [truncated 1 characters]'),
+    ('', 0, ''),
+])
+def test_truncate(text: str, max_size: int, truncated: str):
+    assert truncate(text, max_size) == truncated
+
+
+@pytest.mark.parametrize('kwargs', [{'mode': 'always'}, {'sample_rate': -0.1}, {'sample_rate': 1.5}])
+def test_invalid_policy_is_rejected(kwargs: dict):
+    with pytest.raises(ValueError):
+        CapturePolicy(**kwargs)
@@ -0,0 +1,57 @@
+import pytest
+
+from utils.cassette import Cassette, CassetteMiss
+
+
+@pytest.fixture(scope='module')
+def image_url(cat_api_stub) -> str:
+    import requests
+
+    resp = requests.get(f'{cat_api_stub.base_url}/images/search', params={'order': 'ASC', 'limit': 1})
+    return resp.json()[0]['url']
+
+
+def mounted_session(cassette: Cassette):
+    import requests
+
+    session = requests.Session()
+    cassette.mount(session)
+    return session
+
+
+def test_streamed_response_is_recorded_once_read(tmp_path, image_url: str):
+    cassette = Cassette(tmp_path / 'cassette.jsonl', 'record')
+    session = mounted_session(cassette)
+
+    with session.get(image_url, stream=True) as resp:
+        assert cassette.report()['entries'] == 0
+        body = b''.join(resp.iter_content(1024))
+
+    assert cassette.report()['entries'] == 1
+    replayed = mounted_session(Cassette(tmp_path / 'cassette.jsonl', 'replay')).get(image_url, stream=True)
+    assert replayed.content == body
+
+
+def test_streamed_response_closed_early_is_not_recorded(tmp_path, image_url: str):
+    cassette = Cassette(tmp_path / 'cassette.jsonl', 'record')
+    session = mounted_session(cassette)
+
+    with session.get(image_url, stream=True) as resp:
+        next(resp.iter_content(16))
+
+    assert cassette.report()['entries'] == 0
+
+
+def test_response_is_replayed_by_request(tmp_path, cat_api_stub):
+    url = f'{cat_api_stub.base_url}/images/search'
+    params = {'order': 'ASC', 'limit': 2}
+    recorded = mounted_session(Cassette(tmp_path / 'cassette.jsonl', 'record')).get(url, params=params)
+
+    cassette = Cassette(tmp_path / 'cassette.jsonl', 'replay')
+    session = mounted_session(cassette)
+    replayed = session.get(url, params=params)
+
+    assert (replayed.status_code, replayed.json()) == (recorded.status_code, recorded.json())
+    assert cassette.unused() == []
+    with pytest.raises(CassetteMiss):
+        session.get(url, params={**params, 'page': 1})
@@ -0,0 +1,137 @@
+from itertools import combinations, product
+from types import SimpleNamespace
+
+import pytest
+
+from utils.fuzz import EquivalenceClass, FuzzCase, QueryParameterFuzzer, collapse, equivalence_classes, pairwise
+
+SWAGGER = {
+    'paths': {
+        '/images/search': {
+            'get': {
+                'parameters': [
+                    {'name': 'limit', 'in': 'query', 'schema': {'type': 'integer', 'minimum': 1, 'maximum': 25}},
+                    {'name': 'order', 'in': 'query', 'schema': {'type': 'string', 'enum': ['ASC', 'DESC', 'RANDOM']}},
+                    {'name': 'page', 'in': 'query', 'schema': {'type': 'integer', 'minimum': 0}},
+                    {'name': 'x-api-key', 'in': 'header', 'schema': {'type': 'string'}},
+                ],
+                'responses': {'400': {'description': '"limit" must be a number'}},
+            },
+        },
+    },
+}
+
+
+def uncovered_pairs(domains: list, rows: list) -> set:
+    pairs = {(i, a, j, b) for i, j in combinations(range(len(domains)), 2)
+             for a in domains[i] for b in domains[j]}
+    return pairs - {(i, row[i], j, row[j]) for row in rows for i, j in combinations(range(len(domains)), 2)}
+
+
+@pytest.mark.parametrize('sizes, most_rows', [
+    ((2, 2), 4),
+    ((1, 3, 2), 6),
+    ((3, 3, 3), 10),
+    ((2, 5, 3, 4), 20),
+    ((4, 4, 4, 4, 4), 16),
+])
+def test_pairwise_covers_every_pair(sizes: tuple, most_rows: int):
+    domains = [[f'{index}-{value}' for value in range(size)] for index, size in enumerate(sizes)]
+
+    rows = pairwise(domains)
+
+    assert uncovered_pairs(domains, rows) == set()
+    assert all(row in product(*domains) for row in rows)
+    # far fewer than all combinations (1024 of the five domains)
+    assert len(rows) <= most_rows
+
+
+def test_pairwise_of_single_domain():
+    assert pairwise([[1, 2]]) == [(1,), (2,)]
+    assert pairwise([]) == []
+
+
+def test_equivalence_classes_of_integer_range():
+    classes = equivalence_classes('limit', {'type': 'integer', 'minimum': 1, 'maximum': 25})
+
+    assert [(c.label, c.value, c.valid) for c in classes] == [
+        ('absent', None, True), ('minimum', 1, True), ('above minimum', 2, True), ('below minimum', 0, False),
+        ('maximum', 25, True), ('above maximum', 26, False), ('not an integer', 'qwerty', False)]
+
+
+def test_invalid_cases_are_collapsed_by_first_invalid_class():
+    limit = equivalence_classes('limit', {'type': 'integer', 'minimum': 1})
+    order = equivalence_classes('order', {'enum': ['ASC', 'DESC']})
+    below_minimum, ascending, descending = limit[3], order[1], order[2]
+
+    cases = [FuzzCase([below_minimum, ascending]), FuzzCase([below_minimum, descending]), FuzzCase([ascending])]
+
+    assert collapse(cases) == [cases[0], cases[2]]
+
+
+def test_dependent_parameter_without_dependency_is_collapsed():
+    page = [EquivalenceClass('page', 'minimum', 0), EquivalenceClass('page', 'above minimum', 1)]
+    random_order = EquivalenceClass('order', 'RANDOM', 'RANDOM')
+    ascending = EquivalenceClass('order', 'ASC', 'ASC')
+
+    cases = [FuzzCase([page[0], random_order]), FuzzCase([page[1], random_order]),
+             FuzzCase([page[0], ascending]), FuzzCase([page[1], ascending])]
+
+    # the page of a random search is ignored, so only the ordered searches differ by the page
+    assert collapse(cases) == [cases[0], cases[2], cases[3]]
+
+
+def test_fuzzer_cases_cover_valid_pairs_and_invalid_classes():
+    fuzzer = QueryParameterFuzzer(SWAGGER, '/images/search')
+    cases = fuzzer.cases()
+
+    assert set(fuzzer.classes) == {'limit', 'order', 'page'}
+    invalid = {(c.parameter, c.label) for case in cases if not case.valid for c in case.classes}
+    assert invalid == {('limit', 'below minimum'), ('limit', 'above maximum'), ('limit', 'not an integer'),
+                       ('order', 'not in enum'), ('page', 'below minimum'), ('page', 'not an integer')}
+    assert all(len(case.classes) == 1 for case in cases if not case.valid)
+    assert len({case.signature for case in cases}) == len(cases)
+
+
+def test_fuzzer_budget_cuts_cases():
+    assert len(QueryParameterFuzzer(SWAGGER, '/images/search', ['limit'], budget=3).cases()) == 3
+
+
+@pytest.mark.parametrize('kwargs', [{'parameters': ['x-api-key']}, {'budget': 0}])
+def test_invalid_fuzzer_is_rejected(kwargs: dict):
+    with pytest.raises(ValueError):
+        QueryParameterFuzzer(SWAGGER, '/images/search', **kwargs)
+
+
+def invalid_case(parameter: str, label: str) -> FuzzCase:
+    fuzzer = QueryParameterFuzzer(SWAGGER, '/images/search')
+    return next(case for case in fuzzer.cases()
+                if not case.valid and (case.classes[0].parameter, case.classes[0].label) == (parameter, label))
+
+
+@pytest.mark.parametrize('status, text, errors', [
+    (400, '"limit" must be a number', []),
+    (400, 'Bad Request', ["Response text 'Bad Request' instead of '\"limit\" must be a number'"]),
+    (200, '[]', ['Status code 200 instead of 400']),
+])
+def test_rejected_invalid_class_expects_bad_request(status: int, text: str, errors: list):
+    fuzzer = QueryParameterFuzzer(SWAGGER, '/images/search')
+
+    resp = SimpleNamespace(status_code=status, text=text)
+
+    assert fuzzer.check(invalid_case('limit', 'below minimum'), resp) == errors
+
+
+@pytest.mark.parametrize('status, errors', [(200, []), (400, []), (404, []), (500, ['Status code 500'])])
+def test_other_invalid_class_only_expects_no_server_error(status: int, errors: list):
+    fuzzer = QueryParameterFuzzer(SWAGGER, '/images/search')
+
+    assert fuzzer.check(invalid_case('order', 'not in enum'), SimpleNamespace(status_code=status, text='')) == errors
+
+
+def test_rejected_invalid_classes_can_be_overridden():
+    fuzzer = QueryParameterFuzzer(SWAGGER, '/images/search', rejected={'order': ('not in enum',)})
+    resp = SimpleNamespace(status_code=200, text='[]')
+
+    assert fuzzer.check(invalid_case('order', 'not in enum'), resp) == ['Status code 200 instead of 400']
+    assert fuzzer.check(invalid_case('limit', 'below minimum'), resp) == []
@@ -0,0 +1,70 @@
+import math
+import random
+
+import pytest
+
+from utils.histogram import LatencyHistogram
+
+PERCENTILES = (1, 25, 50, 90, 95, 99, 99.9, 100)
+
+
+def exact_percentile(values_us: list, percentile: float) -> float:
+    """
+    Returns the nearest-rank percentile of the values in microseconds, in milliseconds like the histogram.
+    """
+    ordered = sorted(values_us)
+    return ordered[max(math.ceil(percentile / 100 * len(ordered)), 1) - 1] / 1000
+
+
+def random_latencies(size: int) -> list:
+    # log-uniform from 10 us to 10 s, so every magnitude has values
+    rng = random.Random(7)
+    return [10 ** rng.uniform(-5, 1) for _ in range(size)]
+
+
+@pytest.mark.parametrize('significant_figures', [1, 2, 3])
+def test_percentile_error_is_bounded(significant_figures: int):
+    latencies = random_latencies(10000)
+    histogram = LatencyHistogram(significant_figures)
+    for seconds in latencies:
+        histogram.record(seconds)
+    values_us = [int(seconds * 1e6) for seconds in latencies]
+
+    for percentile in PERCENTILES:
+        exact = exact_percentile(values_us, percentile)
+        assert exact <= histogram.percentile(percentile) <= exact * (1 + 10 ** -significant_figures), percentile
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for microseconds in range(1, 101):
+        histogram.record(microseconds / 1e6)
+
+    assert histogram.percentile(50) == 0.05
+    assert histogram.summary() == {'count': 100, 'min_ms': 0.001, 'mean_ms': 0.0505, 'max_ms': 0.1,
+                                   'p50_ms': 0.05, 'p95_ms': 0.095, 'p99_ms': 0.099}
+
+
+def test_merged_histogram_equals_recorded_one():
+    latencies = random_latencies(3000)
+    merged, recorded = LatencyHistogram(), LatencyHistogram()
+    for part in (latencies[:1000], latencies[1000:]):
+        histogram = LatencyHistogram()
+        for seconds in part:
+            histogram.record(seconds)
+        merged.merge(LatencyHistogram.from_dict(histogram.to_dict()))
+    for seconds in latencies:
+        recorded.record(seconds)
+
+    assert merged.to_dict() == recorded.to_dict()
+
+
+def test_histograms_of_different_precision_are_not_merged():
+    with pytest.raises(ValueError):
+        LatencyHistogram(2).merge(LatencyHistogram(3))
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+
+    assert histogram.percentile(50) is None and histogram.mean is None
@@ -0,0 +1,85 @@
+import struct
+
+import pytest
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+CHUNK_SIZES = [1, 2, 3, 7, 64, 1 << 20]
+
+
+def make_png(width: int, height: int) -> bytes:
+    header = struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00'
+    chunks = struct.pack('>I', len(header)) + b'IHDR' + header + b'\x00' * 4
+    data = struct.pack('>I', 3) + b'IDAT' + b'abc' + b'\x00' * 4
+    return PNG_SIGNATURE + chunks + data + b'\x00\x00\x00\x00IEND\xaeB`\x82'
+
+
+def make_gif(width: int, height: int) -> bytes:
+    return b'GIF89a' + struct.pack('<HH', width, height) + b'\x00\x00\x00' + b'\x2c' + b'\x00' * 20 + b'\x3b'
+
+
+def make_jpeg(width: int, height: int, app_size: int = 14) -> bytes:
+    app0 = b'\xff\xe0' + struct.pack('>H', app_size + 2) + b'J' * app_size
+    restart = b'\xff\xd0'
+    sof0 = b'\xff\xc0' + struct.pack('>HBHH', 17, 8, height, width) + b'\x03' + b'\x00' * 9
+    scan = b'\xff\xda' + struct.pack('>H', 4) + b'\x00\x00' + b'\x12\x34'
+    # a fill byte before the start of frame
+    return b'\xff\xd8' + app0 + restart + b'\xff' + sof0 + scan + b'\xff\xd9'
+
+
+FILES = {
+    'png': make_png(640, 480),
+    'gif': make_gif(320, 200),
+    'jpeg': make_jpeg(1024, 768),
+    # an application segment spanning many chunks is skipped without being buffered
+    'jpeg-large-segment': make_jpeg(800, 600, app_size=60000),
+}
+DIMENSIONS = {'png': (640, 480), 'gif': (320, 200), 'jpeg': (1024, 768), 'jpeg-large-segment': (800, 600)}
+
+
+def parse(data: bytes, chunk_size: int):
+    from utils.image_verifier import ImageHeaderParser
+
+    parser = ImageHeaderParser()
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start:start + chunk_size])
+    return parser
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+@pytest.mark.parametrize('name', FILES)
+def test_header_is_parsed_in_any_chunks(name: str, chunk_size: int):
+    parser = parse(FILES[name], chunk_size)
+
+    assert parser.error is None
+    assert (parser.format, parser.width, parser.height) == (name.partition('-')[0], *DIMENSIONS[name])
+    assert parser.complete()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5])
+@pytest.mark.parametrize('name', FILES)
+def test_truncated_file_is_incomplete(name: str, chunk_size: int):
+    parser = parse(FILES[name][:-3], chunk_size)
+
+    assert (parser.width, parser.height) == DIMENSIONS[name]
+    assert not parser.complete()
+
+
+@pytest.mark.parametrize('name, size', [('png', 20), ('gif', 8), ('jpeg', 25)])
+def test_file_truncated_before_dimensions_has_none(name: str, size: int):
+    parser = parse(FILES[name][:size], 1)
+
+    assert parser.format == name and parser.width is None and parser.error is None
+    assert not parser.done
+
+
+@pytest.mark.parametrize('data, error', [
+    (b'BM' + b'\x00' * 30, 'Unknown image format'),
+    (PNG_SIGNATURE + struct.pack('>I', 0) + b'IDAT' + b'\x00' * 12, 'IHDR'),
+    (b'\xff\xd8\xff\xda\x00\x04\x00\x00', 'no start of frame'),
+    (b'\xff\xd8\x00\x00', 'Invalid JPEG marker'),
+])
+def test_invalid_header_is_reported(data: bytes, error: str):
+    parser = parse(data, 3)
+
+    assert error in parser.error
+    assert parser.done and parser.width is None
@@ -1,25 +1,50 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from itertools import islice
+from typing import TYPE_CHECKING
+
 import allure
 import pytest
 
-from interfaces.the_cat_api_client import TheCatAPIClient
-from utils.validators import validate_response
+from utils.fuzz import QueryParameterFuzzer
+from utils.validators import validate_response, validate_response_items
+
+if TYPE_CHECKING:
+    from interfaces.async_the_cat_api_client import AsyncTheCatAPIClient
+    from interfaces.the_cat_api_client import TheCatAPIClient
+    from utils.image_verifier import ImageVerifier
+
+VALID_LIMIT_CASES = [
+    (1, 1),
+    (15, 15),
+    (25, 25),
+    # 25 is the highest value for the limit according to the documentation,
+    # so everything above has to return only 25 images
+    (26, 25),
+    (50, 25),
+]
+# keeps the number of requests of catalogue-wide checks within the quota
+MAX_PAGINATED_IMAGES = 100
+FUZZED_SEARCH_PARAMETERS = ['size', 'mime_types', 'format', 'order', 'page', 'limit', 'has_breeds']
 
 
 @allure.suite('/image/search Endpoint')
 @pytest.mark.image_search
+@pytest.mark.latency_budget(p95_ms=1500)
 class TestImagesSearch:
     """
     Test suite for the `/images/search` endpoint of TheCatAPI.
     """
 
     @allure.title('Validate schema for authorized user\'s image search')
-    def test_schema_validation_for_authorized_user(self, cat_api_client: TheCatAPIClient, swagger: dict):
+    def test_schema_validation_for_authorized_user(self, cat_api_client: TheCatAPIClient, swagger: Mapping):
         """
         Validates the schema of the response for an authorized user when searching for images.
 
         Args:
             cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
-            swagger (dict): The Swagger specification fixture.
+            swagger (Mapping): The Swagger specification fixture.
 
         Asserts:
             - Response status code is 200.
@@ -28,10 +53,10 @@ class TestImagesSearch:
         resp = cat_api_client.images_search()
 
         assert resp.status_code == 200, 'Incorrect status code'
-        validate_response(resp.json(), ['components', 'schemas', 'ImagesSearchAuthorizedResponse'], swagger)
+        validate_response_items(resp.json(), ['components', 'schemas', 'ImagesSearchAuthorizedResponse'], swagger)
 
     @allure.title('Validate schema for unauthorized user\'s image search')
-    def test_schema_validation_for_not_authorized_user(self, cat_api_client: TheCatAPIClient, swagger: dict):
+    def test_schema_validation_for_not_authorized_user(self, cat_api_client: TheCatAPIClient, swagger: Mapping):
         """
         Validates the schema of the response for an unauthorized user when searching for images.
 
@@ -39,7 +64,7 @@ class TestImagesSearch:
 
         Args:
             cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
-            swagger (dict): The Swagger specification fixture.
+            swagger (Mapping): The Swagger specification fixture.
 
         Asserts:
             - Response status code is 200.
@@ -53,28 +78,17 @@ class TestImagesSearch:
             cat_api_client.session.headers.update({'x-api-key': api_key})
 
         assert resp.status_code == 200, 'Incorrect status code'
-        validate_response(resp.json(), ['components', 'schemas', 'ImagesSearchNotAuthorizedResponse'], swagger)
+        validate_response_items(resp.json(), ['components', 'schemas', 'ImagesSearchNotAuthorizedResponse'], swagger)
     
-    @pytest.mark.parametrize(
-        'limit, num_of_returned_images', 
-        [
-            (1, 1),
-            (15, 15),
-            (25, 25),
-            # 25 is the highest value for the limit according to the documentation,
-            # so everything above has to return only 25 images
-            (26, 25),
-            (50, 25),
-        ]
-    )
+    @pytest.mark.parametrize('limit, num_of_returned_images', VALID_LIMIT_CASES)
     @allure.title('Validate \'limit\' parameter in image search')
-    def test_valid_limit_parameter(self, cat_api_client: TheCatAPIClient, swagger: dict, limit: int, num_of_returned_images: int):
+    def test_valid_limit_parameter(self, cat_api_client: TheCatAPIClient, swagger: Mapping, limit: int, num_of_returned_images: int):
         """
         Validates that the `limit` parameter works as expected in the `/images/search` endpoint.
 
         Args:
             cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
-            swagger (dict): The Swagger specification fixture.
+            swagger (Mapping): The Swagger specification fixture.
             limit (int): The requested number of images.
             num_of_returned_images (int): The expected number of returned images.
 
@@ -88,13 +102,13 @@ class TestImagesSearch:
 
     @pytest.mark.parametrize('has_breeds', [True, False])
     @allure.title('Validate \'has_breeds\' parameter in image search')
-    def test_valid_has_breeds_parameter(self, cat_api_client: TheCatAPIClient, swagger: dict, has_breeds: bool):
+    def test_valid_has_breeds_parameter(self, cat_api_client: TheCatAPIClient, swagger: Mapping, has_breeds: bool):
         """
         Validates that the `has_breeds` parameter works as expected in the `/images/search` endpoint.
 
         Args:
             cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
-            swagger (dict): The Swagger specification fixture.
+            swagger (Mapping): The Swagger specification fixture.
             has_breeds (bool): Indicates whether images should have associated breeds.
 
         Asserts:
@@ -115,6 +129,45 @@ class TestImagesSearch:
                     incorrect_images.append(image['id'])
         assert incorrect_images == [], f'Some image(s){' don\'t' if has_breeds else ''} have breads'
 
+    @allure.title('Validate \'has_breeds\' parameter across paginated image search')
+    def test_has_breeds_parameter_across_pages(self, cat_api_client: TheCatAPIClient, swagger: Mapping):
+        """
+        Validates that every image found with `has_breeds=1` has breeds, walking the results page by page.
+
+        Args:
+            cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
+            swagger (Mapping): The Swagger specification fixture.
+
+        Asserts:
+            - All images of the first `MAX_PAGINATED_IMAGES` results have non-empty breeds.
+        """
+        images = cat_api_client.images_iter(params={'has_breeds': 1})
+        incorrect_images = [image['id'] for image in islice(images, MAX_PAGINATED_IMAGES) if not image.get('breeds')]
+        assert incorrect_images == [], f'Some image(s) don\'t have breeds: {incorrect_images}'
+
+    @allure.title('Validate image files of a full page of search results')
+    def test_image_files(self, cat_api_client: TheCatAPIClient, image_verifier: ImageVerifier):
+        """
+        Validates that the images found by a search are served as valid files of the searched mime types, with
+        the reported dimensions.
+
+        Args:
+            cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
+            image_verifier (ImageVerifier): The image file verifier fixture.
+
+        Asserts:
+            - Response status code is 200.
+            - Every image file is downloaded, has a JPEG or PNG header with the reported width and height
+              and isn't truncated.
+        """
+        mime_types = ['jpg', 'png']
+        resp = cat_api_client.images_search(params={'limit': 25, 'mime_types': ','.join(mime_types)})
+        assert resp.status_code == 200, 'Incorrect status code'
+
+        results = image_verifier.verify(resp.json(), mime_types)
+        invalid_images = {result.image_id: result.errors for result in results if not result.ok}
+        assert invalid_images == {}, f'Some image file(s) are invalid: {invalid_images}'
+
     @pytest.mark.parametrize(
         'parameter, value',
         [
@@ -125,13 +178,13 @@ class TestImagesSearch:
         ]
     )
     @allure.title('Validate invalid query parameters in image search')
-    def test_invalid_query_parameter(self, cat_api_client: TheCatAPIClient, swagger: dict, parameter: str, value):
+    def test_invalid_query_parameter(self, cat_api_client: TheCatAPIClient, swagger: Mapping, parameter: str, value):
         """
         Validates the behavior of the `/images/search` endpoint with invalid query parameters.
 
         Args:
             cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
-            swagger (dict): The Swagger specification fixture.
+            swagger (Mapping): The Swagger specification fixture.
             parameter (str): The name of the query parameter.
             value: The invalid value for the query parameter.
 
@@ -145,22 +198,48 @@ class TestImagesSearch:
         assert resp.status_code == 400, 'Incorrect status code'
         assert resp.text == expected_response_text, 'Incorrect response text'
 
+    @allure.title('Fuzz query parameters in image search')
+    def test_query_parameters_fuzzing(self, request, async_cat_api_client: AsyncTheCatAPIClient, swagger: Mapping):
+        """
+        Sends the pairwise combinations of the valid and boundary values of the query parameters of the
+        `/images/search` endpoint, and every invalid value on its own, as one concurrent batch of at most
+        `--fuzz-budget` requests.
+
+        Args:
+            request: The pytest request object.
+            async_cat_api_client (AsyncTheCatAPIClient): The asyncio TheCatAPI client fixture.
+            swagger (Mapping): The Swagger specification fixture.
+
+        Asserts:
+            - Requests with valid parameters return status code 200 and images matching `limit`, `has_breeds`
+              and `mime_types`.
+            - Requests with an invalid value the API is known to reject return status code 400 with the expected
+              error description, the other invalid values don't cause a server error.
+        """
+        fuzzer = QueryParameterFuzzer(swagger, '/images/search', FUZZED_SEARCH_PARAMETERS,
+                                      request.config.getoption('--fuzz-budget'))
+        results = fuzzer.run(async_cat_api_client)
+
+        failed_cases = {str(result.case.params): result.errors for result in results if not result.ok}
+        assert failed_cases == {}, f'Some fuzz case(s) failed: {failed_cases}'
+
 
 @allure.suite('/images/{image_id} Endpoint')
 @pytest.mark.image_get
+@pytest.mark.latency_budget(p95_ms=1000)
 class TestImagesGet:
     """
     Test suite for the `/images/{image_id}` endpoint of TheCatAPI.
     """
 
     @allure.title('Validate schema for authorized user\'s image retrieval')
-    def test_schema_validation_for_authorized_user(self, cat_api_client: TheCatAPIClient, swagger: dict):
+    def test_schema_validation_for_authorized_user(self, cat_api_client: TheCatAPIClient, swagger: Mapping):
         """
         Validates the schema of the response for an authorized user retrieving an image by ID.
 
         Args:
             cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
-            swagger (dict): The Swagger specification fixture.
+            swagger (Mapping): The Swagger specification fixture.
 
         Asserts:
             - Response status code is 200.
@@ -173,13 +252,13 @@ class TestImagesGet:
         validate_response(resp.json(), ['components', 'schemas', 'ImageAuthorizedResponse'], swagger)
 
     @allure.title('Validate schema for unauthorized user\'s image retrieval')
-    def test_schema_validation_for_unauthorized_user(self, cat_api_client: TheCatAPIClient, swagger: dict):
+    def test_schema_validation_for_unauthorized_user(self, cat_api_client: TheCatAPIClient, swagger: Mapping):
         """
         Validates the schema of the response for an unauthorized user retrieving an image by ID.
 
         Args:
             cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
-            swagger (dict): The Swagger specification fixture.
+            swagger (Mapping): The Swagger specification fixture.
 
         Asserts:
             - Response status code is 200.
@@ -193,13 +272,13 @@ class TestImagesGet:
 
     @pytest.mark.parametrize('image_id', ['qwerty12345', '12345', 'q' * 10000])
     @allure.title('Validate incorrect image ID in image retrieval')
-    def test_incorrect_image_id_parameter(self, cat_api_client: TheCatAPIClient, swagger: dict, image_id: str):
+    def test_incorrect_image_id_parameter(self, cat_api_client: TheCatAPIClient, swagger: Mapping, image_id: str):
         """
         Validates the behavior of the `/images/{image_id}` endpoint with invalid image IDs.
 
         Args:
             cat_api_client (TheCatAPIClient): TheCatAPI client fixture.
-            swagger (dict): The Swagger specification fixture.
+            swagger (Mapping): The Swagger specification fixture.
             image_id (str): The invalid image ID.
 
         Asserts:
@@ -0,0 +1,119 @@
+import pytest
+
+# the helpers of the generated test modules, which feed timing records to the latency budgets of the run
+RECORDS = '''
+    import pytest
+
+    from tests.conftest import latency_budget_recorder_key
+    from utils.timing import TimingRecord
+
+
+    @pytest.fixture
+    def call(request):
+        def record(latency_ms, endpoint='/images/search', source='network', attempts=1):
+            record = TimingRecord('GET', endpoint)
+            record.status, record.source, record.attempts = 200, source, attempts
+            record.ttfb = latency_ms / 1000
+            request.config.stash[latency_budget_recorder_key](record)
+        return record
+'''
+
+
+def run(pytester, test: str, *args):
+    pytester.makepyfile(test_budget=RECORDS + test)
+    return pytester.runpytest('-p', 'tests.conftest', '--html=report.html', '--durations-db=', *args)
+
+
+def test_warmup_calls_are_ignored(pytester):
+    result = run(pytester, '''
+    @pytest.mark.latency_budget(max_ms=100)
+    def test_calls(call):
+        call(500)
+        call(50)
+        call(500, endpoint='/breeds')
+        call(50, endpoint='/breeds')
+        call(150, endpoint='/breeds')
+    ''', '--latency-budget=fail')
+
+    # only the first call of every endpoint is ignored
+    result.assert_outcomes(passed=1, errors=1)
+    result.stdout.fnmatch_lines(['*max 150.0 ms > 100 ms*', '*3 calls counted (2 warm-up calls ignored*',
+                                 '*150.0 ms GET /breeds -> 200 in test_budget.py::test_calls*'])
+
+
+def test_cached_and_replayed_calls_are_ignored(pytester):
+    result = run(pytester, '''
+    @pytest.mark.latency_budget(p50_ms=100, warmup=0)
+    def test_calls(call):
+        call(500, source='cache')
+        call(500, source='replay')
+        call(50)
+    ''', '--latency-budget=fail')
+
+    result.assert_outcomes(passed=1)
+
+
+def test_retried_calls_are_counted(pytester):
+    result = run(pytester, '''
+    @pytest.mark.latency_budget(p95_ms=100, warmup=0)
+    def test_calls(call):
+        call(50, attempts=3)
+        call(300, attempts=2)
+        call(50)
+    ''', '--latency-budget=fail')
+
+    result.assert_outcomes(passed=1, errors=1)
+    result.stdout.fnmatch_lines(['*p95 300.0 ms > 100 ms*', '*3 calls counted (0 warm-up calls ignored, 2 retried)*'])
+
+
+def test_class_budget_counts_calls_of_all_tests(pytester):
+    result = run(pytester, '''
+    @pytest.mark.latency_budget(max_ms=100)
+    class TestCalls:
+        def test_first(self, call):
+            call(500)
+
+        def test_second(self, call):
+            call(500)
+    ''', '--latency-budget=fail')
+
+    result.assert_outcomes(passed=2, errors=1)
+    result.stdout.fnmatch_lines(['*ERROR at teardown of TestCalls.test_second*', '*1 calls counted*'])
+
+
+@pytest.mark.parametrize('args', [(), ('--latency-budget=warn',)])
+def test_exceeded_budget_warns_by_default(pytester, args: tuple):
+    result = run(pytester, '''
+    @pytest.mark.latency_budget(max_ms=100, warmup=0)
+    def test_calls(call):
+        call(500)
+    ''', *args)
+
+    result.assert_outcomes(passed=1, warnings=1)
+    result.stdout.fnmatch_lines(['*LatencyBudgetWarning: Latency budget exceeded: max 500.0 ms > 100 ms*'])
+
+
+def test_budget_is_not_checked_when_off(pytester):
+    result = run(pytester, '''
+    @pytest.mark.latency_budget(max_ms=100, warmup=0)
+    def test_calls(call):
+        call(500)
+    ''', '--latency-budget=off')
+
+    result.assert_outcomes(passed=1)
+
+
+def test_marker_mode_overrides_run_mode(pytester):
+    result = run(pytester, '''
+    @pytest.mark.latency_budget(max_ms=100, warmup=0, mode='fail')
+    def test_strict(call):
+        call(500)
+
+
+    @pytest.mark.latency_budget(max_ms=100, warmup=0, mode='off')
+    def test_unchecked(call):
+        call(500)
+    ''')
+
+    result.assert_outcomes(passed=2, errors=1)
+    result.stdout.fnmatch_lines(['*ERROR at teardown of test_strict*'])
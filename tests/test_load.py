@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import allure
+import pytest
+
+from utils.capture import CapturePolicy
+from utils.load import Operation, run_load
+from utils.rate_limiter import FileTokenBucket
+
+KNOWN_IMAGE_ID = 'D2J3R7sUq'
+MAX_ERROR_RATE = 0.01
+
+LOAD_MIX = [
+    Operation('GET /images/search', lambda client: client.images_search(), weight=4),
+    Operation('GET /images/search (paginated)',
+              lambda client: client.images_search(params={'order': 'ASC', 'limit': 10}), weight=2),
+    Operation('GET /images/{image_id}', lambda client: client.images_get(KNOWN_IMAGE_ID), weight=2),
+]
+
+
+@allure.suite('Load')
+class TestLoad:
+    """
+    Load tests of TheCatAPI, they run only with the `--load-duration` option.
+    """
+
+    @allure.title('Measure latency of the image endpoints under load')
+    def test_image_endpoints_under_load(self, request, the_cat_api_credentials: tuple,
+                                        rate_limiter: FileTokenBucket):
+        """
+        Runs a weighted mix of image searches and image lookups for `--load-duration` seconds, at `--load-rps`
+        requests per second or in a closed loop, and reports the p50/p95/p99 latencies of every endpoint.
+
+        Args:
+            request: The pytest request object.
+            the_cat_api_credentials (tuple): The base URL and the API key fixture.
+            rate_limiter (FileTokenBucket): The rate limiter fixture, it caps the rate of the load as well.
+
+        Asserts:
+            - The error rate of every endpoint is at most `MAX_ERROR_RATE`.
+        """
+        duration = request.config.getoption('--load-duration')
+        if not duration:
+            pytest.skip('Load tests run only with the --load-duration option')
+
+        # imported here, so that collecting the tests doesn't load the HTTP stack
+        from interfaces.the_cat_api_client import TheCatAPIClient
+
+        base_url, api_key = the_cat_api_credentials
+        # thousands of requests are sent, so their details aren't attached to the report
+        client = TheCatAPIClient(base_url, api_key, CapturePolicy('off'), rate_limiter=rate_limiter)
+        concurrency = request.config.getoption('--load-concurrency')
+        client.configure_pool(concurrency)
+
+        report = run_load(client, LOAD_MIX, duration, request.config.getoption('--load-rps'), concurrency)
+        report.write_json(request.config.getoption('--load-report'))
+        report.attach()
+        allure.attach(report.format(), 'Load summary', allure.attachment_type.TEXT)
+
+        failing = {name: f'{stats.error_rate:.2%}' for name, stats in report.operations.items()
+                   if stats.error_rate > MAX_ERROR_RATE}
+        assert failing == {}, f'Error rate of some endpoint(s) is above {MAX_ERROR_RATE:.0%}: {failing}'
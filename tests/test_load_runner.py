@@ -0,0 +1,80 @@
+import pytest
+
+from utils.load import LoadReport, Operation, run_load
+
+
+class Response:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+
+def fail(client):
+    raise ConnectionError('refused')
+
+
+def test_rate_schedules_requests_evenly():
+    report = run_load(None, [Operation('ok', lambda client: Response(200))], duration=0.5, rps=40, concurrency=4)
+
+    assert report.total().requests == 20
+    assert report.target_rps == 40 and report.concurrency == 4
+    assert report.duration >= 0.475
+
+
+def test_errors_are_counted_by_kind():
+    operations = [
+        Operation('ok', lambda client: Response(200), weight=2),
+        Operation('not found', lambda client: Response(404)),
+        Operation('refused', fail),
+    ]
+
+    report = run_load(None, operations, duration=0.2, rps=200, concurrency=2)
+
+    stats = report.operations
+    assert stats['ok'].errors == {} and stats['not found'].errors == {'404': stats['not found'].requests}
+    assert stats['refused'].errors == {'ConnectionError': stats['refused'].requests}
+    # 40 calls are chosen by their weights
+    assert stats['ok'].requests > stats['not found'].requests
+    assert report.total().error_rate == pytest.approx(1 - stats['ok'].requests / 40)
+
+
+def test_closed_loop_passes_client():
+    clients = set()
+
+    def call(client):
+        clients.add(client)
+        return Response(200)
+
+    report = run_load('client', [Operation('ok', call)], duration=0.05, concurrency=2)
+
+    assert clients == {'client'} and report.target_rps is None and report.total().requests > 0
+
+
+def test_reports_of_processes_are_merged():
+    first = run_load(None, [Operation('ok', lambda client: Response(200))], duration=0.1, rps=100, concurrency=1)
+    second = run_load(None, [Operation('ok', lambda client: Response(500))], duration=0.1, rps=50, concurrency=2)
+
+    merged = LoadReport.from_dict(first.to_dict()).merge(LoadReport.from_dict(second.to_dict()))
+
+    assert (merged.target_rps, merged.concurrency) == (150, 3)
+    assert merged.operations['ok'].requests == 15
+    assert merged.operations['ok'].errors == {'500': 5}
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'operations': []},
+    {'duration': 0},
+    {'rps': 0},
+    {'concurrency': 0},
+])
+def test_invalid_run_is_rejected(kwargs: dict):
+    arguments = {'client': None, 'operations': [Operation('ok', lambda client: Response(200))], 'duration': 1,
+                 **kwargs}
+
+    with pytest.raises(ValueError):
+        run_load(**arguments)
+
+
+def test_operation_weight_has_to_be_positive():
+    with pytest.raises(ValueError):
+        Operation('ok', lambda client: Response(200), weight=0)
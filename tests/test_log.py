@@ -0,0 +1,157 @@
+import json
+import logging
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import utils.log
+from utils.log import BodyPreview, JsonFormatter, create_logger, parse_levels, start_queue_logging, stop_queue_logging
+
+
+class ListHandler(logging.Handler):
+    """
+    Keeps the formatted messages together with the thread which formatted them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append((self.format(record), threading.current_thread().name))
+
+
+class FormattedBy:
+    """
+    A log argument which tells the thread its message is formatted by.
+    """
+
+    def __str__(self):
+        return threading.current_thread().name
+
+
+@pytest.fixture
+def queue_logging():
+    if utils.log._listener is not None:
+        pytest.skip('queue logging is started by --log-json')
+    handler = ListHandler()
+    start_queue_logging(handler)
+    yield handler
+    stop_queue_logging()
+
+
+def test_queued_records_are_formatted_by_listener(queue_logging: ListHandler):
+    logger = create_logger('test-queue', logging.INFO)
+
+    logger.info('Formatted by %s', FormattedBy())
+    logger.debug('Not logged %s', FormattedBy())
+    stop_queue_logging()
+
+    [(message, thread)] = queue_logging.messages
+    assert message == f'Formatted by {thread}'
+    assert thread != threading.current_thread().name
+
+
+def test_queued_record_keeps_arguments_and_exception(queue_logging: ListHandler):
+    records = []
+    queue_logging.emit = records.append
+    logger = create_logger('test-queue', logging.INFO)
+
+    try:
+        raise ValueError('broken')
+    except ValueError:
+        logger.exception('Failed %s', 'request')
+    stop_queue_logging()
+
+    [record] = records
+    assert (record.msg, record.args) == ('Failed %s', ('request',))
+    assert record.exc_info[0] is ValueError
+
+
+def test_loggers_propagate_again_after_queue_logging(queue_logging: ListHandler):
+    logger = create_logger('test-queue')
+    assert not logger.propagate
+
+    stop_queue_logging()
+
+    assert logger.propagate
+    assert utils.log._queue_handler not in logger.handlers
+
+
+def test_queue_logging_is_started_once(queue_logging: ListHandler):
+    with pytest.raises(RuntimeError, match='already started'):
+        start_queue_logging(ListHandler())
+
+
+def test_json_formatter_fields():
+    record = logging.makeLogRecord({'name': 'api', 'levelname': 'INFO', 'msg': 'Status %s', 'args': (200,),
+                                    'threadName': 'worker', 'created': 0.5, 'method': 'GET', 'status': 200})
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry == {'time': '1970-01-01T00:00:00.500+00:00', 'level': 'INFO', 'logger': 'api', 'thread': 'worker',
+                     'message': 'Status 200', 'method': 'GET', 'status': 200}
+
+
+def test_json_formatter_exception_and_unserializable_fields():
+    try:
+        raise ValueError('broken')
+    except ValueError:
+        exc_info = sys.exc_info()
+    record = logging.makeLogRecord({'msg': 'Failed', 'exc_info': exc_info, 'url': SimpleNamespace(path='/')})
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['exception'].endswith('ValueError: broken')
+    assert entry['url'] == "namespace(path='/')"
+
+
+@pytest.mark.parametrize('max_size, preview', [
+    (None, 'abcdefgh'),
+    (8, 'abcdefgh'),
+    (3, 'abc... [truncated 5 characters]'),
+])
+def test_body_preview_truncation(max_size: int, preview: str):
+    assert str(BodyPreview(SimpleNamespace(text='abcdefgh'), max_size)) == preview
+
+
+def test_body_preview_reads_body_when_formatted():
+    class Response:
+        reads = 0
+
+        @property
+        def text(self):
+            self.reads += 1
+            return 'body'
+
+    resp = Response()
+    body = BodyPreview(resp, 10)
+
+    assert resp.reads == 0
+    assert str(body) == 'body' and resp.reads == 1
+
+
+@pytest.mark.parametrize('levels, parsed', [
+    ('', {}),
+    ('api=WARNING', {'api': 'WARNING'}),
+    (' api = warning , stub-server=ERROR,', {'api': 'WARNING', 'stub-server': 'ERROR'}),
+])
+def test_parse_levels(levels: str, parsed: dict):
+    assert parse_levels(levels) == parsed
+
+
+@pytest.mark.parametrize('levels', ['api', 'api=LOUD', '=INFO', 'api=WARNING,swagger'])
+def test_invalid_levels_are_rejected(levels: str):
+    with pytest.raises(ValueError, match='name=level'):
+        parse_levels(levels)
+
+
+def test_logger_levels_are_applied(monkeypatch):
+    monkeypatch.setattr(utils.log, 'LOGGER_LEVELS', {'test-quiet': 'ERROR'})
+    monkeypatch.setattr(utils.log, 'LOG_LEVEL', 'info')
+
+    assert create_logger('test-quiet').level == logging.ERROR
+    assert create_logger('test-default').level == logging.INFO
+    assert create_logger('test-quiet', logging.DEBUG).level == logging.DEBUG
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from utils.rate_limiter import FileTokenBucket
+
+
+class Clock:
+    """
+    A clock which only moves forward when it's told to, sleeping moves it as well.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(time, 'time', clock.time)
+    monkeypatch.setattr(time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_burst_is_taken_at_once(tmp_path, clock: Clock):
+    bucket = FileTokenBucket(tmp_path / 'bucket.json', rate=2, burst=3)
+
+    assert [bucket._try_acquire() for _ in range(4)] == [0.0, 0.0, 0.0, pytest.approx(0.5)]
+
+
+def test_tokens_are_refilled_by_rate(tmp_path, clock: Clock):
+    bucket = FileTokenBucket(tmp_path / 'bucket.json', rate=4, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+
+    clock.now += 0.25
+    assert bucket._try_acquire() == 0.0
+    assert bucket._try_acquire() == pytest.approx(0.25)
+    # the bucket isn't refilled above the burst
+    clock.now += 10
+    assert [bucket._try_acquire() for _ in range(3)] == [0.0, 0.0, pytest.approx(0.25)]
+
+
+def test_acquire_waits_for_next_token(tmp_path, clock: Clock):
+    bucket = FileTokenBucket(tmp_path / 'bucket.json', rate=10)
+    start = clock.now
+
+    for _ in range(5):
+        bucket.acquire()
+
+    assert clock.now - start == pytest.approx(0.4)
+    assert bucket.waited == pytest.approx(0.4)
+
+
+def test_buckets_with_same_file_share_tokens(tmp_path, clock: Clock):
+    first = FileTokenBucket(tmp_path / 'bucket.json', rate=1, burst=2)
+    second = FileTokenBucket(tmp_path / 'bucket.json', rate=1, burst=2)
+
+    assert (first._try_acquire(), second._try_acquire()) == (0.0, 0.0)
+    assert second._try_acquire() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('rate, burst', [(0, 1), (-1, 1), (1, 0)])
+def test_invalid_bucket_is_rejected(tmp_path, rate: float, burst: int):
+    with pytest.raises(ValueError):
+        FileTokenBucket(tmp_path / 'bucket.json', rate, burst)
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from tests.conftest import make_response
+from utils.response_cache import ResponseCache
+
+SEARCH = {'order': 'ASC', 'limit': 2}
+
+
+class EvictingLimiter:
+    """
+    A rate limiter which clears the cache before a request is sent, as if the cached response was evicted
+    by the requests of other threads.
+    """
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+        self.sent = 0
+
+    def acquire(self):
+        self.sent += 1
+        self.cache.clear()
+
+
+def make_client(stub, cache: ResponseCache, rate_limiter=None):
+    from interfaces.the_cat_api_client import TheCatAPIClient
+
+    return TheCatAPIClient(stub.base_url, 'test-key', response_cache=cache, rate_limiter=rate_limiter)
+
+
+def test_not_modified_without_entry_is_not_returned():
+    cache = ResponseCache()
+    key = cache.key('get', 'http://localhost/images/search', SEARCH)
+
+    assert cache.store(key, '/images/search', make_response(304)) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_request_is_sent_again_if_revalidated_response_was_evicted(cat_api_stub):
+    cache = ResponseCache(ttl=0.01, revalidate=True)
+    client = make_client(cat_api_stub, cache)
+    first = client.images_search(params=SEARCH)
+    assert first.status_code == 200 and first.headers['ETag']
+    time.sleep(0.02)
+
+    client.rate_limiter = EvictingLimiter(cache)
+    records = []
+    client.timing_hooks.append(records.append)
+    resp = client.images_search(params=SEARCH)
+
+    assert resp.status_code == 200
+    assert resp.json() == first.json()
+    assert client.rate_limiter.sent == 2
+    assert cache.stats()['size'] == 1
+    # the revalidation and the request sent again are timed separately
+    assert [(record.status, record.source, record.attempts) for record in records] == [
+        (304, 'network', 1), (200, 'network', 1)]
+
+
+def test_requests_with_transport_arguments_bypass_cache(cat_api_stub):
+    cache = ResponseCache()
+    client = make_client(cat_api_stub, cache)
+
+    client.get('/images/search', params=SEARCH, timeout=5)
+    client.get('/images/search', params=SEARCH, timeout=5)
+
+    assert cache.stats() == {'size': 0, 'hits': 0, 'misses': 0, 'revalidations': 0, 'evictions': 0}
+
+
+def test_expired_response_is_not_served(monkeypatch):
+    cache = ResponseCache(endpoint_ttls={'/breeds*': 10})
+    key = cache.key('get', 'http://localhost/breeds')
+    now = time.monotonic()
+    cache.store(key, '/breeds', make_response(200))
+
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 5)
+    assert cache.lookup(key)[0] is not None
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 11)
+    assert cache.lookup(key) == (None, None)
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_response_is_evicted():
+    cache = ResponseCache(maxsize=2)
+    keys = [cache.key('get', f'http://localhost/images/{image_id}') for image_id in 'abc']
+    cache.store(keys[0], '/images/a', make_response(200))
+    cache.store(keys[1], '/images/b', make_response(200))
+    cache.lookup(keys[0])
+
+    cache.store(keys[2], '/images/c', make_response(200))
+
+    assert cache.lookup(keys[1]) == (None, None)
+    assert cache.lookup(keys[0])[0] is not None and cache.lookup(keys[2])[0] is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_expired_response_is_revalidated(monkeypatch):
+    cache = ResponseCache(ttl=10, revalidate=True)
+    key = cache.key('get', 'http://localhost/images/a')
+    cached = make_response(200, b'{"id": "a"}', {'ETag': '"v1"'})
+    now = time.monotonic()
+    cache.store(key, '/images/a', cached)
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 11)
+
+    assert cache.lookup(key) == (None, '"v1"')
+    assert cache.store(key, '/images/a', make_response(304)) is cached
+    assert cache.lookup(key) == (cached, None)
+    assert cache.stats()['revalidations'] == 1
+
+
+@pytest.mark.parametrize('method, endpoint, params, cacheable', [
+    ('get', '/images/a', None, True),
+    ('post', '/images/a', None, False),
+    ('get', '/images/search', {'order': 'ASC'}, True),
+    ('get', '/images/search', {'limit': 5}, False),
+    ('get', '/votes', None, False),
+])
+def test_cacheable_requests(method: str, endpoint: str, params: dict, cacheable: bool):
+    cache = ResponseCache(endpoint_ttls={'/votes': 0})
+
+    assert cache.is_cacheable(method, endpoint, params) is cacheable
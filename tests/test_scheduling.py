@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+from utils.scheduling import (DurationStore, TestDuration, affected_tests, client_method_paths, expected_durations,
+                              longest_first)
+
+
+def test_durations_are_smoothed_over_runs(tmp_path):
+    store = DurationStore(tmp_path / 'durations.sqlite3')
+    store.save([TestDuration('test_a.py::test_a', 2.0, 3, ['GET /images/search'])])
+    store.save([TestDuration('test_a.py::test_a', 4.0, 1, ['GET /images/{image_id}']),
+                TestDuration('test_a.py::test_b', 1.0)], smoothing=0.25)
+
+    history = store.load()
+
+    first, second = history['test_a.py::test_a'], history['test_a.py::test_b']
+    assert (first.duration, first.runs) == (2.5, 2)
+    # the requests and endpoints are the ones of the last run
+    assert (first.requests, first.endpoints) == (1, {'GET /images/{image_id}'})
+    assert (second.duration, second.runs, second.endpoints) == (1.0, 1, frozenset())
+
+
+def test_stale_tests_are_dropped(tmp_path, monkeypatch):
+    store = DurationStore(tmp_path / 'durations.sqlite3')
+    store.save([TestDuration('test_a.py::test_renamed', 1.0)])
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 31 * 24 * 3600)
+
+    store.save([TestDuration('test_a.py::test_a', 1.0)])
+
+    assert list(store.load()) == ['test_a.py::test_a']
+
+
+def test_missing_history_is_empty(tmp_path):
+    assert DurationStore(tmp_path / 'missing.sqlite3').load() == {}
+
+
+def test_unknown_tests_are_expected_to_take_median():
+    history = {nodeid: TestDuration(nodeid, duration) for nodeid, duration in [('a', 1.0), ('b', 2.0), ('c', 6.0)]}
+
+    assert expected_durations(['a', 'b', 'c', 'new'], history) == {'a': 1.0, 'b': 2.0, 'c': 6.0, 'new': 2.0}
+    assert expected_durations(['new'], {}) == {'new': 0.0}
+
+
+def test_longest_first_keeps_classes_together():
+    expected = {
+        'test_a.py::TestFast::test_1': 1.0,
+        'test_a.py::TestFast::test_2': 2.0,
+        'test_a.py::TestSlow::test_1[1]': 2.0,
+        'test_a.py::TestSlow::test_1[2]': 3.0,
+        'test_a.py::test_function': 4.0,
+        'test_b.py::test_function': 0.5,
+    }
+
+    assert longest_first(expected, expected) == [
+        'test_a.py::TestSlow::test_1[2]',
+        'test_a.py::TestSlow::test_1[1]',
+        'test_a.py::test_function',
+        'test_a.py::TestFast::test_2',
+        'test_a.py::TestFast::test_1',
+        'test_b.py::test_function',
+    ]
+
+
+def test_equal_durations_keep_collection_order():
+    nodeids = ['test_a.py::test_1', 'test_a.py::test_2', 'test_a.py::test_3']
+
+    assert longest_first(nodeids, dict.fromkeys(nodeids, 1.0)) == nodeids
+
+
+def test_client_methods_request_their_paths():
+    paths = client_method_paths()
+
+    assert paths['images_search'] == {'/images/search'}
+    assert paths['images_get'] == {'/images/{image_id}'}
+    # a method which calls another one requests its paths
+    assert '/images/search' in paths['images_iter']
+
+
+def test_affected_tests_are_selected_by_method_and_path():
+    history = {
+        'search': TestDuration('search', endpoints=['GET /images/search']),
+        'get': TestDuration('get', endpoints=['GET /images/{image_id}']),
+        'both': TestDuration('both', endpoints=['GET /images/search', 'GET /images/{image_id}']),
+    }
+    method_paths = {'images_get': {'/images/{image_id}'}}
+
+    assert affected_tests(['TheCatAPIClient.images_get'], history, method_paths) == {'get', 'both'}
+    assert affected_tests(['/images/search'], history, method_paths) == {'search', 'both'}
+    assert affected_tests(['POST /images/search'], history, method_paths) == set()
+    with pytest.raises(ValueError, match='images_upload'):
+        affected_tests(['images_upload'], history, method_paths)
+
+
+def test_history_is_kept_only_with_durations_db(pytester):
+    pytester.makepyfile(test_history='''
+        def test_history(request):
+            keeps_history = request.config.pluginmanager.get_plugin('test-durations') is not None
+            assert keeps_history == bool(request.config.getoption('--durations-db'))
+    ''')
+
+    pytester.runpytest('-p', 'tests.conftest', '--html=report.html').assert_outcomes(passed=1)
+    assert list(pytester.path.rglob('*.sqlite3')) == []
+
+    pytester.runpytest('-p', 'tests.conftest', '--html=report.html',
+                       '--durations-db=durations.sqlite3').assert_outcomes(passed=1)
+    assert list(pytester.path.rglob('*.sqlite3')) == [pytester.path / 'durations.sqlite3']
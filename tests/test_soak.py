@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from utils.soak import SoakMonitor
+from utils.timing import TimingRecord
+
+
+def test_soak_run_repeats_tests(pytester):
+    """
+    The tests of a soak run are repeated until the duration elapses, while the session fixtures are set up once
+    and the fixtures of the tests in every iteration.
+    """
+    pytester.makepyfile(test_repeated='''
+        import pytest
+
+        setups = {'session': 0, 'function': 0}
+
+
+        @pytest.fixture(scope='session')
+        def shared():
+            setups['session'] += 1
+
+
+        @pytest.fixture
+        def own():
+            setups['function'] += 1
+
+
+        def test_first(shared, own):
+            assert setups['session'] == 1
+
+
+        def test_second(shared, own):
+            assert setups['session'] == 1
+    ''')
+
+    result = pytester.runpytest('-p', 'tests.conftest', '--html=report.html', '--durations-db=',
+                                '--soak-duration=0.5', '--soak-interval=0.1', '--soak-report=soak.json')
+
+    outcomes = result.parseoutcomes()
+    assert outcomes['passed'] > 2 and 'failed' not in outcomes
+    result.stdout.fnmatch_lines(['*soak run*'])
+    report = json.loads((pytester.path / 'soak.json').read_text())
+    assert report['tests'] == outcomes['passed']
+    assert report['iterations'] * 2 >= report['tests']
+
+
+def test_soak_run_repeats_single_test(pytester):
+    pytester.makepyfile(test_single='''
+        def test_only():
+            pass
+    ''')
+
+    result = pytester.runpytest('-p', 'tests.conftest', '--html=report.html', '--durations-db=',
+                                '--soak-duration=0.3', '--soak-interval=0.1', '--soak-report=soak.json')
+
+    assert result.parseoutcomes()['passed'] >= 2
+
+
+def make_record(status, seconds: float = 0.01) -> TimingRecord:
+    record = TimingRecord('GET', '/images/search')
+    record.status = status
+    record.total = seconds
+    return record
+
+
+def test_only_server_errors_are_counted():
+    monitor = SoakMonitor()
+    for status in (200, 400, 404, 429, 500, 503, None):
+        monitor(make_record(status))
+
+    stats = monitor.operations['GET /images/search']
+    assert stats.requests == 7
+    assert stats.errors == {'429': 1, '500': 1, '503': 1, 'no response': 1}
+
+
+def test_timeline_is_thinned_out():
+    monitor = SoakMonitor(interval=1, max_samples=4)
+    monitor.start()
+    for window in range(10):
+        for _ in range(window + 1):
+            monitor(make_record(500 if window == 0 else 200))
+        monitor.test_finished()
+        monitor.sample()
+    report = monitor.stop(failed=1)
+
+    assert len(report.samples) < 4 and monitor.interval > 1
+    assert sum(sample.latency.count for sample in report.samples) == 55
+    assert sum(sample.errors for sample in report.samples) == 1
+    assert [sample.tests for sample in report.samples][-1] == 10
+    assert set(report.growth()) == {'traced_memory', 'open_files', 'sockets', 'open_connections',
+                                    'pending_captures'}
+    assert report.to_dict()['failed_tests'] == 1
+
+
+@pytest.mark.parametrize('kwargs', [{'interval': 0}, {'max_samples': 1}])
+def test_invalid_monitor_is_rejected(kwargs: dict):
+    with pytest.raises(ValueError):
+        SoakMonitor(**kwargs)
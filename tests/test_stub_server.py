@@ -0,0 +1,148 @@
+import gzip
+import time
+import zlib
+from collections.abc import Mapping
+
+import pytest
+
+from utils.stub_server import KNOWN_IMAGE_ID, MAX_LIMIT, TheCatAPIStub, negotiate_encoding
+
+AUTHORIZED = {'x-api-key': 'test-key'}
+
+
+@pytest.fixture(scope='module')
+def stub(swagger: Mapping) -> TheCatAPIStub:
+    """
+    A stub which isn't started, its requests are handled by calling `handle` directly.
+    """
+    return TheCatAPIStub(swagger)
+
+
+def search(stub: TheCatAPIStub, **query) -> tuple:
+    return stub.handle('GET', '/images/search', {name: [str(value)] for name, value in query.items()}, AUTHORIZED)
+
+
+@pytest.mark.parametrize('query', [{'page': -1}, {'limit': 0}, {'limit': -1}, {'limit': 'qwerty'},
+                                   {'has_breeds': 'qwerty'}])
+def test_search_parameter_rules_reject_invalid_values(stub: TheCatAPIStub, query: dict):
+    status, _, body = search(stub, **query)
+
+    assert status == 400
+    assert body == stub.search_route.response_description('400')
+
+
+@pytest.mark.parametrize('query', [{'page': 0}, {'limit': 1}, {'limit': MAX_LIMIT + 1}])
+def test_search_parameter_rules_accept_boundaries(stub: TheCatAPIStub, query: dict):
+    assert search(stub, **query)[0] == 200
+
+
+def test_pagination_headers_and_pages(stub: TheCatAPIStub):
+    status, headers, first = search(stub, order='ASC', limit=10, page=0)
+    _, _, second = search(stub, order='ASC', limit=10, page=1)
+    _, _, last = search(stub, order='DESC', limit=10, page=0)
+
+    assert status == 200
+    assert headers == {'Pagination-Count': str(len(stub.images)), 'Pagination-Page': '0', 'Pagination-Limit': '10'}
+    assert [image['id'] for image in first + second] == [image['id'] for image in stub.images[:20]]
+    assert [image['id'] for image in last] == [image['id'] for image in stub.images[:-11:-1]]
+
+
+def test_pagination_headers_of_filtered_search(stub: TheCatAPIStub):
+    _, headers, images = search(stub, order='ASC', limit=MAX_LIMIT + 5, page=1, has_breeds='true')
+
+    with_breeds = [image for image in stub.images if image['breeds']]
+    assert headers == {'Pagination-Count': str(len(with_breeds)), 'Pagination-Page': '1',
+                       'Pagination-Limit': str(MAX_LIMIT)}
+    assert [image['id'] for image in images] == [image['id'] for image in with_breeds[MAX_LIMIT:2 * MAX_LIMIT]]
+
+
+def test_page_beyond_catalogue_is_empty(stub: TheCatAPIStub):
+    status, headers, images = search(stub, order='ASC', limit=MAX_LIMIT, page=len(stub.images))
+
+    assert (status, images) == (200, [])
+    assert headers['Pagination-Count'] == str(len(stub.images))
+
+
+def test_error_injection(swagger: Mapping):
+    stub = TheCatAPIStub(swagger, error_rate=1.0, error_status=429, error_headers={'Retry-After': '1'})
+
+    assert search(stub) == (429, {'Retry-After': '1'}, 'Injected error 429')
+    assert stub.handle('GET', f'/images/{KNOWN_IMAGE_ID}', {}, AUTHORIZED)[0] == 429
+
+
+def test_error_injection_rate(swagger: Mapping):
+    stub = TheCatAPIStub(swagger, error_rate=0.3, seed=1)
+
+    statuses = [search(stub)[0] for _ in range(200)]
+
+    assert set(statuses) == {200, 500}
+    assert 30 < statuses.count(500) < 90
+
+
+def test_latency_injection(swagger: Mapping):
+    stub = TheCatAPIStub(swagger, latency=0.05)
+
+    start = time.perf_counter()
+    status = search(stub)[0]
+
+    assert status == 200
+    assert time.perf_counter() - start >= 0.05
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    (None, None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('deflate', 'deflate'),
+    ('gzip, deflate', 'gzip'),
+    ('gzip;q=0.5, deflate', 'deflate'),
+    ('gzip;q=0, deflate;q=0', None),
+    ('*', 'gzip'),
+    ('br', None),
+    ('gzip;q=invalid, deflate;q=0.1', 'deflate'),
+])
+def test_negotiate_encoding(accept_encoding: str, encoding: str):
+    assert negotiate_encoding(accept_encoding, ('gzip', 'deflate')) == encoding
+
+
+def test_negotiate_encoding_without_encodings():
+    assert negotiate_encoding('gzip', ()) is None
+
+
+@pytest.mark.parametrize('encodings, accept_encoding, encoding, decompress', [
+    (('gzip', 'deflate'), 'gzip, deflate', 'gzip', gzip.decompress),
+    (('gzip', 'deflate'), 'deflate', 'deflate', zlib.decompress),
+    (('deflate',), 'gzip, deflate', 'deflate', zlib.decompress),
+    (('gzip', 'deflate'), 'identity', None, bytes),
+    ((), 'gzip', None, bytes),
+])
+def test_responses_are_compressed_as_negotiated(monkeypatch, cat_api_stub: TheCatAPIStub, encodings: tuple,
+                                                accept_encoding: str, encoding: str, decompress):
+    import json
+
+    import urllib3
+
+    monkeypatch.setattr(cat_api_stub, 'encodings', encodings)
+    resp = urllib3.request('GET', f'{cat_api_stub.base_url}/images/search?order=ASC&limit=5', decode_content=False,
+                           headers={**AUTHORIZED, 'Accept-Encoding': accept_encoding})
+
+    assert resp.headers.get('Content-Encoding') == encoding
+    assert resp.headers.get('Vary') == ('Accept-Encoding' if encodings else None)
+    assert int(resp.headers['Content-Length']) == len(resp.data)
+    assert len(json.loads(decompress(resp.data))) == 5
+
+
+def test_image_files_are_not_compressed(cat_api_stub: TheCatAPIStub):
+    import urllib3
+
+    image = cat_api_stub.images[0]
+    resp = urllib3.request('GET', image['url'], headers={'Accept-Encoding': 'gzip'}, decode_content=False)
+
+    assert resp.status == 200
+    assert 'Content-Encoding' not in resp.headers
+    assert resp.headers['Content-Type'].startswith('image/')
+
+
+def test_unsupported_encoding_is_rejected(swagger: Mapping):
+    with pytest.raises(ValueError, match='Unsupported encodings br'):
+        TheCatAPIStub(swagger, encodings=('gzip', 'br'))
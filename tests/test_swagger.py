@@ -0,0 +1,110 @@
+import pickle
+from pathlib import Path
+
+import pytest
+
+import utils.swagger
+from utils.swagger import SWAGGER_PATH, LazyMapping, load_swagger, parse_swagger, swagger_cache_file
+
+
+@pytest.fixture
+def swagger_file(tmp_path) -> Path:
+    path = tmp_path / 'swagger.yaml'
+    path.write_bytes(SWAGGER_PATH.read_bytes())
+    return path
+
+
+@pytest.fixture
+def parses(monkeypatch) -> list:
+    """
+    Records the paths parsed by `load_swagger`.
+    """
+    parsed = []
+
+    def recording_parse(path, proxies=True):
+        parsed.append(path)
+        return parse_swagger(path, proxies)
+
+    monkeypatch.setattr(utils.swagger, 'parse_swagger', recording_parse)
+    return parsed
+
+
+def test_cache_miss_parses_and_caches(swagger_file: Path, tmp_path, parses: list):
+    cache_dir = tmp_path / 'cache'
+
+    swagger = load_swagger(swagger_file, str(cache_dir))
+
+    assert parses == [swagger_file]
+    assert isinstance(swagger, LazyMapping)
+    assert list(cache_dir.iterdir()) == [swagger_cache_file(swagger_file, str(cache_dir))]
+
+
+def test_cache_hit_doesnt_parse(swagger_file: Path, tmp_path, parses: list):
+    cached = load_swagger(swagger_file, str(tmp_path)).to_dict()
+
+    swagger = load_swagger(swagger_file, str(tmp_path))
+
+    assert len(parses) == 1
+    assert swagger.to_dict() == cached
+
+
+def test_changed_file_invalidates_cache(swagger_file: Path, tmp_path, parses: list):
+    cache_dir = tmp_path / 'cache'
+    first = load_swagger(swagger_file, str(cache_dir))
+    swagger_file.write_text(swagger_file.read_text().replace('/images/search:', '/images/find:', 1))
+
+    changed = load_swagger(swagger_file, str(cache_dir))
+
+    assert len(parses) == 2
+    assert '/images/search' in first['paths'] and '/images/search' not in changed['paths']
+    assert '/images/find' in changed['paths']
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_broken_cache_is_replaced(swagger_file: Path, tmp_path, parses: list):
+    cache_file = swagger_cache_file(swagger_file, str(tmp_path))
+    cache_file.write_bytes(b'not a pickle')
+
+    swagger = load_swagger(swagger_file, str(tmp_path))
+
+    assert len(parses) == 1
+    with open(cache_file, 'rb') as f:
+        assert pickle.load(f).to_dict() == swagger.to_dict()
+
+
+def test_failed_write_leaves_no_cache(monkeypatch, swagger_file: Path, tmp_path):
+    def failing_dump(obj, file, protocol=None):
+        file.write(b'partial')
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(pickle, 'dump', failing_dump)
+
+    with pytest.raises(OSError, match='No space left'):
+        load_swagger(swagger_file, str(tmp_path / 'cache'))
+    # neither the cache file nor the partially written temporary file is left
+    assert list((tmp_path / 'cache').iterdir()) == []
+
+
+def test_lazy_mapping_matches_dereferenced_spec(swagger_file: Path, tmp_path):
+    swagger = load_swagger(swagger_file, str(tmp_path))
+
+    assert swagger.to_dict() == parse_swagger(swagger_file, proxies=False)
+
+
+def test_parts_are_unpickled_on_access(swagger_file: Path, tmp_path):
+    load_swagger(swagger_file, str(tmp_path))
+    swagger = load_swagger(swagger_file, str(tmp_path))
+
+    schemas = swagger['components']['schemas']
+    packed = [name for name, value in schemas._items.items() if isinstance(value, utils.swagger._Packed)]
+    assert packed == list(schemas)
+    schemas[packed[0]]
+    assert not isinstance(schemas._items[packed[0]], utils.swagger._Packed)
+
+
+def test_disabled_cache_returns_proxies(swagger_file: Path, parses: list):
+    swagger = load_swagger(swagger_file, '')
+
+    assert parses == [swagger_file]
+    assert not isinstance(swagger, LazyMapping)
+    assert swagger_cache_file(swagger_file, '') is None
@@ -0,0 +1,89 @@
+import threading
+from itertools import islice
+
+import pytest
+
+from utils.stub_server import MAX_LIMIT
+
+
+@pytest.fixture
+def client(cat_api_stub):
+    from interfaces.the_cat_api_client import TheCatAPIClient
+
+    client = TheCatAPIClient(cat_api_stub.base_url, 'test-key')
+    yield client
+    client.session.close()
+
+
+@pytest.fixture
+def requested_pages(monkeypatch, client) -> list:
+    """
+    Records the pages requested by `images_iter`, in the order they are sent.
+    """
+    pages = []
+    images_search = client.images_search
+
+    def recording_images_search(params=None, **kwargs):
+        pages.append(params['page'])
+        return images_search(params=params, **kwargs)
+
+    monkeypatch.setattr(client, 'images_search', recording_images_search)
+    return pages
+
+
+def image_ids(images) -> list:
+    return [image['id'] for image in images]
+
+
+@pytest.mark.parametrize('page_size, pages', [(7, 15), (25, 4), (100, 4)])
+def test_all_images_are_iterated_page_by_page(cat_api_stub, client, requested_pages: list, page_size: int,
+                                              pages: int):
+    images = list(client.images_iter(page_size=page_size))
+
+    assert image_ids(images) == image_ids(cat_api_stub.images)
+    # the page size is capped by the API, no page is requested after the last one
+    assert sorted(requested_pages) == list(range(pages))
+
+
+def test_iteration_starts_at_page(cat_api_stub, client, requested_pages: list):
+    images = list(client.images_iter(page_size=10, params={'order': 'DESC', 'page': 8}))
+
+    assert image_ids(images) == image_ids(cat_api_stub.images[::-1][80:])
+    assert sorted(requested_pages) == [8, 9]
+
+
+def test_filtered_images_are_iterated(cat_api_stub, client):
+    images = list(client.images_iter(page_size=MAX_LIMIT, params={'has_breeds': 'true'}))
+
+    assert image_ids(images) == image_ids(image for image in cat_api_stub.images if image['breeds'])
+
+
+def test_prefetch_window_is_bounded(client, requested_pages: list):
+    page_size, prefetch = 5, 2
+
+    for index, _ in enumerate(client.images_iter(page_size=page_size, prefetch=prefetch)):
+        assert max(requested_pages) <= index // page_size + prefetch
+
+
+def test_executor_is_shut_down_when_consumer_stops_early(client, requested_pages: list):
+    images = client.images_iter(page_size=5, prefetch=3)
+
+    assert len(list(islice(images, 7))) == 7
+    images.close()
+
+    assert [thread for thread in threading.enumerate() if thread.name.startswith('images-prefetch')] == []
+    # the second page is being consumed, so at most the three pages after it were requested
+    assert max(requested_pages) <= 4
+
+
+def test_random_order_is_rejected(client, requested_pages: list):
+    with pytest.raises(ValueError, match='RANDOM'):
+        next(client.images_iter(params={'order': 'random'}))
+    assert requested_pages == []
+
+
+def test_failed_page_is_raised(client):
+    import requests
+
+    with pytest.raises(requests.HTTPError):
+        next(client.images_iter(page_size=0))
@@ -0,0 +1,171 @@
+import json
+import subprocess
+import sys
+
+from utils.timing import EndpointTimings, TimingCollector, TimingRecord
+from utils.timing_plugin import TimingsReport
+
+
+def make_record(endpoint: str = '/images/search', total: float = 0.1, source: str = 'network', attempts: int = 1,
+                reused: bool = True, encoding: str = 'gzip') -> TimingRecord:
+    record = TimingRecord('GET', endpoint)
+    record.status, record.source, record.attempts, record.reused = 200, source, attempts, reused
+    record.ttfb, record.download, record.total = total / 2, total / 4, total
+    record.client = total / 4
+    record.request_bytes, record.response_bytes = 100, 500
+    record.encoding, record.body_bytes, record.decoded_bytes, record.decode = encoding, 300, 900, 0.001
+    return record
+
+
+def aggregate(*records: TimingRecord) -> EndpointTimings:
+    timings = EndpointTimings()
+    for record in records:
+        timings.add(record)
+    return timings
+
+
+def test_timing_module_does_not_import_pytest():
+    """
+    The clients import `utils.timing`, so it mustn't load pytest (nor the HTTP stack).
+    """
+    code = 'import sys, utils.timing; print(sorted({"pytest", "requests"} & set(sys.modules)))'
+
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == '[]'
+
+
+def test_merge_adds_all_counters():
+    first = [make_record(total=0.1, reused=False), make_record(total=0.2, attempts=3)]
+    second = [make_record(total=0.3, source='cache', encoding=None), make_record(total=0.4, encoding='identity')]
+
+    merged = aggregate(*first).merge(aggregate(*second))
+
+    assert merged.to_dict() == aggregate(*first, *second).to_dict()
+    assert merged.count == 4
+    assert merged.sources == {'network': 3, 'cache': 1}
+    assert (merged.new_connections, merged.retries) == (1, 2)
+    assert merged.encodings == {'gzip': 2, 'identity': 1}
+    assert (merged.body_bytes, merged.decoded_bytes) == (900, 2700)
+
+
+def test_merge_of_round_tripped_timings():
+    timings = aggregate(make_record(total=0.1), make_record(total=0.5, reused=False))
+
+    merged = EndpointTimings().merge(EndpointTimings.from_dict(json.loads(json.dumps(timings.to_dict()))))
+
+    assert merged.to_dict() == timings.to_dict()
+
+
+def test_collector_take_starts_new_aggregation():
+    collector = TimingCollector()
+    collector(make_record('/images/search'))
+    collector(make_record('/images/search'))
+    collector(make_record('/breeds'))
+
+    taken = collector.take()
+
+    assert {endpoint: timings.count for endpoint, timings in taken.items()} == {
+        'GET /images/search': 2, 'GET /breeds': 1}
+    assert collector.take() == {}
+    collector(make_record('/breeds'))
+    assert list(collector.take()) == ['GET /breeds']
+
+
+def test_report_aggregates_per_test_and_endpoint(tmp_path):
+    report = TimingsReport()
+    report.add('test_a', {'GET /breeds': aggregate(make_record('/breeds'))})
+    report.add('test_a', {'GET /breeds': aggregate(make_record('/breeds'))})
+    report.add('test_b', {'GET /breeds': aggregate(make_record('/breeds')),
+                          'GET /images/search': aggregate(make_record())})
+
+    report.write_json(tmp_path / 'timings' / 'report.json')
+
+    data = json.loads((tmp_path / 'timings' / 'report.json').read_text())
+    assert list(data['endpoints']) == ['GET /breeds', 'GET /images/search']
+    assert data['endpoints']['GET /breeds']['requests'] == 3
+    assert {nodeid: {endpoint: timings['requests'] for endpoint, timings in endpoints.items()}
+            for nodeid, endpoints in data['tests'].items()} == {
+        'test_a': {'GET /breeds': 2}, 'test_b': {'GET /breeds': 1, 'GET /images/search': 1}}
+
+
+def test_report_is_written_and_summarized(pytester):
+    pytester.makepyfile(test_timed='''
+        from tests.conftest import timing_collector_key
+        from utils.timing import TimingRecord
+
+
+        def send(request, endpoint, total):
+            record = TimingRecord('GET', endpoint)
+            record.status, record.ttfb, record.total = 200, total, total
+            record.encoding, record.body_bytes, record.decoded_bytes = 'gzip', 10, 40
+            request.config.stash[timing_collector_key](record)
+
+
+        def test_search(request):
+            send(request, '/images/search', 0.02)
+            send(request, '/images/search', 0.04)
+
+
+        def test_breeds(request):
+            send(request, '/breeds', 0.01)
+    ''')
+
+    result = pytester.runpytest('-p', 'tests.conftest', '--html=report.html', '--durations-db=',
+                                '--timings-report=timings.json')
+
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(['*request timings*', 'GET /breeds: 1 requests, p50 *',
+                                 'GET /images/search: 2 requests, p50 *, 20 B on the wire (80 B decoded, gzip)*'])
+    report = json.loads((pytester.path / 'timings.json').read_text())
+    assert {nodeid.split('::')[1]: list(endpoints) for nodeid, endpoints in report['tests'].items()} == {
+        'test_search': ['GET /images/search'], 'test_breeds': ['GET /breeds']}
+    assert '<h2>Request timings</h2>' in (pytester.path / 'report.html').read_text()
+
+
+def test_collection_error_is_reported(pytester):
+    """
+    A test module which can't be imported is reported as a collection error, not as an internal error
+    of the request timings plugin, which reads the timings attached to the reports.
+    """
+    pytester.makepyfile(test_broken='import module_missing_in_the_test\n')
+
+    result = pytester.runpytest('-p', 'tests.conftest', '--html=report.html', '--durations-db=')
+
+    result.assert_outcomes(errors=1)
+    result.stdout.fnmatch_lines(['*ModuleNotFoundError*module_missing_in_the_test*'])
+    result.stdout.no_fnmatch_line('*INTERNALERROR*')
+
+
+def test_streamed_body_is_not_downloaded_for_the_record(cat_api_stub):
+    """
+    The record of a streamed request is finished before the caller reads the body, so neither the download nor
+    the decoded bytes are accounted and the body is still there to be read.
+    """
+    from interfaces.api_client import APIClient
+
+    records = []
+    client = APIClient(cat_api_stub.base_url)
+    client.timing_hooks.append(records.append)
+
+    resp = client.get('/images/search', params={'order': 'ASC', 'limit': 5}, stream=True)
+
+    [record] = records
+    assert not resp.response._content_consumed
+    assert (record.status, record.source, record.download, record.decoded_bytes) == (200, 'network', None, 0)
+    assert len(resp.json()) == 5
+
+
+def test_read_body_is_accounted(cat_api_stub):
+    from interfaces.api_client import APIClient
+
+    records = []
+    client = APIClient(cat_api_stub.base_url)
+    client.timing_hooks.append(records.append)
+
+    resp = client.get('/images/search', params={'order': 'ASC', 'limit': 5})
+
+    [record] = records
+    assert record.download is not None
+    assert record.decoded_bytes == len(resp.content)
+    assert 0 < record.body_bytes <= record.decoded_bytes
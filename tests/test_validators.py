@@ -0,0 +1,136 @@
+import gc
+
+import pytest
+
+from utils import validators
+from utils.swagger import LazyMapping
+from utils.validators import ValidatorRegistry, get_validator_registry, validate_response_items
+
+SCHEMA_PATH = ['components', 'schemas', 'Images']
+SWAGGER = {
+    'components': {
+        'schemas': {
+            'Images': {
+                'type': 'array',
+                'maxItems': 3,
+                'items': {
+                    'type': 'object',
+                    'properties': {'id': {'type': 'string'}, 'width': {'type': 'integer'}},
+                    'required': ['id'],
+                },
+            },
+        },
+    },
+}
+
+
+def make_images(size: int) -> list:
+    return [{'id': f'image{i}', 'width': 100} for i in range(size)]
+
+
+def test_valid_list():
+    assert ValidatorRegistry(SWAGGER).validate_items(make_images(3), SCHEMA_PATH) == []
+
+
+def test_all_item_errors_are_collected():
+    images = make_images(3)
+    images[0]['width'] = 'wide'
+    del images[2]['id']
+    images[2]['width'] = None
+
+    errors = ValidatorRegistry(SWAGGER).validate_items(images, SCHEMA_PATH)
+
+    assert [error.index for error in errors] == [0, 2, 2]
+    assert {(error.path, error.validator) for error in errors} == {
+        ('$[0].width', 'type'), ('$[2]', 'required'), ('$[2].width', 'type')}
+
+
+@pytest.mark.parametrize('response_data, validator', [
+    ({'message': 'Unauthorized'}, 'type'),
+    (make_images(4), 'maxItems'),
+])
+def test_list_keywords_are_validated(response_data, validator: str):
+    errors = ValidatorRegistry(SWAGGER).validate_items(response_data, SCHEMA_PATH)
+
+    assert [(error.index, error.path, error.validator) for error in errors] == [(None, '$', validator)]
+
+
+@pytest.mark.parametrize('response_data', [{'message': 'Unauthorized'}, make_images(4)])
+def test_invalid_list_fails(response_data):
+    with pytest.raises(pytest.fail.Exception, match=r'schema error\(s\) in the response'):
+        validate_response_items(response_data, SCHEMA_PATH, SWAGGER)
+
+
+def test_schema_without_items_is_rejected():
+    with pytest.raises(ValueError, match='isn\'t a schema of a list'):
+        ValidatorRegistry(SWAGGER).validate_items([], [*SCHEMA_PATH, 'items'])
+
+
+def test_registry_is_dropped_with_its_specification():
+    swagger = LazyMapping(dict(SWAGGER))
+    registry = get_validator_registry(swagger)
+    assert get_validator_registry(swagger) is registry
+    assert registry.validate_items(make_images(4), SCHEMA_PATH)
+
+    key = id(swagger)
+    del swagger, registry
+    gc.collect()
+
+    assert key not in validators._registries
+
+
+@pytest.fixture
+def validated(monkeypatch) -> list:
+    """
+    The indexes of the items validated against the item schema by every `validate_items` call.
+    """
+    calls = []
+    collect_errors = validators._collect_errors
+
+    def recording_collect_errors(collect, items):
+        calls.append([index for index, _ in items])
+        return collect_errors(collect, items)
+
+    monkeypatch.setattr(validators, '_collect_errors', recording_collect_errors)
+    return calls
+
+
+def test_valid_items_are_validated_once(validated: list):
+    registry = ValidatorRegistry(SWAGGER, valid_items_size=10)
+    images = make_images(3)
+
+    registry.validate_items(images, SCHEMA_PATH)
+    # equal items are recognized whatever the order of their keys
+    registry.validate_items([{'width': 100, 'id': 'image1'}, {'id': 'image3'}], SCHEMA_PATH)
+
+    assert validated == [[0, 1, 2], [1]]
+
+
+def test_invalid_items_are_validated_again(validated: list):
+    registry = ValidatorRegistry(SWAGGER, valid_items_size=10)
+    images = [{'id': 'image0', 'width': 'wide'}, *make_images(2)]
+
+    for _ in range(2):
+        assert [error.index for error in registry.validate_items(images, SCHEMA_PATH)] == [0]
+
+    assert validated == [[0, 1, 2], [0]]
+
+
+def test_least_recently_valid_items_are_forgotten(validated: list):
+    registry = ValidatorRegistry(SWAGGER, valid_items_size=2)
+    images = make_images(3)
+
+    registry.validate_items(images[:1], SCHEMA_PATH)
+    registry.validate_items(images[1:], SCHEMA_PATH)
+    registry.validate_items(images, SCHEMA_PATH)
+
+    assert validated == [[0], [0, 1], [0]]
+
+
+def test_valid_items_cache_can_be_disabled(validated: list):
+    registry = ValidatorRegistry(SWAGGER, valid_items_size=0)
+
+    registry.validate_items(make_images(2), SCHEMA_PATH)
+    registry.validate_items(make_images(2), SCHEMA_PATH)
+
+    assert validated == [[0, 1], [0, 1]]
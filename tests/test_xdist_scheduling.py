@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.scheduling import TestDuration
+
+pytest.importorskip('xdist')
+
+DURATIONS = [1.0, 6.0, 3.0, 5.0, 2.0, 4.0]
+
+
+class Worker:
+    """
+    A pytest-xdist worker which remembers the tests it was sent.
+    """
+
+    def __init__(self, name: str):
+        self.gateway = SimpleNamespace(id=name)
+        self.sent = []
+        self.shutting_down = False
+
+    def send_runtest_some(self, indices: list):
+        self.sent.extend(indices)
+
+    def shutdown(self):
+        self.shutting_down = True
+
+
+def make_scheduling(pytester, durations: list, workers: int) -> tuple:
+    from utils.xdist_scheduling import DurationScheduling
+
+    collection = [f'test_a.py::test_{index}' for index in range(len(durations))]
+    history = {nodeid: TestDuration(nodeid, duration) for nodeid, duration in zip(collection, durations)}
+    scheduling = DurationScheduling(pytester.parseconfig('--tx', f'{workers}*popen'), None, history)
+    nodes = [Worker(f'gw{index}') for index in range(workers)]
+    for node in nodes:
+        scheduling.add_node(node)
+        scheduling.add_node_collection(node, collection)
+    return scheduling, nodes
+
+
+def sent_durations(node: Worker, durations: list) -> list:
+    return [durations[index] for index in node.sent]
+
+
+def test_longest_tests_go_to_least_loaded_worker(pytester):
+    scheduling, (first, second) = make_scheduling(pytester, DURATIONS, 2)
+
+    scheduling.schedule()
+
+    assert sent_durations(first, DURATIONS) == [6.0, 3.0, 2.0]
+    assert sent_durations(second, DURATIONS) == [5.0, 4.0, 1.0]
+    assert first.shutting_down and second.shutting_down
+
+
+def test_free_worker_gets_next_longest_test(pytester):
+    durations = [*DURATIONS, 0.5, 7.0]
+    scheduling, (first, second) = make_scheduling(pytester, durations, 2)
+    scheduling.schedule()
+    assert sent_durations(first, durations) == [7.0, 4.0, 3.0]
+    assert sent_durations(second, durations) == [6.0, 5.0, 2.0]
+
+    scheduling.mark_test_complete(second, second.sent[0])
+    scheduling.mark_test_complete(second, second.sent[1])
+
+    assert sent_durations(second, durations)[3:] == [1.0, 0.5]
+    assert not second.shutting_down
+    # a worker is shut down once it finishes a test and nothing is pending
+    scheduling.mark_test_complete(first, first.sent[0])
+    assert first.shutting_down and not second.shutting_down
@@ -0,0 +1,210 @@
+"""
+This file contains the transport adapters the sessions of the framework are mounted with.
+
+They subclass the adapters and connections of `requests` and `urllib3`, so they are kept apart from the modules
+which are imported while collecting the tests (`utils.timing`, `utils.cassette`) and loaded only with the HTTP
+stack itself.
+"""
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.utils import stream_decode_response_unicode
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.response import HTTPResponse
+
+from utils.cassette import Cassette, CassetteMiss
+from utils.timing import TimingRecord, current_record
+
+
+# the private method of `HTTPResponse` which creates the content decoder and the attribute it's kept in
+_DECODER_ATTRIBUTES = ('_init_decoder', '_decoder')
+
+
+def _add_phase(phase: str, seconds: float):
+    record = current_record()
+    if record is not None:
+        setattr(record, phase, (getattr(record, phase) or 0.0) + seconds)
+        record.reused = False
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """
+    An HTTP connection which reports the time of establishing it to the current timing record.
+    """
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _add_phase('connect', time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """
+    An HTTPS connection which reports the time of establishing it, split into the TCP and TLS handshakes,
+    to the current timing record.
+    """
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _add_phase('connect', time.perf_counter() - start)
+
+    def connect(self):
+        record = current_record()
+        start = time.perf_counter()
+        connect_before = (record.connect or 0.0) if record is not None else 0.0
+        try:
+            super().connect()
+        finally:
+            if record is not None:
+                # everything but the new TCP connection is the TLS handshake (including a proxy tunnel, if any)
+                _add_phase('tls', time.perf_counter() - start - ((record.connect or 0.0) - connect_before))
+
+
+class _TimedDecoder:
+    """
+    Wraps the content decoder of a response and adds the time of decompressing its body to a timing record.
+    """
+
+    def __init__(self, decoder, record: TimingRecord):
+        self._decoder = decoder
+        self._record = record
+
+    def decompress(self, data: bytes, *args, **kwargs) -> bytes:
+        start = time.perf_counter()
+        try:
+            return self._decoder.decompress(data, *args, **kwargs)
+        finally:
+            self._record.decode += time.perf_counter() - start
+
+    def flush(self) -> bytes:
+        start = time.perf_counter()
+        try:
+            return self._decoder.flush()
+        finally:
+            self._record.decode += time.perf_counter() - start
+
+    def __getattr__(self, name: str):
+        return getattr(self._decoder, name)
+
+
+def _time_decoding(raw: HTTPResponse, record: TimingRecord):
+    """
+    Measures the decompression of the body of a response which hasn't been read yet. The decoder is a private
+    detail of urllib3, so its versions are capped in requirements.txt, if it can't be found the decoding isn't timed.
+    """
+    init_name, decoder_name = _DECODER_ATTRIBUTES
+    init_decoder = getattr(raw, init_name, None)
+    if init_decoder is None:
+        return
+    init_decoder()
+    decoder = getattr(raw, decoder_name, None)
+    if decoder is not None:
+        setattr(raw, decoder_name, _TimedDecoder(decoder, record))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimingHTTPAdapter(HTTPAdapter):
+    """
+    An HTTP adapter which measures the connection phases, the time to the response headers and the decompression
+    of the response body of the requests sent by `APIClient`.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool,
+                                                   'https': TimedHTTPSConnectionPool}
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        record = current_record()
+        if record is None:
+            return super().send(request, **kwargs)
+
+        record.start_attempt()
+        body = request.body or b''
+        record.request_bytes = (len(f'{request.method} {request.path_url} HTTP/1.1\r\n\r\n')
+                                + sum(len(name) + len(value) + 4 for name, value in request.headers.items())
+                                + len(body.encode() if isinstance(body, str) else body))
+        start = time.perf_counter()
+        resp = super().send(request, **kwargs)
+        record._headers_at = time.perf_counter()
+        record.ttfb = record._headers_at - start - (record.connect or 0.0) - (record.tls or 0.0)
+        _time_decoding(resp.raw, record)
+        return resp
+
+
+class CassetteAdapter(BaseAdapter):
+    """
+    A transport adapter which serves requests from a cassette or sends them with the wrapped adapter and
+    records them, depending on the mode of the cassette.
+    """
+
+    def __init__(self, cassette: Cassette, adapter: BaseAdapter):
+        """
+        Args:
+            cassette (Cassette): The cassette.
+            adapter (BaseAdapter): The adapter which sends the not replayed requests.
+        """
+        super(CassetteAdapter, self).__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        """
+        Replays or sends and records a request.
+
+        Raises:
+            CassetteMiss: In the replay mode, if the request wasn't recorded.
+        """
+        if self.cassette.mode != 'record':
+            resp = self.cassette.replay(request)
+            if resp is not None:
+                resp.connection = self
+                return resp
+            if self.cassette.mode == 'replay':
+                raise CassetteMiss(f'No recorded response for {request.method} {request.url} in {self.cassette.path}')
+
+        resp = self.adapter.send(request, **kwargs)
+        if kwargs.get('stream'):
+            self._record_when_read(request, resp)
+        else:
+            self.cassette.record(request, resp)
+        return resp
+
+    def _record_when_read(self, request: requests.PreparedRequest, resp: requests.Response):
+        """
+        Records a streamed response once the caller reads its body to the end, so the body isn't downloaded
+        before the response is returned. A response which is closed before its end is read isn't recorded.
+        """
+        iter_content = resp.iter_content
+
+        def tee(chunks):
+            body = []
+            for chunk in chunks:
+                body.append(chunk)
+                yield chunk
+            self.cassette.record(request, resp, b''.join(body))
+
+        def recording_iter_content(chunk_size=1, decode_unicode=False):
+            # the bytes are recorded, so they are decoded to text after the tee
+            chunks = tee(iter_content(chunk_size))
+            return stream_decode_response_unicode(chunks, resp) if decode_unicode else chunks
+
+        # `content`, `iter_lines` and the callers read the body through `iter_content`
+        resp.iter_content = recording_iter_content
+
+    def close(self):
+        self.adapter.close()
@@ -0,0 +1,192 @@
+"""
+This file contains the capture policy which controls how request and response details are attached to Allure reports.
+
+Attachments are registered as callables and rendered only when they are actually attached, so the cost of
+serializing URLs, headers and bodies is paid only for the captured requests.
+"""
+import random
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+import allure
+import allure_commons
+
+MODES = ('off', 'on_failure', 'sampled', 'full')
+
+# the maximum number of captures of the 'on_failure' mode kept for a test, the oldest ones are dropped
+MAX_PENDING = 200
+
+# captures of the 'on_failure' mode waiting for the outcome of the current test
+_pending = deque(maxlen=MAX_PENDING)
+# the number of captures of the current test dropped because `_pending` was full
+_dropped = 0
+_pending_lock = threading.Lock()
+
+
+def allure_enabled() -> bool:
+    """
+    Checks whether any Allure listener (e.g. `allure-pytest` with `--alluredir`) is collecting attachments.
+
+    Returns:
+        bool: True if attachments are collected.
+    """
+    return bool(allure_commons.plugin_manager.hook.attach_data.get_hookimpls())
+
+
+def truncate(text: str, max_size: int = None) -> str:
+    """
+    Truncates a text to the maximum size, noting how many characters were cut off.
+
+    Args:
+        text (str): The text to truncate.
+        max_size (int, optional): The maximum number of kept characters, None disables truncation.
+
+    Returns:
+        str: The truncated text.
+    """
+    if max_size is None or len(text) <= max_size:
+        return text
+    return f'{text[:max_size]}... [truncated {len(text) - max_size} characters]'
+
+
+class Capture:
+    """
+    Attachments of a single request, collected as render callables.
+    """
+
+    def __init__(self, policy: 'CapturePolicy'):
+        self._policy = policy
+        self._attachments = []
+
+    def add(self, name: str, render: Callable[[], str], attachment_type=allure.attachment_type.TEXT):
+        """
+        Registers an attachment, its body is rendered only when it's attached.
+
+        Args:
+            name (str): The name of the attachment.
+            render (Callable): A function returning the body of the attachment.
+            attachment_type (allure.attachment_type, optional): The type of the attachment.
+        """
+        self._attachments.append((name, render, attachment_type))
+
+    def attach(self):
+        """
+        Renders the registered attachments, truncating the bodies, and attaches them to the Allure report.
+        """
+        for name, render, attachment_type in self._attachments:
+            allure.attach(truncate(render(), self._policy.max_body_size), name=name, attachment_type=attachment_type)
+        self._attachments = []
+
+    def commit(self):
+        """
+        Attaches the registered attachments right away or, in the 'on_failure' mode, keeps them until the outcome
+        of the current test is known.
+        """
+        global _dropped
+        if self._policy.mode == 'on_failure':
+            with _pending_lock:
+                if len(_pending) == _pending.maxlen:
+                    _dropped += 1
+                _pending.append(self)
+        else:
+            self.attach()
+
+
+class CapturePolicy:
+    """
+    A policy which decides whether the details of a request are attached to the Allure report.
+
+    Modes:
+        - 'off': nothing is attached.
+        - 'on_failure': attachments are kept in memory and attached only if the current test fails.
+        - 'sampled': attachments of a random `sample_rate` share of the requests are attached.
+        - 'full': attachments of every request are attached.
+
+    Attributes:
+        mode (str): The capture mode.
+        sample_rate (float): The share of the captured requests in the 'sampled' mode.
+        max_body_size (int): The maximum number of characters of an attachment, None disables truncation.
+    """
+
+    def __init__(self, mode: str = 'full', sample_rate: float = 0.1, max_body_size: int = None, seed: int = None):
+        """
+        Initializes a CapturePolicy instance.
+
+        Args:
+            mode (str, optional): The capture mode, one of 'off', 'on_failure', 'sampled' and 'full'.
+            sample_rate (float, optional): The share of the captured requests in the 'sampled' mode.
+            max_body_size (int, optional): The maximum number of characters of an attachment.
+            seed (int, optional): The seed for the sampling, allows to reproduce the sampled requests.
+
+        Raises:
+            ValueError: If an unknown mode or a sample rate outside [0, 1] is specified.
+        """
+        if mode not in MODES:
+            raise ValueError(f'Unknown capture mode {mode}, expected one of {MODES}')
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f'Invalid sample rate {sample_rate}, it has to be between 0 and 1')
+
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.max_body_size = max_body_size
+        self._random = random.Random(seed)
+
+    def start(self) -> Optional[Capture]:
+        """
+        Decides whether a request has to be captured.
+
+        Returns:
+            Optional[Capture]: A capture to register the attachments of the request, None if it isn't captured.
+        """
+        if self.mode == 'off' or not allure_enabled():
+            return None
+        if self.mode == 'sampled' and self._random.random() >= self.sample_rate:
+            return None
+        return Capture(self)
+
+
+def attach_pending():
+    """
+    Attaches all captures kept by the 'on_failure' mode to the Allure report, noting how many older captures
+    of the test were dropped.
+    """
+    global _dropped
+    with _pending_lock:
+        captures = list(_pending)
+        dropped, _dropped = _dropped, 0
+        _pending.clear()
+    if dropped:
+        allure.attach(f'{dropped} earlier capture(s) of the test were dropped, only the last {MAX_PENDING} are kept',
+                      name='Dropped captures', attachment_type=allure.attachment_type.TEXT)
+    for capture in captures:
+        capture.attach()
+
+
+def discard_pending():
+    """
+    Drops all captures kept by the 'on_failure' mode without rendering them.
+    """
+    global _dropped
+    with _pending_lock:
+        _pending.clear()
+        _dropped = 0
+
+
+def pending_count() -> int:
+    """
+    Returns:
+        int: The number of captures kept by the 'on_failure' mode for the current test.
+    """
+    with _pending_lock:
+        return len(_pending)
+
+
+def dropped_count() -> int:
+    """
+    Returns:
+        int: The number of captures of the current test dropped by the 'on_failure' mode because the maximum
+             of `MAX_PENDING` kept captures was reached.
+    """
+    with _pending_lock:
+        return _dropped
@@ -0,0 +1,240 @@
+"""
+This file contains a record/replay store ("cassette") for the HTTP traffic of API clients.
+
+In the record mode every request sent by a session is forwarded to the API and the request with its response is
+appended to a JSON Lines file. In the replay mode responses are served from an in-memory index of that file
+without contacting the API. Requests are matched by method, URL, query parameters and body hash; headers are
+matched only by the configured rules, so e.g. recordings made with one API key can be replayed with another one.
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+from utils.log import create_logger
+
+if TYPE_CHECKING:
+    import requests
+
+logger = create_logger('cassette')
+
+MODES = ('record', 'replay', 'auto')
+# headers which are never written to the cassette
+REDACTED_HEADERS = ('x-api-key', 'authorization', 'cookie')
+# headers of recorded responses which don't describe the stored (decoded) body
+DROPPED_RESPONSE_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+class CassetteMiss(Exception):
+    """
+    Raised in the replay mode when a request has no recorded response.
+    """
+
+
+class Cassette:
+    """
+    An append-only store of recorded requests and responses with an in-memory index.
+
+    Attributes:
+        path (Path): The JSON Lines file of the cassette.
+        mode (str): 'record' forwards every request and records it, 'replay' serves only recorded responses and
+                    'auto' replays recorded responses and records the missing ones.
+        match_headers (tuple): Headers whose values are a part of the request key.
+        presence_headers (tuple): Headers whose presence, but not value, is a part of the request key.
+    """
+
+    def __init__(self, path: Union[Path, str], mode: str = 'replay', match_headers: tuple = (),
+                 presence_headers: tuple = ('x-api-key',)):
+        """
+        Initializes a Cassette instance and loads the recorded entries of the file, if it exists.
+
+        Args:
+            path (Union[Path, str]): The JSON Lines file of the cassette.
+            mode (str, optional): One of 'record', 'replay' and 'auto'.
+            match_headers (tuple, optional): Headers whose values are a part of the request key.
+            presence_headers (tuple, optional): Headers whose presence, but not value, is a part of the request key.
+                                                By default, authorized and not authorized requests are told apart,
+                                                but the API key itself is ignored.
+
+        Raises:
+            ValueError: If an unknown mode is specified.
+        """
+        if mode not in MODES:
+            raise ValueError(f'Unknown cassette mode {mode}, expected one of {MODES}')
+
+        self.path = Path(path)
+        self.mode = mode
+        self.match_headers = tuple(header.lower() for header in match_headers)
+        self.presence_headers = tuple(header.lower() for header in presence_headers)
+        self._entries = []
+        self._index = defaultdict(list)
+        self._used = set()
+        self._replay_positions = defaultdict(int)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """
+        Reads the recorded entries of the cassette file into the index.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    self._add(json.loads(line))
+        logger.info('Loaded %s recorded requests from %s', len(self._entries), self.path)
+
+    def _add(self, entry: dict):
+        self._index[entry['key']].append(len(self._entries))
+        self._entries.append(entry)
+
+    def request_key(self, request: 'requests.PreparedRequest') -> str:
+        """
+        Builds the key a request is matched by.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+
+        Returns:
+            str: The key of the request.
+        """
+        url = urlsplit(request.url)
+        body = request.body.encode() if isinstance(request.body, str) else request.body or b''
+        headers = {name.lower(): value for name, value in request.headers.items()}
+        key = {
+            'method': request.method,
+            'url': urlunsplit((url.scheme, url.netloc, url.path, '', '')),
+            'params': sorted(parse_qsl(url.query, keep_blank_values=True)),
+            'body': hashlib.sha256(body).hexdigest(),
+            'headers': {name: headers.get(name) for name in self.match_headers},
+            'present_headers': [name for name in self.presence_headers if name in headers],
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def replay(self, request: 'requests.PreparedRequest') -> Optional['requests.Response']:
+        """
+        Builds the recorded response of a request. Responses recorded several times for the same key are replayed
+        in the recorded order, the last one is repeated afterwards.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+
+        Returns:
+            Optional[requests.Response]: The recorded response or None if the request wasn't recorded.
+        """
+        key = self.request_key(request)
+        with self._lock:
+            positions = self._index.get(key)
+            if not positions:
+                return None
+            position = min(self._replay_positions[key], len(positions) - 1)
+            self._replay_positions[key] += 1
+            self._used.add(positions[position])
+            entry = self._entries[positions[position]]
+
+        # the HTTP stack is loaded only once a response is replayed, not by collecting the tests
+        from requests import Response
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+
+        recorded = entry['response']
+        resp = Response()
+        resp.status_code = recorded['status']
+        resp.reason = recorded['reason']
+        resp.headers = CaseInsensitiveDict(recorded['headers'])
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp._content = base64.b64decode(recorded['body']) if recorded['base64'] else recorded['body'].encode()
+        # the body is already in memory, so that it's also served to the streaming readers (`stream=True`)
+        resp._content_consumed = True
+        resp.url = request.url
+        resp.request = request
+        resp.elapsed = timedelta(0)
+        return resp
+
+    def record(self, request: 'requests.PreparedRequest', resp: 'requests.Response', content: bytes = None):
+        """
+        Appends a request and its response to the cassette.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+            resp (requests.Response): The response, its body is read unless `content` is passed.
+            content (bytes, optional): The body of the response, e.g. collected while a streamed response was read.
+        """
+        if content is None:
+            content = resp.content
+        try:
+            body, is_base64 = content.decode('utf-8'), False
+        except UnicodeDecodeError:
+            body, is_base64 = base64.b64encode(content).decode('ascii'), True
+
+        entry = {
+            'key': self.request_key(request),
+            'recorded_at': time.time(),
+            'request': {
+                'method': request.method,
+                'url': request.url,
+                'headers': {
+                    name: '<redacted>' if name.lower() in REDACTED_HEADERS else value
+                    for name, value in request.headers.items()
+                },
+                'body_sha256': hashlib.sha256(
+                    request.body.encode() if isinstance(request.body, str) else request.body or b'').hexdigest(),
+            },
+            'response': {
+                'status': resp.status_code,
+                'reason': resp.reason,
+                'headers': {
+                    name: value for name, value in resp.headers.items()
+                    if name.lower() not in DROPPED_RESPONSE_HEADERS
+                },
+                'body': body,
+                'base64': is_base64,
+            },
+        }
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(line)
+            self._add(entry)
+            self._used.add(len(self._entries) - 1)
+
+    def unused(self) -> list:
+        """
+        Returns:
+            list: The recorded entries which weren't replayed or recorded in this session.
+        """
+        with self._lock:
+            return [entry for position, entry in enumerate(self._entries) if position not in self._used]
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: The number of recorded entries and the requests of the unused ones.
+        """
+        unused = self.unused()
+        return {
+            'path': str(self.path),
+            'mode': self.mode,
+            'entries': len(self._entries),
+            'unused': [f'{entry["request"]["method"]} {entry["request"]["url"]}' for entry in unused],
+        }
+
+    def mount(self, session: 'requests.Session'):
+        """
+        Wraps the HTTP(S) adapters of a session, so all its traffic goes through the cassette.
+
+        Args:
+            session (requests.Session): The session.
+        """
+        from utils.adapters import CassetteAdapter
+
+        for prefix in ('http://', 'https://'):
+            session.mount(prefix, CassetteAdapter(self, session.get_adapter(prefix)))
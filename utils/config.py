@@ -2,6 +2,47 @@
 This file contains config variables and utility functions for them.
 """
 import os
+from pathlib import Path
 
-THE_CAT_API_BASE_URL = 'https://api.thecatapi.com/v1'
+THE_CAT_API_BASE_URL = os.getenv('THE_CAT_API_BASE_URL', 'https://api.thecatapi.com/v1')
 THE_CAT_API_KEY = os.getenv('THE_CAT_API_KEY')
+THE_CAT_API_MAX_CONCURRENCY = int(os.getenv('THE_CAT_API_MAX_CONCURRENCY', 10))
+# requests per second for all processes (e.g. pytest-xdist workers) together, 0 disables rate limiting
+THE_CAT_API_RATE_LIMIT = float(os.getenv('THE_CAT_API_RATE_LIMIT', 0))
+THE_CAT_API_RATE_BURST = int(os.getenv('THE_CAT_API_RATE_BURST', 1))
+
+SCHEMA_VALIDATOR_BACKEND = os.getenv('SCHEMA_VALIDATOR_BACKEND', 'jsonschema')
+SCHEMA_VALIDATOR_CACHE_SIZE = int(os.getenv('SCHEMA_VALIDATOR_CACHE_SIZE', 128))
+# worker processes validating the items of long list responses, 0 validates them in the test process
+SCHEMA_VALIDATOR_PROCESSES = int(os.getenv('SCHEMA_VALIDATOR_PROCESSES', 0))
+
+API_CAPTURE_MODE = os.getenv('API_CAPTURE_MODE', 'full')
+API_CAPTURE_SAMPLE_RATE = float(os.getenv('API_CAPTURE_SAMPLE_RATE', 0.1))
+API_CAPTURE_MAX_BODY_SIZE = int(os.getenv('API_CAPTURE_MAX_BODY_SIZE', 10000))
+
+# the minimum level of the framework loggers and the overrides of single loggers, e.g. 'api=WARNING,stub-server=ERROR'
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+# JSON Lines file the logs are written to by a background thread, empty to leave them to pytest's log capture
+LOG_JSON_FILE = os.getenv('LOG_JSON_FILE', '')
+LOG_BODY_PREVIEW_SIZE = int(os.getenv('LOG_BODY_PREVIEW_SIZE', 1000))
+
+# 'json' (the standard library) or 'orjson' (requires `pip install orjson`)
+API_JSON_BACKEND = os.getenv('API_JSON_BACKEND', 'json')
+# the Accept-Encoding header of the API clients, e.g. 'gzip', 'deflate' or 'identity' for uncompressed responses
+API_ACCEPT_ENCODING = os.getenv('API_ACCEPT_ENCODING', 'gzip, deflate')
+API_POOL_MAXSIZE = int(os.getenv('API_POOL_MAXSIZE', 10))
+API_MAX_RETRIES_ON_429 = int(os.getenv('API_MAX_RETRIES_ON_429', 3))
+API_MAX_RETRY_DELAY = float(os.getenv('API_MAX_RETRY_DELAY', 60))
+
+# the maximum number of requests of a query parameter fuzzing run
+FUZZ_MAX_REQUESTS = int(os.getenv('FUZZ_MAX_REQUESTS', 100))
+
+# image files are downloaded from the CDN, not from the API, so a whole page of search results is verified at once
+IMAGE_VERIFIER_CONCURRENCY = int(os.getenv('IMAGE_VERIFIER_CONCURRENCY', 25))
+
+# SQLite database of the durations of the tests in the previous runs, used to schedule and select the tests,
+# e.g. './.cache/test_durations.sqlite3', empty (the default) to not keep the history
+TEST_DURATIONS_DB = os.getenv('TEST_DURATIONS_DB', '')
+
+SWAGGER_CACHE_DIR = os.getenv('SWAGGER_CACHE_DIR', str(Path(__file__).parent.parent / '.cache' / 'swagger'))
@@ -0,0 +1,333 @@
+"""
+This file contains a fuzzer of the query parameters of an endpoint, driven by their schemas in `swagger.yaml`.
+
+Every parameter is split into equivalence classes: each value of an enum, the boundaries of an integer range,
+both booleans and the absence of the parameter are valid classes, while values of the wrong type or out of range are
+invalid ones. The valid classes are combined pairwise (every pair of classes of two parameters is sent at least
+once), and every invalid class is sent on its own, because the API rejects the whole request whatever the other
+parameters are. Cases with the same classes are equivalent and only the first of them is sent. All cases, up to
+a budget of requests, are sent as one concurrent batch.
+
+Only the invalid classes known to be rejected by the API (`REJECTED_INVALID_CLASSES`) are expected to return
+'400 Bad Request' with the description of swagger.yaml, the API may ignore the other invalid values, so their
+requests only must not fail with a server error.
+"""
+import json
+from itertools import combinations
+from typing import TYPE_CHECKING, Mapping, Optional
+
+import allure
+
+from utils.log import create_logger
+
+if TYPE_CHECKING:
+    from interfaces.api_response import APIResponse
+    from interfaces.async_api_client import AsyncAPIClient
+
+logger = create_logger('fuzz')
+
+INVALID_VALUE = 'qwerty'
+# the extensions of the image files returned for the `mime_types` query parameter
+MIME_TYPE_EXTENSIONS = {'jpg': ('jpg', 'jpeg'), 'png': ('png',), 'gifs': ('gif',)}
+# valid parameters which are ignored unless another parameter has one of the values, as described in swagger.yaml:
+# only ordered searches are paginated
+DEPENDENT_PARAMETERS = {'page': ('order', ('ASC', 'DESC'))}
+# the invalid classes which TheCatAPI is known to reject with '400 Bad Request', by query parameter
+REJECTED_INVALID_CLASSES = {
+    'limit': ('below minimum', 'not an integer'),
+    'has_breeds': ('not a boolean',),
+}
+
+
+class EquivalenceClass:
+    """
+    A class of values of a query parameter which the API is expected to treat the same way.
+
+    Attributes:
+        parameter (str): The name of the query parameter.
+        label (str): The name of the class, e.g. 'minimum' or 'not an integer'.
+        value: The value the class is represented by, None if the parameter is absent.
+        valid (bool): True if the values of the class conform to the schema.
+    """
+
+    def __init__(self, parameter: str, label: str, value, valid: bool = True):
+        self.parameter = parameter
+        self.label = label
+        self.value = value
+        self.valid = valid
+
+    def __repr__(self):
+        return f'{self.parameter}: {self.label}'
+
+
+def equivalence_classes(name: str, schema: Mapping) -> [EquivalenceClass]:
+    """
+    Splits the values of a query parameter into equivalence classes by its schema.
+
+    Args:
+        name (str): The name of the query parameter.
+        schema (Mapping): The schema of the query parameter.
+
+    Returns:
+        list[EquivalenceClass]: The valid classes, the absent parameter first, followed by the invalid ones.
+    """
+    classes = [EquivalenceClass(name, 'absent', None)]
+    schema_type = schema.get('type')
+    if 'enum' in schema:
+        classes += [EquivalenceClass(name, str(value), value) for value in schema['enum']]
+        classes.append(EquivalenceClass(name, 'not in enum', INVALID_VALUE, valid=False))
+    elif schema_type == 'integer':
+        minimum, maximum = schema.get('minimum'), schema.get('maximum')
+        if minimum is not None:
+            classes += [EquivalenceClass(name, 'minimum', minimum), EquivalenceClass(name, 'above minimum', minimum + 1)]
+            classes.append(EquivalenceClass(name, 'below minimum', minimum - 1, valid=False))
+        if maximum is not None:
+            classes.append(EquivalenceClass(name, 'maximum', maximum))
+            classes.append(EquivalenceClass(name, 'above maximum', maximum + 1, valid=False))
+        if minimum is None and maximum is None:
+            classes.append(EquivalenceClass(name, 'any', 1))
+        classes.append(EquivalenceClass(name, 'not an integer', INVALID_VALUE, valid=False))
+    elif schema_type == 'boolean':
+        classes += [EquivalenceClass(name, 'true', True), EquivalenceClass(name, 'false', False)]
+        classes.append(EquivalenceClass(name, 'not a boolean', INVALID_VALUE, valid=False))
+    else:
+        classes.append(EquivalenceClass(name, 'any', 'abc'))
+    return classes
+
+
+def pairwise(domains: [list]) -> [tuple]:
+    """
+    Builds combinations which contain every pair of values of any two domains at least once.
+
+    The combinations are built greedily: every combination starts with the first uncovered pair and is completed
+    with the values covering the most uncovered pairs, so the first combinations cover the most pairs.
+
+    Args:
+        domains (list[list]): The values of every domain.
+
+    Returns:
+        list[tuple]: The combinations, one value of every domain each.
+    """
+    if len(domains) < 2:
+        return [(value,) for value in domains[0]] if domains else []
+
+    uncovered = {(i, a, j, b) for i, j in combinations(range(len(domains)), 2)
+                 for a in range(len(domains[i])) for b in range(len(domains[j]))}
+    rows = []
+    while uncovered:
+        i, a, j, b = min(uncovered)
+        row = [None] * len(domains)
+        row[i], row[j] = a, b
+        for k in range(len(domains)):
+            if row[k] is None:
+                row[k] = max(range(len(domains[k])), key=lambda v: sum(
+                    (min(k, m), v if k < m else row[m], max(k, m), row[m] if k < m else v) in uncovered
+                    for m in range(len(domains)) if row[m] is not None))
+        uncovered -= {(i, row[i], j, row[j]) for i, j in combinations(range(len(domains)), 2)}
+        rows.append(tuple(domain[index] for domain, index in zip(domains, row)))
+    return rows
+
+
+class FuzzCase:
+    """
+    A request of the fuzzer.
+
+    Attributes:
+        classes (tuple[EquivalenceClass]): The classes of the parameters which aren't absent.
+        params (dict): The query parameters of the request.
+        valid (bool): True if all parameters are valid, i.e. the request has to succeed.
+    """
+
+    def __init__(self, classes: [EquivalenceClass]):
+        self.classes = tuple(c for c in classes if c.label != 'absent')
+        self.params = {c.parameter: c.value for c in self.classes}
+        self.valid = all(c.valid for c in self.classes)
+
+    @property
+    def signature(self) -> frozenset:
+        """
+        Returns:
+            frozenset: The classes which determine the response, cases with the same signature are equivalent.
+        """
+        invalid = [c for c in self.classes if not c.valid]
+        if invalid:
+            # a request with an invalid parameter is rejected whatever the other parameters are
+            return frozenset([(invalid[0].parameter, invalid[0].label)])
+        return frozenset((c.parameter, c.label) for c in self.classes if self._effective(c))
+
+    def _effective(self, equivalence_class: EquivalenceClass) -> bool:
+        dependency = DEPENDENT_PARAMETERS.get(equivalence_class.parameter)
+        return dependency is None or self.params.get(dependency[0]) in dependency[1]
+
+    def __repr__(self):
+        return f'FuzzCase({self.params})'
+
+
+def collapse(cases: [FuzzCase]) -> [FuzzCase]:
+    """
+    Removes the cases which are equivalent to an earlier one.
+
+    Returns:
+        list[FuzzCase]: The first case of every signature, in the original order.
+    """
+    unique = {}
+    for case in cases:
+        unique.setdefault(case.signature, case)
+    return list(unique.values())
+
+
+class FuzzResult:
+    """
+    The result of a fuzz case.
+
+    Attributes:
+        case (FuzzCase): The sent case.
+        status (Optional[int]): The status code of the response, None if the request failed.
+        errors (list[str]): The found problems, empty if the response is as expected.
+    """
+
+    def __init__(self, case: FuzzCase, status: Optional[int] = None, errors: [str] = None):
+        self.case = case
+        self.status = status
+        self.errors = errors or []
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> dict:
+        return {'params': self.case.params, 'valid': self.case.valid,
+                'classes': [repr(c) for c in self.case.classes], 'status': self.status, 'errors': self.errors}
+
+
+class QueryParameterFuzzer:
+    """
+    Generates and sends the fuzz cases of the query parameters of a GET endpoint.
+
+    Attributes:
+        path (str): The path of the endpoint in the Swagger specification, e.g. '/images/search'.
+        operation (Mapping): The GET operation of the endpoint.
+        classes (dict[str, list[EquivalenceClass]]): The equivalence classes by query parameter.
+        budget (Optional[int]): The maximum number of sent requests, None for no limit.
+        rejected (Mapping[str, tuple]): The labels of the invalid classes which are expected to return
+                                        '400 Bad Request', by query parameter.
+    """
+
+    def __init__(self, swagger: Mapping, path: str, parameters: [str] = None, budget: Optional[int] = None,
+                 rejected: Mapping = None):
+        """
+        Initializes a QueryParameterFuzzer instance.
+
+        Args:
+            swagger (Mapping): The dereferenced Swagger specification.
+            path (str): The path of the endpoint in the Swagger specification.
+            parameters (list[str], optional): The fuzzed query parameters, by default all of them.
+            budget (int, optional): The maximum number of sent requests, None for no limit.
+            rejected (Mapping[str, tuple], optional): The labels of the invalid classes which are expected to return
+                                                      '400 Bad Request', by default `REJECTED_INVALID_CLASSES`.
+
+        Raises:
+            ValueError: If a parameter isn't a query parameter of the endpoint or the budget is less than 1.
+        """
+        if budget is not None and budget < 1:
+            raise ValueError(f'Invalid budget {budget}, it has to be at least 1')
+
+        self.path = path
+        self.operation = swagger['paths'][path]['get']
+        schemas = {parameter['name']: parameter.get('schema', {}) for parameter in self.operation.get('parameters', [])
+                   if parameter.get('in') == 'query'}
+        unknown = set(parameters or []) - set(schemas)
+        if unknown:
+            raise ValueError(f'Unknown query parameter(s) {sorted(unknown)} of {path}')
+        self.classes = {name: equivalence_classes(name, schemas[name]) for name in parameters or schemas}
+        self.budget = budget
+        self.rejected = REJECTED_INVALID_CLASSES if rejected is None else rejected
+
+    def cases(self) -> [FuzzCase]:
+        """
+        Generates the cases: the pairwise combinations of the valid classes and every invalid class on its own,
+        without equivalent cases and cut to the budget.
+
+        Returns:
+            list[FuzzCase]: The cases in the order they are sent.
+        """
+        valid = pairwise([[c for c in classes if c.valid] for classes in self.classes.values()])
+        invalid = [[c] for classes in self.classes.values() for c in classes if not c.valid]
+        generated = [FuzzCase(classes) for classes in valid + invalid]
+        unique = collapse(generated)
+        cases = unique[:self.budget] if self.budget is not None else unique
+        logger.info('Generated %s fuzz cases of %s, %s equivalent ones collapsed, %s to be sent',
+                    len(generated), self.path, len(generated) - len(unique), len(cases))
+        if len(cases) < len(unique):
+            logger.warning('The budget of %s requests skips %s fuzz case(s)', self.budget, len(unique) - len(cases))
+        return cases
+
+    def check(self, case: FuzzCase, resp: 'APIResponse') -> [str]:
+        """
+        Checks a response against the expectations of its case.
+
+        Returns:
+            list[str]: The found problems, empty if the response is as expected.
+        """
+        if not case.valid:
+            invalid = next(c for c in case.classes if not c.valid)
+            if invalid.label not in self.rejected.get(invalid.parameter, ()):
+                # the API may ignore the value, it only must not fail
+                return [f'Status code {resp.status_code}'] if resp.status_code >= 500 else []
+            expected_text = self.operation['responses']['400']['description']
+            errors = [] if resp.status_code == 400 else [f'Status code {resp.status_code} instead of 400']
+            if resp.status_code == 400 and resp.text != expected_text:
+                errors.append(f'Response text {resp.text!r} instead of {expected_text!r}')
+            return errors
+        if resp.status_code != 200:
+            return [f'Status code {resp.status_code} instead of 200']
+        if case.params.get('format') == 'src':
+            # the image file is returned instead of JSON
+            return []
+
+        try:
+            images = resp.json()
+        except ValueError:
+            return ['The response isn\'t JSON']
+        if not isinstance(images, list):
+            return [f'The response is {type(images).__name__} instead of a list']
+        errors = []
+        if 'limit' in case.params and len(images) > case.params['limit']:
+            errors.append(f'{len(images)} images returned for limit {case.params["limit"]}')
+        if 'has_breeds' in case.params:
+            mismatched = [image.get('id') for image in images if bool(image.get('breeds')) != case.params['has_breeds']]
+            if mismatched:
+                errors.append(f'Images {mismatched} don\'t match has_breeds={case.params["has_breeds"]}')
+        if case.params.get('mime_types') in MIME_TYPE_EXTENSIONS:
+            extensions = MIME_TYPE_EXTENSIONS[case.params['mime_types']]
+            mismatched = [image.get('id') for image in images
+                          if str(image.get('url', '')).rsplit('.', 1)[-1].lower() not in extensions]
+            if mismatched:
+                errors.append(f'Images {mismatched} don\'t match mime_types={case.params["mime_types"]}')
+        return errors
+
+    def run(self, client: 'AsyncAPIClient') -> [FuzzResult]:
+        """
+        Sends all cases as one concurrent batch and checks their responses.
+
+        Args:
+            client (AsyncAPIClient): The client the requests are sent with, its concurrency cap applies.
+
+        Returns:
+            list[FuzzResult]: The results in the order of the cases.
+        """
+        cases = self.cases()
+        with allure.step(f'Fuzz the query parameters of {self.path} with {len(cases)} requests'):
+            responses = client.batch(*(client.get(self.path, params=case.params) for case in cases),
+                                     return_exceptions=True)
+            results = []
+            for case, resp in zip(cases, responses):
+                if isinstance(resp, Exception):
+                    results.append(FuzzResult(case, errors=[f'The request failed: {resp!r}']))
+                else:
+                    results.append(FuzzResult(case, resp.status_code, self.check(case, resp)))
+            failed = sum(not result.ok for result in results)
+            logger.info('Sent %s fuzz cases of %s, %s failed', len(cases), self.path, failed)
+            allure.attach(json.dumps([result.to_dict() for result in results], indent=2), 'Fuzz cases',
+                          allure.attachment_type.JSON)
+        return results
@@ -0,0 +1,186 @@
+"""
+This file contains a latency histogram in the style of HdrHistogram.
+
+Latencies are counted in log-linear buckets: every power of two range is split into the same number of linear
+sub-buckets, so the relative error of a reported value is bounded by the number of significant figures regardless
+of its magnitude. The counts are kept sparse and histograms of the same precision can be merged, e.g. those of
+several threads, processes or runs.
+"""
+import math
+from collections import Counter
+from typing import Optional
+
+
+class LatencyHistogram:
+    """
+    A mergeable latency histogram with a bounded relative error.
+
+    Latencies are recorded in seconds and stored as whole microseconds.
+
+    Attributes:
+        significant_figures (int): The number of significant decimal figures kept for every recorded value.
+        count (int): The number of recorded values.
+        total (int): The sum of the recorded values in microseconds.
+        min (Optional[int]): The lowest recorded value in microseconds.
+        max (Optional[int]): The highest recorded value in microseconds.
+    """
+
+    def __init__(self, significant_figures: int = 2):
+        """
+        Initializes an empty LatencyHistogram instance.
+
+        Args:
+            significant_figures (int, optional): The number of significant decimal figures, from 1 to 5.
+
+        Raises:
+            ValueError: If the number of significant figures is out of range.
+        """
+        if not 1 <= significant_figures <= 5:
+            raise ValueError(f'Invalid significant_figures {significant_figures}, it has to be from 1 to 5')
+
+        self.significant_figures = significant_figures
+        self._sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self._sub_bucket_count = 1 << self._sub_bucket_bits
+        self._half_count = self._sub_bucket_count >> 1
+        self._counts = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value: int) -> int:
+        """
+        Returns:
+            int: The bucket of a value in microseconds.
+        """
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self._sub_bucket_bits
+        return shift * self._half_count + (value >> shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        """
+        Returns:
+            int: The highest value in microseconds which falls into a bucket.
+        """
+        if index < self._sub_bucket_count:
+            return index
+        shift = index // self._half_count - 1
+        return ((index - shift * self._half_count + 1) << shift) - 1
+
+    def record(self, seconds: float, count: int = 1):
+        """
+        Records a latency.
+
+        Args:
+            seconds (float): The latency in seconds, negative values are recorded as 0.
+            count (int, optional): The number of times the latency occurred.
+        """
+        value = max(int(seconds * 1e6), 0)
+        self._counts[self._index(value)] += count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """
+        Adds the counts of another histogram to this one.
+
+        Args:
+            other (LatencyHistogram): The histogram to add.
+
+        Returns:
+            LatencyHistogram: This histogram.
+
+        Raises:
+            ValueError: If the histograms have different precisions.
+        """
+        if other.significant_figures != self.significant_figures:
+            raise ValueError(f'Cannot merge a histogram with {other.significant_figures} significant figures '
+                             f'into one with {self.significant_figures}')
+
+        self._counts.update(other._counts)
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        Returns the latency at or below which the given percentage of the recorded values fall.
+
+        Args:
+            percentile (float): The percentile, from 0 to 100.
+
+        Returns:
+            Optional[float]: The latency in milliseconds, None if the histogram is empty.
+        """
+        if not self.count:
+            return None
+        target = max(math.ceil(percentile / 100 * self.count), 1)
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max) / 1000
+        return self.max / 1000
+
+    @property
+    def mean(self) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: The mean latency in milliseconds, None if the histogram is empty.
+        """
+        return self.total / self.count / 1000 if self.count else None
+
+    def summary(self, percentiles: tuple = (50, 95, 99)) -> dict:
+        """
+        Returns:
+            dict: The count, min, mean, max and the given percentiles (e.g. 'p95') in milliseconds.
+        """
+        summary = {
+            'count': self.count,
+            'min_ms': self.min / 1000 if self.count else None,
+            'mean_ms': self.mean,
+            'max_ms': self.max / 1000 if self.count else None,
+        }
+        for percentile in percentiles:
+            summary[f'p{percentile:g}_ms'] = self.percentile(percentile)
+        return summary
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A JSON serializable representation, which can be loaded by `from_dict` and merged.
+        """
+        return {
+            'significant_figures': self.significant_figures,
+            'count': self.count,
+            'total_us': self.total,
+            'min_us': self.min,
+            'max_us': self.max,
+            'counts': {str(index): count for index, count in sorted(self._counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LatencyHistogram':
+        """
+        Loads a histogram from the representation returned by `to_dict`.
+
+        Args:
+            data (dict): The representation of the histogram.
+
+        Returns:
+            LatencyHistogram: The histogram.
+        """
+        histogram = cls(data['significant_figures'])
+        histogram._counts = Counter({int(index): count for index, count in data['counts'].items()})
+        histogram.count = data['count']
+        histogram.total = data['total_us']
+        histogram.min = data['min_us']
+        histogram.max = data['max_us']
+        return histogram
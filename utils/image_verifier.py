@@ -0,0 +1,310 @@
+"""
+This file contains a verifier of the image files referenced by the responses of TheCatAPI.
+
+Every image is downloaded in chunks: the chunks are hashed and fed to an incremental header parser, which detects
+the format and the dimensions of the image, and then dropped. So the memory used by a download doesn't depend on
+the size of the image. The downloads run concurrently over one pooled session, so verifying a page of images takes
+about as long as the slowest download.
+"""
+import hashlib
+import json
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import allure
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.log import create_logger
+
+logger = create_logger('image-verifier')
+
+CHUNK_SIZE = 64 * 1024
+# the formats of the `mime_types` query parameter of `/images/search`
+MIME_TYPE_FORMATS = {'jpg': 'jpeg', 'png': 'png', 'gifs': 'gif'}
+EXTENSION_FORMATS = {'jpg': 'jpeg', 'jpeg': 'jpeg', 'png': 'png', 'gif': 'gif'}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_TRAILER = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+# JPEG start of frame markers, which carry the dimensions (all SOFn but DHT, JPG and DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# JPEG markers without a length, e.g. restart markers
+JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xDA)) | {0x01}
+
+
+class ImageHeaderParser:
+    """
+    An incremental parser of the headers of JPEG, PNG and GIF files.
+
+    Only the bytes up to the dimensions are kept, besides the last bytes of the file, which are checked for the
+    trailer of the format.
+
+    Attributes:
+        format (Optional[str]): 'jpeg', 'png' or 'gif', None until it's detected.
+        width (Optional[int]): The width in pixels, None until it's parsed.
+        height (Optional[int]): The height in pixels, None until it's parsed.
+        error (Optional[str]): The reason why the header couldn't be parsed.
+    """
+
+    def __init__(self):
+        self.format = None
+        self.width = None
+        self.height = None
+        self.error = None
+        self._buffer = b''
+        self._skip = 0
+        self._tail = b''
+
+    @property
+    def done(self) -> bool:
+        """
+        Returns:
+            bool: True if the dimensions are parsed or the header is invalid.
+        """
+        return self.width is not None or self.error is not None
+
+    def feed(self, data: bytes):
+        """
+        Parses the next chunk of the file.
+        """
+        self._tail = (self._tail + data)[-len(PNG_TRAILER):]
+        if self.done:
+            return
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            data = data[skipped:]
+        self._buffer += data
+        if self.format is None:
+            self._detect_format()
+        if self.format == 'png':
+            self._parse_png()
+        elif self.format == 'gif':
+            self._parse_gif()
+        elif self.format == 'jpeg':
+            self._parse_jpeg()
+
+    def _detect_format(self):
+        if self._buffer.startswith(PNG_SIGNATURE):
+            self.format = 'png'
+        elif self._buffer[:6] in (b'GIF87a', b'GIF89a'):
+            self.format = 'gif'
+        elif self._buffer.startswith(b'\xff\xd8'):
+            self.format = 'jpeg'
+            self._buffer = self._buffer[2:]
+        elif len(self._buffer) >= len(PNG_SIGNATURE):
+            self.error = f'Unknown image format, the file starts with {self._buffer[:8]!r}'
+
+    def _parse_png(self):
+        # the IHDR chunk has to be the first one: length, type, width, height
+        if len(self._buffer) < 24:
+            return
+        if self._buffer[12:16] != b'IHDR':
+            self.error = 'The PNG file doesn\'t start with the IHDR chunk'
+            return
+        self.width, self.height = struct.unpack('>II', self._buffer[16:24])
+        self._buffer = b''
+
+    def _parse_gif(self):
+        if len(self._buffer) < 10:
+            return
+        self.width, self.height = struct.unpack('<HH', self._buffer[6:10])
+        self._buffer = b''
+
+    def _parse_jpeg(self):
+        # segments before the start of frame are skipped by their length without being buffered
+        while not self.done and not self._skip:
+            if len(self._buffer) < 2:
+                return
+            if self._buffer[0] != 0xFF:
+                self.error = f'Invalid JPEG marker {self._buffer[:2]!r}'
+                return
+            marker = self._buffer[1]
+            if marker == 0xFF:  # fill byte
+                self._buffer = self._buffer[1:]
+                continue
+            if marker in JPEG_STANDALONE_MARKERS:
+                self._buffer = self._buffer[2:]
+                continue
+            if marker == 0xDA:
+                self.error = 'The JPEG file has no start of frame before the image data'
+                return
+            if len(self._buffer) < 4:
+                return
+            length, = struct.unpack('>H', self._buffer[2:4])
+            if marker in JPEG_SOF_MARKERS:
+                if len(self._buffer) < 9:
+                    return
+                self.height, self.width = struct.unpack('>HH', self._buffer[5:9])
+                self._buffer = b''
+                return
+            segment_end = 2 + length
+            self._skip = max(segment_end - len(self._buffer), 0)
+            self._buffer = self._buffer[segment_end:]
+
+    def complete(self) -> bool:
+        """
+        Returns:
+            bool: True if the file ends with the trailer of its format, i.e. it isn't truncated.
+        """
+        if self.format == 'png':
+            return self._tail.endswith(PNG_TRAILER)
+        if self.format == 'gif':
+            return self._tail.endswith(b'\x3b')
+        if self.format == 'jpeg':
+            return self._tail.endswith(b'\xff\xd9')
+        return False
+
+
+class ImageVerification:
+    """
+    The result of the verification of an image.
+
+    Attributes:
+        image_id (str): The ID of the image.
+        url (str): The URL of the image file.
+        status (Optional[int]): The status code of the download, None if it failed.
+        format (Optional[str]): The detected format, 'jpeg', 'png' or 'gif'.
+        width (Optional[int]): The width in pixels read from the file.
+        height (Optional[int]): The height in pixels read from the file.
+        size (int): The size of the file in bytes.
+        sha256 (Optional[str]): The hash of the file.
+        elapsed (float): The time of the download in seconds.
+        errors (list[str]): The found problems, empty if the image is valid.
+    """
+
+    def __init__(self, image_id: str, url: str):
+        self.image_id = image_id
+        self.url = url
+        self.status = None
+        self.format = None
+        self.width = None
+        self.height = None
+        self.size = 0
+        self.sha256 = None
+        self.elapsed = 0.0
+        self.errors = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in ('image_id', 'url', 'status', 'format', 'width', 'height',
+                                                       'size', 'sha256', 'elapsed', 'errors')}
+
+
+class ImageVerifier:
+    """
+    Verifies that the images of API responses are served as valid files of the reported format and dimensions.
+
+    Attributes:
+        session (requests.Session): The session used for the downloads. It doesn't share the headers (e.g. the API
+                                    key) of the API clients, because the files are served by another host.
+        concurrency (int): The maximum number of downloads at once.
+        chunk_size (int): The size of the chunks the files are read in.
+        timeout (float): The connect and read timeout of a download in seconds.
+    """
+
+    def __init__(self, concurrency: int = 25, chunk_size: int = CHUNK_SIZE, timeout: float = 30):
+        """
+        Initializes an ImageVerifier instance with a connection pool of `concurrency` connections per host.
+
+        Args:
+            concurrency (int, optional): The maximum number of downloads at once.
+            chunk_size (int, optional): The size of the chunks the files are read in.
+            timeout (float, optional): The connect and read timeout of a download in seconds.
+
+        Raises:
+            ValueError: If `concurrency` is less than 1.
+        """
+        if concurrency < 1:
+            raise ValueError(f'Invalid concurrency {concurrency}, it has to be at least 1')
+
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def verify_image(self, image: dict, mime_types: Optional[list] = None) -> ImageVerification:
+        """
+        Downloads an image file in chunks and checks it against its description in an API response.
+
+        Args:
+            image (dict): The image from an API response, with `id`, `url` and optionally `width` and `height`.
+            mime_types (list, optional): The `mime_types` the image was searched with, e.g. ['jpg', 'png'].
+
+        Returns:
+            ImageVerification: The result of the verification.
+        """
+        result = ImageVerification(image.get('id'), image.get('url'))
+        parser = ImageHeaderParser()
+        digest = hashlib.sha256()
+        start = time.perf_counter()
+        try:
+            with self.session.get(result.url, stream=True, timeout=self.timeout) as resp:
+                result.status = resp.status_code
+                if resp.status_code != 200:
+                    result.errors.append(f'The file is served with status code {resp.status_code}')
+                    return result
+                for chunk in resp.iter_content(self.chunk_size):
+                    digest.update(chunk)
+                    parser.feed(chunk)
+                    result.size += len(chunk)
+        except requests.RequestException as e:
+            result.errors.append(f'The file couldn\'t be downloaded: {e}')
+            return result
+        finally:
+            result.elapsed = time.perf_counter() - start
+
+        result.sha256 = digest.hexdigest()
+        result.format, result.width, result.height = parser.format, parser.width, parser.height
+        if parser.error or parser.width is None:
+            result.errors.append(parser.error or 'The file is too short to contain the image dimensions')
+            return result
+        if not parser.complete():
+            result.errors.append(f'The {parser.format} file is truncated, it doesn\'t end with the trailer')
+
+        extension = result.url.rsplit('.', 1)[-1].lower()
+        if EXTENSION_FORMATS.get(extension, parser.format) != parser.format:
+            result.errors.append(f'The {parser.format} file has the .{extension} extension')
+        allowed = {MIME_TYPE_FORMATS[mime_type] for mime_type in mime_types or [] if mime_type in MIME_TYPE_FORMATS}
+        if allowed and parser.format not in allowed:
+            result.errors.append(f'The {parser.format} file doesn\'t match the mime types {mime_types}')
+        for dimension in ('width', 'height'):
+            reported, actual = image.get(dimension), getattr(parser, dimension)
+            if reported is not None and reported != actual:
+                result.errors.append(f'The {dimension} of the file is {actual}, but {reported} is reported')
+        return result
+
+    def verify(self, images: [dict], mime_types: Optional[list] = None) -> [ImageVerification]:
+        """
+        Verifies the files of several images concurrently.
+
+        Args:
+            images (list[dict]): The images from an API response.
+            mime_types (list, optional): The `mime_types` the images were searched with.
+
+        Returns:
+            list[ImageVerification]: The results in the order of the images.
+        """
+        with allure.step(f'Verify the files of {len(images)} images'):
+            logger.info('Verifying %s image files with concurrency %s', len(images), self.concurrency)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(min(self.concurrency, max(len(images), 1)),
+                                    thread_name_prefix='image-verifier') as executor:
+                results = list(executor.map(lambda image: self.verify_image(image, mime_types), images))
+            logger.info('Verified %s image files in %.2fs', len(images), time.perf_counter() - start)
+            allure.attach(json.dumps([result.to_dict() for result in results], indent=2), 'Image files',
+                          allure.attachment_type.JSON)
+        return results
+
+    def close(self):
+        """
+        Closes the session and all its pooled connections.
+        """
+        self.session.close()
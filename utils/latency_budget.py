@@ -0,0 +1,207 @@
+"""
+This file contains the latency budgets checked by the `latency_budget` pytest marker.
+
+A budget limits percentiles of the latency of the API calls made inside a scope (a test or a test class).
+The latency of a call is its network time: connecting, sending and receiving the response of the last attempt.
+So the backoff before retries of '429 Too Many Requests', rate limiting and the time spent in the framework don't
+count against the budget, while responses served from the response cache or replayed from a cassette aren't
+counted at all. The first `warmup` calls of every endpoint in a scope are ignored as well, because they usually
+pay for opening the connection.
+"""
+import math
+import threading
+from typing import Optional
+
+from utils.timing import TimingRecord
+
+MODES = ('fail', 'warn', 'off')
+# the number of the slowest calls listed when a budget is exceeded
+SLOWEST_CALLS = 5
+
+
+class LatencyBudgetWarning(UserWarning):
+    """
+    Warning about an exceeded latency budget, issued instead of a failure in the 'warn' mode.
+    """
+
+
+class LatencyBudget:
+    """
+    The latency limits of a scope.
+
+    Attributes:
+        limits (dict[str, float]): The limits in milliseconds by statistic ('p50', 'p95', 'p99' or 'max').
+        warmup (int): The number of the first calls of every endpoint which aren't counted.
+        mode (Optional[str]): 'fail', 'warn' or 'off', None to use the mode of the run.
+    """
+
+    def __init__(self, p50_ms: float = None, p95_ms: float = None, p99_ms: float = None, max_ms: float = None,
+                 warmup: int = 1, mode: str = None):
+        """
+        Initializes a LatencyBudget instance.
+
+        Args:
+            p50_ms (float, optional): The limit of the median latency.
+            p95_ms (float, optional): The limit of the 95th percentile of the latency.
+            p99_ms (float, optional): The limit of the 99th percentile of the latency.
+            max_ms (float, optional): The limit of the latency of every call.
+            warmup (int, optional): The number of the first calls of every endpoint which aren't counted.
+            mode (str, optional): 'fail', 'warn' or 'off', by default the mode of the run.
+
+        Raises:
+            ValueError: If no limit is set, the warmup is negative or the mode is unknown.
+        """
+        self.limits = {name: limit for name, limit in
+                       (('p50', p50_ms), ('p95', p95_ms), ('p99', p99_ms), ('max', max_ms)) if limit is not None}
+        if not self.limits:
+            raise ValueError('A latency budget needs at least one of p50_ms, p95_ms, p99_ms or max_ms')
+        if warmup < 0:
+            raise ValueError(f'Invalid warmup {warmup}, it has to be at least 0')
+        if mode is not None and mode not in MODES:
+            raise ValueError(f'Invalid mode {mode}, it has to be one of {MODES}')
+
+        self.warmup = warmup
+        self.mode = mode
+
+
+def _percentile(latencies: [float], percentile: float) -> float:
+    """
+    Returns:
+        float: The nearest-rank percentile of sorted latencies.
+    """
+    return latencies[max(math.ceil(percentile / 100 * len(latencies)), 1) - 1]
+
+
+class BudgetScope:
+    """
+    The API calls made inside a scope with a latency budget.
+
+    Attributes:
+        name (str): The node ID of the scope.
+        budget (LatencyBudget): The budget of the scope.
+        calls (list[tuple]): The counted calls as (latency in milliseconds, endpoint, status, test node ID).
+        warmup_calls (int): The number of ignored warm-up calls.
+        retried_calls (int): The number of counted calls which were retried.
+    """
+
+    def __init__(self, name: str, budget: LatencyBudget):
+        self.name = name
+        self.budget = budget
+        self.calls = []
+        self.warmup_calls = 0
+        self.retried_calls = 0
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: TimingRecord, test: Optional[str]):
+        """
+        Counts a call unless it didn't reach the API or it's a warm-up call.
+        """
+        if record.source != 'network' or record.ttfb is None:
+            return
+        with self._lock:
+            seen = self._seen.get(record.key, 0)
+            self._seen[record.key] = seen + 1
+            if seen < self.budget.warmup:
+                self.warmup_calls += 1
+                return
+            latency = sum(getattr(record, phase) or 0.0 for phase in ('connect', 'tls', 'ttfb', 'download'))
+            self.calls.append((latency * 1000, record.key, record.status, test))
+            if record.attempts > 1:
+                self.retried_calls += 1
+
+    def statistics(self) -> dict:
+        """
+        Returns:
+            dict: The budgeted statistics of the counted calls in milliseconds, empty if there are none.
+        """
+        latencies = sorted(call[0] for call in self.calls)
+        if not latencies:
+            return {}
+        return {name: latencies[-1] if name == 'max' else _percentile(latencies, float(name[1:]))
+                for name in self.budget.limits}
+
+    def violations(self) -> [str]:
+        """
+        Returns:
+            list[str]: The exceeded limits, e.g. 'p95 412.3 ms > 300 ms'.
+        """
+        statistics = self.statistics()
+        return [f'{name} {statistics[name]:.1f} ms > {limit:g} ms' for name, limit in self.budget.limits.items()
+                if name in statistics and statistics[name] > limit]
+
+    def slowest(self, number: int = SLOWEST_CALLS) -> [tuple]:
+        """
+        Returns:
+            list[tuple]: The slowest counted calls as (latency in milliseconds, endpoint, status, test node ID).
+        """
+        return sorted(self.calls, key=lambda call: call[0], reverse=True)[:number]
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: A description of the result of the scope with the slowest calls.
+        """
+        lines = [f'Latency budget of {self.name}: {len(self.calls)} calls counted '
+                 f'({self.warmup_calls} warm-up calls ignored, {self.retried_calls} retried)']
+        statistics = self.statistics()
+        lines += [f'  {name}: {statistics[name]:.1f} ms (budget {limit:g} ms)'
+                  for name, limit in self.budget.limits.items() if name in statistics]
+        lines.append('Slowest calls:')
+        lines += [f'  {latency:.1f} ms {endpoint} -> {status} in {test}' for latency, endpoint, status, test
+                  in self.slowest()]
+        return '\n'.join(lines)
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A JSON serializable representation of the result of the scope.
+        """
+        return {
+            'scope': self.name,
+            'limits_ms': self.budget.limits,
+            'statistics_ms': self.statistics(),
+            'violations': self.violations(),
+            'calls': len(self.calls),
+            'warmup_calls': self.warmup_calls,
+            'retried_calls': self.retried_calls,
+            'slowest_calls': [dict(zip(('latency_ms', 'endpoint', 'status', 'test'), call)) for call in self.slowest()],
+        }
+
+
+class LatencyBudgetRecorder:
+    """
+    A timing hook which passes the records of the API calls to all active budget scopes.
+
+    Attributes:
+        current_test (Optional[str]): The node ID of the running test, the calls are attributed to it.
+    """
+
+    def __init__(self):
+        self.current_test = None
+        self._scopes = []
+
+    def __call__(self, record: TimingRecord):
+        for scope in list(self._scopes):
+            scope.add(record, self.current_test)
+
+    def start(self, name: str, budget: LatencyBudget) -> BudgetScope:
+        """
+        Starts counting the calls of a scope.
+
+        Args:
+            name (str): The node ID of the scope.
+            budget (LatencyBudget): The budget of the scope.
+
+        Returns:
+            BudgetScope: The scope.
+        """
+        scope = BudgetScope(name, budget)
+        self._scopes.append(scope)
+        return scope
+
+    def stop(self, scope: BudgetScope):
+        """
+        Stops counting the calls of a scope.
+        """
+        self._scopes.remove(scope)
@@ -0,0 +1,287 @@
+"""
+This file contains a load generator which drives TheCatAPI with the same client methods as the functional tests.
+
+A weighted mix of operations runs for a set duration either in a closed loop (every worker sends the next request
+as soon as the previous one is done) or at a target rate (requests are scheduled at fixed intervals and their
+latency is measured from the scheduled time, so a slow API doesn't hide the queueing delay it causes).
+The latency of every operation is recorded in a mergeable `LatencyHistogram`, so the reports of several runs or
+processes can be combined before the percentiles are computed.
+
+Usage:
+    pytest tests/test_load.py --stub --load-duration=10 --load-rps=50
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, Union
+
+import allure
+
+from utils.histogram import LatencyHistogram
+from utils.log import create_logger
+
+if TYPE_CHECKING:
+    import requests
+
+logger = create_logger('load')
+
+PERCENTILES = (50, 95, 99)
+
+
+class Operation:
+    """
+    A named call of the load mix.
+
+    Attributes:
+        name (str): The name the statistics of the operation are reported under, e.g. 'GET /images/search'.
+        call (Callable): Sends the request with the given client and returns the response.
+        weight (float): The relative frequency of the operation in the mix.
+    """
+
+    def __init__(self, name: str, call: Callable[..., 'requests.Response'], weight: float = 1):
+        """
+        Initializes an Operation instance.
+
+        Args:
+            name (str): The name the statistics of the operation are reported under.
+            call (Callable): Sends the request with the given client and returns the response.
+            weight (float, optional): The relative frequency of the operation in the mix.
+
+        Raises:
+            ValueError: If the weight isn't positive.
+        """
+        if weight <= 0:
+            raise ValueError(f'Invalid weight {weight} of {name}, it has to be positive')
+
+        self.name = name
+        self.call = call
+        self.weight = weight
+
+
+class OperationStats:
+    """
+    The statistics of a single operation.
+
+    Attributes:
+        latency (LatencyHistogram): The latencies of all completed calls, including the failed ones.
+        errors (Counter): The number of failed calls by the status code or the exception name.
+    """
+
+    def __init__(self, latency: LatencyHistogram = None, errors: Counter = None):
+        self.latency = latency or LatencyHistogram()
+        self.errors = errors or Counter()
+
+    @property
+    def requests(self) -> int:
+        return self.latency.count
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors.values()) / self.requests if self.requests else 0.0
+
+    def merge(self, other: 'OperationStats') -> 'OperationStats':
+        self.latency.merge(other.latency)
+        self.errors.update(other.errors)
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'errors': sum(self.errors.values()),
+            'error_rate': self.error_rate,
+            'error_kinds': dict(self.errors),
+            'latency': self.latency.summary(PERCENTILES),
+            'histogram': self.latency.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'OperationStats':
+        return cls(LatencyHistogram.from_dict(data['histogram']), Counter(data['error_kinds']))
+
+
+class LoadReport:
+    """
+    The results of a load run per operation.
+
+    Attributes:
+        duration (float): The wall time of the run in seconds.
+        target_rps (Optional[float]): The target rate of the run, None for a closed loop.
+        concurrency (int): The number of workers.
+        operations (dict[str, OperationStats]): The statistics by operation name.
+    """
+
+    def __init__(self, duration: float = 0.0, target_rps: Optional[float] = None, concurrency: int = 0,
+                 operations: dict = None):
+        self.duration = duration
+        self.target_rps = target_rps
+        self.concurrency = concurrency
+        self.operations = operations or {}
+
+    def total(self) -> OperationStats:
+        """
+        Returns:
+            OperationStats: The statistics of all operations together.
+        """
+        total = OperationStats()
+        for stats in self.operations.values():
+            total.merge(stats)
+        return total
+
+    def merge(self, other: 'LoadReport') -> 'LoadReport':
+        """
+        Adds the results of a run which happened at the same time, e.g. in another process.
+
+        Args:
+            other (LoadReport): The report to add.
+
+        Returns:
+            LoadReport: This report.
+        """
+        self.duration = max(self.duration, other.duration)
+        self.target_rps = None if self.target_rps is None or other.target_rps is None \
+            else self.target_rps + other.target_rps
+        self.concurrency += other.concurrency
+        for name, stats in other.operations.items():
+            self.operations.setdefault(name, OperationStats()).merge(stats)
+        return self
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A JSON serializable representation with the percentiles and the raw histograms.
+        """
+        total = self.total()
+        return {
+            'duration_s': self.duration,
+            'target_rps': self.target_rps,
+            'concurrency': self.concurrency,
+            'throughput_rps': total.requests / self.duration if self.duration else 0.0,
+            'total': total.to_dict(),
+            'operations': {name: stats.to_dict() for name, stats in sorted(self.operations.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LoadReport':
+        """
+        Loads a report from the representation returned by `to_dict`.
+        """
+        operations = {name: OperationStats.from_dict(stats) for name, stats in data['operations'].items()}
+        return cls(data['duration_s'], data['target_rps'], data['concurrency'], operations)
+
+    def write_json(self, path: Union[Path, str]):
+        """
+        Writes the report to a JSON file, the parent directories are created if needed.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+
+    def attach(self, name: str = 'Load report'):
+        """
+        Attaches the report to the current Allure test.
+        """
+        allure.attach(json.dumps(self.to_dict(), indent=2), name, allure.attachment_type.JSON)
+
+    def format(self) -> str:
+        """
+        Returns:
+            str: A table of the request count, error rate and latency percentiles of every operation.
+        """
+        columns = ''.join(f'{f"p{p}":>10}' for p in PERCENTILES)
+        lines = [f'{"operation":<32}{"requests":>10}{"errors":>10}{columns}']
+        for name, stats in [*sorted(self.operations.items()), ('total', self.total())]:
+            values = ''.join(f'{stats.latency.percentile(p) or 0:>8.1f}ms' for p in PERCENTILES)
+            lines.append(f'{name:<32}{stats.requests:>10}{stats.error_rate:>10.2%}{values}')
+        return '\n'.join(lines)
+
+
+def run_load(client, operations: [Operation], duration: float, rps: Optional[float] = None,
+             concurrency: int = 10, seed: int = 0) -> LoadReport:
+    """
+    Runs a weighted mix of operations against the API for the given duration.
+
+    A call fails if it raises an exception or returns an error status code.
+
+    Args:
+        client: The client passed to the calls of the operations, e.g. `TheCatAPIClient`.
+        operations (list[Operation]): The operations of the mix.
+        duration (float): The duration of the run in seconds.
+        rps (float, optional): The target rate of requests per second of all workers together, by default
+                               the workers send requests in a closed loop.
+        concurrency (int, optional): The number of workers, i.e. the maximum number of requests in flight.
+        seed (int, optional): The seed of the operation choice.
+
+    Returns:
+        LoadReport: The statistics of the run.
+
+    Raises:
+        ValueError: If there are no operations or the duration, rate or concurrency isn't positive.
+    """
+    if not operations:
+        raise ValueError('The load mix has no operations')
+    if duration <= 0:
+        raise ValueError(f'Invalid duration {duration}, it has to be positive')
+    if rps is not None and rps <= 0:
+        raise ValueError(f'Invalid rps {rps}, it has to be positive')
+    if concurrency < 1:
+        raise ValueError(f'Invalid concurrency {concurrency}, it has to be at least 1')
+
+    rng = random.Random(seed)
+    weights = [operation.weight for operation in operations]
+    lock = threading.Lock()
+    scheduled = 0
+    start = time.monotonic()
+    end = start + duration
+
+    def next_call() -> tuple:
+        """
+        Returns:
+            tuple: The next operation and the time it's scheduled at, (None, None) when the run is over.
+        """
+        nonlocal scheduled
+        with lock:
+            at = start + scheduled / rps if rps else time.monotonic()
+            if at >= end:
+                return None, None
+            scheduled += 1
+            return rng.choices(operations, weights)[0], at
+
+    def worker(stats: dict):
+        while True:
+            operation, at = next_call()
+            if operation is None:
+                return
+            delay = at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            error = None
+            try:
+                resp = operation.call(client)
+                if not resp.ok:
+                    error = str(resp.status_code)
+            except Exception as e:
+                error = type(e).__name__
+            operation_stats = stats.setdefault(operation.name, OperationStats())
+            operation_stats.latency.record(time.monotonic() - at)
+            if error:
+                operation_stats.errors[error] += 1
+
+    logger.info('Running %s operations for %ss with concurrency %s%s', len(operations), duration, concurrency,
+                f' at {rps} rps' if rps else '')
+    # every worker keeps its own statistics, they are merged once the run is over
+    worker_stats = [{} for _ in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(stats,), name=f'load-{i}', daemon=True)
+               for i, stats in enumerate(worker_stats)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = LoadReport(time.monotonic() - start, rps, concurrency)
+    for stats in worker_stats:
+        for name, operation_stats in stats.items():
+            report.operations.setdefault(name, OperationStats()).merge(operation_stats)
+    return report
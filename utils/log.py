@@ -1,20 +1,175 @@
 """
 This file contains utility functions for logging.
+
+The level of every logger is configured by `LOG_LEVEL` and can be overridden per logger by `LOG_LEVELS`
+(e.g. `api=WARNING,stub-server=ERROR`). With `start_queue_logging` the records of the loggers created by
+`create_logger` are put on a queue as they are and formatted and written by a background listener thread, so
+logging costs the caller little more than creating the record. Log calls should pass their values as arguments
+(`logger.info('Status %s', status)`) instead of formatting the message themselves, and the values mustn't be
+modified after the call.
 """
+import json
 import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+from typing import Optional
+
+from utils.capture import truncate
+from utils.config import LOG_LEVEL, LOG_LEVELS
+
+# the attributes of every log record, the others are the `extra` fields of a log call
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+# the loggers created by `create_logger`, by name
+_loggers = {}
+_queue_handler = None
+_listener = None
+
+
+def parse_levels(levels: str) -> dict:
+    """
+    Parses the per-logger levels, e.g. 'api=WARNING,stub-server=ERROR'.
+
+    Args:
+        levels (str): Comma separated `name=level` pairs.
+
+    Returns:
+        dict: The levels by logger name.
+
+    Raises:
+        ValueError: If a pair isn't `name=level` or the level is unknown.
+    """
+    parsed = {}
+    for pair in filter(None, (pair.strip() for pair in levels.split(','))):
+        name, separator, level = pair.partition('=')
+        level = level.strip().upper()
+        if not separator or not name.strip() or not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f'Invalid logger level {pair!r}, it has to be name=level, e.g. api=WARNING')
+        parsed[name.strip()] = level
+    return parsed
+
+
+LOGGER_LEVELS = parse_levels(LOG_LEVELS)
 
 
-def create_logger(name: str, level: logging = logging.DEBUG) -> logging.Logger:
+def create_logger(name: str, level: logging = None) -> logging.Logger:
     """
     Create a new logger for a file to use.
 
     Args:
         name (str): Name for the logger.
-        level (logging._Level): Minimum logging level.
+        level (logging._Level, optional): Minimum logging level, by default the one configured for the logger
+                                          in `LOG_LEVELS` or `LOG_LEVEL`.
 
     Returns:
         logging.Logger: The logger.
     """
     logger = logging.getLogger(name)
-    logger.setLevel(level)
+    logger.setLevel(level if level is not None else LOGGER_LEVELS.get(name, LOG_LEVEL.upper()))
+    _loggers[name] = logger
+    if _queue_handler is not None:
+        _route_to_queue(logger)
     return logger
+
+
+class BodyPreview:
+    """
+    A body in a log message, truncated only when the message is formatted.
+    """
+    __slots__ = ('_response', '_max_size')
+
+    def __init__(self, response, max_size: Optional[int]):
+        """
+        Args:
+            response: The response with the body as `text`.
+            max_size (int, optional): The maximum number of logged characters, None disables truncation.
+        """
+        self._response = response
+        self._max_size = max_size
+
+    def __str__(self):
+        return truncate(self._response.text, self._max_size)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a log record as a JSON object with its `extra` fields, one per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        entry.update((name, value) for name, value in vars(record).items() if name not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues the records as they are, so their messages are formatted by the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Overrides on purpose the preparation of `QueueHandler`, which formats the message in the calling thread and
+        drops the arguments and the exception, so that the record can be pickled. The queue never leaves
+        the process, so the record is enqueued as it is and formatted by the listener.
+        """
+        return record
+
+
+def _route_to_queue(logger: logging.Logger):
+    logger.addHandler(_queue_handler)
+    # the records are written by the listener only, not by the handlers of the root logger (e.g. pytest's capture)
+    logger.propagate = False
+
+
+def start_queue_logging(*handlers: logging.Handler) -> logging.handlers.QueueListener:
+    """
+    Routes the records of all loggers created by `create_logger` through a queue to a background thread,
+    which passes them to the handlers.
+
+    Args:
+        *handlers (logging.Handler): The handlers the records are written by, e.g. a file handler with
+                                     a `JsonFormatter`.
+
+    Returns:
+        logging.handlers.QueueListener: The started listener.
+
+    Raises:
+        RuntimeError: If queue logging is already started.
+    """
+    global _queue_handler, _listener
+    if _listener is not None:
+        raise RuntimeError('Queue logging is already started')
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    for logger in _loggers.values():
+        _route_to_queue(logger)
+    return _listener
+
+
+def stop_queue_logging():
+    """
+    Writes the queued records, stops the listener thread and restores the propagation of the loggers.
+    """
+    global _queue_handler, _listener
+    if _listener is None:
+        return
+    for logger in _loggers.values():
+        logger.removeHandler(_queue_handler)
+        logger.propagate = True
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _queue_handler = _listener = None
@@ -0,0 +1,109 @@
+"""
+This file contains a token bucket rate limiter whose state is shared through a file, so that all processes
+(e.g. pytest-xdist workers) sending requests to the same API stay within one request budget together.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Union
+
+from utils.log import create_logger
+
+logger = create_logger('rate-limiter')
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class FileTokenBucket:
+    """
+    A token bucket shared by all processes which use the same state file.
+
+    The bucket holds up to `burst` tokens and is refilled with `rate` tokens per second, every request takes
+    one token. The state file is locked for the short time of taking a token, waiting for a token happens
+    outside the lock.
+
+    Attributes:
+        path (Path): The state file of the bucket.
+        rate (float): The number of requests per second allowed for all processes together.
+        burst (int): The maximum number of requests which can be sent at once.
+    """
+
+    def __init__(self, path: Union[Path, str], rate: float, burst: int = 1):
+        """
+        Initializes a FileTokenBucket instance, the state file is created if it doesn't exist.
+
+        Args:
+            path (Union[Path, str]): The state file of the bucket.
+            rate (float): The number of requests per second allowed for all processes together.
+            burst (int, optional): The maximum number of requests which can be sent at once.
+
+        Raises:
+            ValueError: If the rate isn't positive or the burst is less than 1.
+        """
+        if rate <= 0:
+            raise ValueError(f'Invalid rate {rate}, it has to be positive')
+        if burst < 1:
+            raise ValueError(f'Invalid burst {burst}, it has to be at least 1')
+
+        self.path = Path(path)
+        self.rate = rate
+        self.burst = burst
+        self.waited = 0.0
+        self._thread_lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+
+    def _try_acquire(self) -> float:
+        """
+        Takes a token if there is one.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the time in seconds until the next token is available.
+        """
+        with self._thread_lock, open(self.path, 'r+') as f:
+            _lock(f)
+            try:
+                content = f.read()
+                now = time.time()
+                state = json.loads(content) if content else {'tokens': self.burst, 'updated': now}
+                tokens = min(self.burst, state['tokens'] + (now - state['updated']) * self.rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                if not wait:
+                    tokens -= 1
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({'tokens': tokens, 'updated': now}))
+                f.flush()
+            finally:
+                _unlock(f)
+        return wait
+
+    def acquire(self):
+        """
+        Blocks until a token is taken from the bucket.
+        """
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            self.waited += wait
+            time.sleep(wait)
@@ -0,0 +1,215 @@
+"""
+This file contains an opt-in response cache for the safe (idempotent) requests of API clients.
+
+Responses are cached by the full request (method, URL, query parameters, headers and body) with LRU eviction and
+per-endpoint TTLs. Expired responses with an ETag can be revalidated with `If-None-Match` instead of being
+downloaded again. Endpoints which return random results, like `/images/search` without an explicit order,
+are never cached by default. Requests sent with extra arguments of `requests` (e.g. `stream`, `timeout` or
+`allow_redirects`) bypass the cache, their responses may differ from the cached ones.
+"""
+import fnmatch
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+SAFE_METHODS = ('get', 'head', 'options')
+
+
+def random_image_search(endpoint: str, params: dict) -> bool:
+    """
+    Checks whether a request is an image search with random results (the default order).
+
+    Args:
+        endpoint (str): The API endpoint.
+        params (dict): The query parameters.
+
+    Returns:
+        bool: True if the results of the request are random.
+    """
+    return endpoint == '/images/search' and str((params or {}).get('order', 'RANDOM')).upper() == 'RANDOM'
+
+
+class _Entry:
+    __slots__ = ('response', 'expires_at', 'etag')
+
+    def __init__(self, response: 'requests.Response', expires_at: float, etag: Optional[str]):
+        self.response = response
+        self.expires_at = expires_at
+        self.etag = etag
+
+
+class ResponseCache:
+    """
+    An LRU cache of responses with per-endpoint TTLs and optional ETag revalidation.
+
+    Cached responses are shared between the callers, so they must not be modified.
+
+    Attributes:
+        maxsize (int): The maximum number of cached responses.
+        ttl (float): The default time to live of a cached response in seconds.
+        endpoint_ttls (dict): TTLs for endpoint patterns (`fnmatch` style, e.g. '/images/*'), 0 disables caching.
+        revalidate (bool): If True, expired responses with an ETag are revalidated with `If-None-Match`.
+        exclude (list[Callable]): Rules (endpoint, params) -> bool, the matched requests are never cached.
+        hits (int): The number of responses served from the cache.
+        misses (int): The number of cacheable requests which were sent to the API.
+        revalidations (int): The number of expired responses confirmed by the API as not modified.
+        evictions (int): The number of responses evicted because the cache was full.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300, endpoint_ttls: dict = None, revalidate: bool = False,
+                 exclude: [Callable[[str, dict], bool]] = (random_image_search,)):
+        """
+        Initializes a ResponseCache instance.
+
+        Args:
+            maxsize (int, optional): The maximum number of cached responses.
+            ttl (float, optional): The default time to live of a cached response in seconds.
+            endpoint_ttls (dict, optional): TTLs for endpoint patterns, e.g. {'/images/*': 600}.
+            revalidate (bool, optional): If True, expired responses with an ETag are revalidated.
+            exclude (list[Callable], optional): Rules (endpoint, params) -> bool, the matched requests are never
+                                                cached. By default, image searches with random results.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.endpoint_ttls = endpoint_ttls or {}
+        self.revalidate = revalidate
+        self.exclude = list(exclude)
+        self.hits = self.misses = self.revalidations = self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, endpoint: str) -> float:
+        """
+        Returns:
+            float: The time to live of the responses of an endpoint, the first matching pattern wins.
+        """
+        for pattern, ttl in self.endpoint_ttls.items():
+            if fnmatch.fnmatchcase(endpoint, pattern):
+                return ttl
+        return self.ttl
+
+    def is_cacheable(self, method: str, endpoint: str, params: dict = None) -> bool:
+        """
+        Checks whether the response of a request can be cached.
+
+        Args:
+            method (str): The HTTP method.
+            endpoint (str): The API endpoint.
+            params (dict, optional): The query parameters.
+
+        Returns:
+            bool: True if the method is safe, the endpoint has a TTL and no exclusion rule matches.
+        """
+        return (method.lower() in SAFE_METHODS and self.ttl_for(endpoint) > 0
+                and not any(rule(endpoint, params) for rule in self.exclude))
+
+    @staticmethod
+    def key(method: str, url: str, params: dict = None, headers: dict = None, body=None) -> str:
+        """
+        Builds the cache key of a request.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The full URL.
+            params (dict, optional): The query parameters.
+            headers (dict, optional): All headers of the request, including the session ones.
+            body (optional): The JSON body.
+
+        Returns:
+            str: The key.
+        """
+        key = {
+            'method': method.lower(),
+            'url': url,
+            'params': sorted((str(name), str(value)) for name, value in (params or {}).items()),
+            'headers': sorted((name.lower(), str(value)) for name, value in (headers or {}).items()),
+            'body': body,
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+    def lookup(self, key: str) -> tuple:
+        """
+        Looks a request up in the cache.
+
+        Args:
+            key (str): The key of the request.
+
+        Returns:
+            tuple: The cached response, or None if it's missing or expired, and the ETag to revalidate
+                   the expired response with, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.response, None
+            self.misses += 1
+            if self.revalidate and entry.etag:
+                return None, entry.etag
+            del self._entries[key]
+            return None, None
+
+    def store(self, key: str, endpoint: str, resp: 'requests.Response') -> Optional['requests.Response']:
+        """
+        Caches a successful response or, for '304 Not Modified', refreshes the revalidated one.
+
+        Args:
+            key (str): The key of the request.
+            endpoint (str): The API endpoint.
+            resp (requests.Response): The response of the API.
+
+        Returns:
+            Optional[requests.Response]: The response to return to the caller, the cached one for '304 Not Modified'.
+                                         None for '304 Not Modified' if the revalidated response was evicted in
+                                         the meantime, the request has to be sent again without `If-None-Match`.
+        """
+        expires_at = time.monotonic() + self.ttl_for(endpoint)
+        with self._lock:
+            if resp.status_code == 304 and key in self._entries:
+                entry = self._entries[key]
+                entry.expires_at = expires_at
+                self._entries.move_to_end(key)
+                self.revalidations += 1
+                return entry.response
+            if resp.status_code == 304:
+                return None
+            if resp.status_code != 200:
+                return resp
+
+            self._entries[key] = _Entry(resp, expires_at, resp.headers.get('ETag'))
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return resp
+
+    def clear(self):
+        """
+        Removes all cached responses.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions,
+            }
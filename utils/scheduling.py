@@ -0,0 +1,333 @@
+"""
+This file contains the history of the test durations and its use for scheduling and selecting the tests.
+
+After every run the duration (setup, call and teardown together), the number of API requests and the endpoints
+called by every test are saved to a small SQLite database. The durations are smoothed over the runs, so a single
+slow run doesn't reshuffle the suite, and tests which haven't run for `STALE_AFTER` seconds are dropped. The history
+is used to:
+
+* order the tests longest first (`longest_first`) and distribute them across pytest-xdist workers by their expected
+  duration (`utils.xdist_scheduling.DurationScheduling`), so no worker is left with a slow test at the end of a run,
+* select the tests affected by a change of a client method or a Swagger path (`affected_tests`).
+
+`DurationSchedulingPlugin` saves the history and applies it to the runs of pytest.
+"""
+import ast
+import importlib.util
+import sqlite3
+import statistics
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, Mapping, Union
+
+import pytest
+
+from utils.timing_plugin import RequestTimingsPlugin
+
+# the weight of the last run in the expected duration of a test
+SMOOTHING = 0.5
+# tests which haven't run for 30 days are removed from the history, e.g. renamed or deleted ones
+STALE_AFTER = 30 * 24 * 3600
+# the modules of the clients whose methods can be passed to `affected_tests`
+CLIENT_MODULES = ('interfaces.the_cat_api_client',)
+HTTP_METHODS = ('get', 'post', 'put', 'delete')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS durations (
+    nodeid TEXT PRIMARY KEY,
+    duration REAL NOT NULL,
+    requests INTEGER NOT NULL,
+    endpoints TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID
+'''
+_UPSERT = '''
+INSERT INTO durations (nodeid, duration, requests, endpoints, runs, updated) VALUES (?, ?, ?, ?, 1, ?)
+ON CONFLICT (nodeid) DO UPDATE SET
+    duration = duration + ? * (excluded.duration - duration),
+    requests = excluded.requests,
+    endpoints = excluded.endpoints,
+    runs = runs + 1,
+    updated = excluded.updated
+'''
+
+
+class TestDuration:
+    """
+    The duration of a test in a run or, loaded from the history, its expected duration.
+
+    Attributes:
+        nodeid (str): The pytest node ID of the test.
+        duration (float): The duration of the setup, call and teardown of the test in seconds.
+        requests (int): The number of API requests sent by the test and its fixtures.
+        endpoints (frozenset[str]): The endpoints called by the test, e.g. 'GET /images/{image_id}'.
+        runs (int): The number of runs the expected duration is based on.
+    """
+    __slots__ = ('nodeid', 'duration', 'requests', 'endpoints', 'runs')
+    # not a test class, even though its name starts with 'Test'
+    __test__ = False
+
+    def __init__(self, nodeid: str, duration: float = 0.0, requests: int = 0, endpoints: Iterable[str] = (),
+                 runs: int = 1):
+        self.nodeid = nodeid
+        self.duration = duration
+        self.requests = requests
+        self.endpoints = frozenset(endpoints)
+        self.runs = runs
+
+    def __repr__(self):
+        return f'{self.nodeid}: {self.duration:.3f}s, {self.requests} requests'
+
+
+class DurationStore:
+    """
+    The history of the test durations, kept in an SQLite database.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        """
+        Args:
+            path (Path | str): The database file, it's created with the first `save`.
+        """
+        self.path = Path(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # pytest-xdist workers read the history at the same time
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute(_SCHEMA)
+        return connection
+
+    def load(self) -> dict:
+        """
+        Returns:
+            dict[str, TestDuration]: The expected durations of the tests by node ID, empty if there is no history.
+        """
+        if not self.path.exists():
+            return {}
+        with closing(self._connect()) as connection:
+            rows = connection.execute('SELECT nodeid, duration, requests, endpoints, runs FROM durations')
+            return {nodeid: TestDuration(nodeid, duration, requests, filter(None, endpoints.split('\n')), runs)
+                    for nodeid, duration, requests, endpoints, runs in rows}
+
+    def save(self, durations: Iterable[TestDuration], smoothing: float = SMOOTHING):
+        """
+        Adds the durations of a run to the history and removes the stale tests.
+
+        Args:
+            durations (Iterable[TestDuration]): The durations of the tests of the run.
+            smoothing (float, optional): The weight of the run in the expected durations, 1 keeps only the last run.
+        """
+        now = time.time()
+        rows = [(test.nodeid, test.duration, test.requests, '\n'.join(sorted(test.endpoints)), now, smoothing)
+                for test in durations]
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(_UPSERT, rows)
+            connection.execute('DELETE FROM durations WHERE updated < ?', (now - STALE_AFTER,))
+
+
+def expected_durations(nodeids: Iterable[str], history: Mapping[str, TestDuration]) -> dict:
+    """
+    Args:
+        nodeids (Iterable[str]): The node IDs of the tests.
+        history (Mapping[str, TestDuration]): The history loaded by `DurationStore.load`.
+
+    Returns:
+        dict[str, float]: The expected durations of the tests in seconds. Tests without history are expected to take
+                          the median duration of the known ones.
+    """
+    nodeids = list(nodeids)
+    known = [history[nodeid].duration for nodeid in nodeids if nodeid in history]
+    default = statistics.median(known) if known else 0.0
+    return {nodeid: history[nodeid].duration if nodeid in history else default for nodeid in nodeids}
+
+
+def longest_first(nodeids: Iterable[str], expected: Mapping[str, float]) -> [str]:
+    """
+    Orders the tests longest first, keeping the tests of a class (or of a module) together, so the fixtures
+    of the class are set up only once: the groups are ordered by their expected duration and the tests
+    of a group by theirs. Tests with the same expected duration keep their order.
+
+    Args:
+        nodeids (Iterable[str]): The node IDs of the tests in the collection order.
+        expected (Mapping[str, float]): The expected durations by node ID, see `expected_durations`.
+
+    Returns:
+        list[str]: The node IDs in the new order.
+    """
+    groups = {}
+    for nodeid in nodeids:
+        groups.setdefault(nodeid.partition('[')[0].rpartition('::')[0], []).append(nodeid)
+    ordered = sorted(groups.values(), key=lambda group: -sum(expected[nodeid] for nodeid in group))
+    return [nodeid for group in ordered for nodeid in sorted(group, key=lambda nodeid: -expected[nodeid])]
+
+
+def _path_template(node: ast.expr) -> str:
+    """
+    Returns:
+        str: The value of a string literal or the template of an f-string, e.g. '/images/{image_id}'.
+    """
+    if isinstance(node, ast.Constant):
+        return node.value
+    return ''.join(value.value if isinstance(value, ast.Constant) else f'{{{ast.unparse(value.value)}}}'
+                   for value in node.values)
+
+
+def client_method_paths(modules: Iterable[str] = CLIENT_MODULES) -> dict:
+    """
+    Finds the endpoint paths requested by the methods of the clients. The sources are parsed, not imported,
+    so the HTTP stack isn't loaded. A method requests the paths of the string literals starting with '/' in its
+    body and the paths of the methods of the class it calls.
+
+    Args:
+        modules (Iterable[str], optional): The modules of the clients.
+
+    Returns:
+        dict[str, set[str]]: The paths by method name, e.g. {'images_get': {'/images/{image_id}'}}.
+    """
+    paths, calls = {}, {}
+    for module in modules:
+        tree = ast.parse(Path(importlib.util.find_spec(module).origin).read_text())
+        for cls in (node for node in tree.body if isinstance(node, ast.ClassDef)):
+            for method in (node for node in cls.body if isinstance(node, ast.FunctionDef)):
+                method_paths = paths.setdefault(method.name, set())
+                method_calls = calls.setdefault(method.name, set())
+                # the literal parts of the f-strings are matched as a whole f-string
+                parts = {id(part) for node in ast.walk(method) if isinstance(node, ast.JoinedStr)
+                         for part in node.values}
+                for node in ast.walk(method):
+                    if isinstance(node, ast.JoinedStr) or (isinstance(node, ast.Constant) and id(node) not in parts
+                                                           and isinstance(node.value, str)):
+                        template = _path_template(node)
+                        if template.startswith('/'):
+                            method_paths.add(template)
+                    elif (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+                          and node.value.id == 'self' and node.attr not in HTTP_METHODS):
+                        method_calls.add(node.attr)
+
+    # the paths of the called methods, until nothing changes
+    changed = True
+    while changed:
+        changed = False
+        for method, called in calls.items():
+            before = len(paths[method])
+            for other in called & paths.keys():
+                paths[method] |= paths[other]
+            changed |= len(paths[method]) != before
+    return {method: method_paths for method, method_paths in paths.items() if method_paths}
+
+
+def affected_tests(selectors: Iterable[str], history: Mapping[str, TestDuration],
+                   method_paths: Mapping[str, set] = None) -> set:
+    """
+    Selects the tests which called the endpoints of changed client methods or Swagger paths in their last run.
+
+    Args:
+        selectors (Iterable[str]): Client methods (e.g. 'images_get' or 'TheCatAPIClient.images_get'), Swagger paths
+                                   (e.g. '/images/{image_id}') or paths with a method (e.g. 'GET /images/search').
+        history (Mapping[str, TestDuration]): The history loaded by `DurationStore.load`.
+        method_paths (Mapping[str, set], optional): The paths of the client methods, by default the ones found
+                                                    by `client_method_paths`.
+
+    Returns:
+        set[str]: The node IDs of the affected tests. Tests without history aren't included.
+
+    Raises:
+        ValueError: If a selector is neither a path nor a method of the clients.
+    """
+    paths, endpoints = set(), set()
+    for selector in selectors:
+        selector = selector.strip()
+        method, _, path = selector.rpartition(' ')
+        if path.startswith('/'):
+            if method:
+                endpoints.add(f'{method.upper()} {path}')
+            else:
+                paths.add(path)
+            continue
+        if method_paths is None:
+            method_paths = client_method_paths()
+        name = selector.rpartition('.')[2]
+        if name not in method_paths:
+            raise ValueError(f'{selector!r} is neither an endpoint path (e.g. /images/search) nor a method '
+                             f'of the clients requesting one ({", ".join(sorted(method_paths))})')
+        paths |= method_paths[name]
+
+    return {nodeid for nodeid, test in history.items()
+            if test.endpoints & endpoints or {endpoint.partition(' ')[2] for endpoint in test.endpoints} & paths}
+
+
+class DurationSchedulingPlugin:
+    """
+    Saves the durations, request counts and endpoints of the tests to the `--durations-db` history after every run
+    and uses the history to select the tests affected by `--affected-by` and to order and distribute the tests
+    with `--schedule-by-duration`.
+    """
+
+    def __init__(self, config, store: DurationStore):
+        self.config = config
+        self.store = store
+        self.history = store.load()
+        # with pytest-xdist the history is saved by the controller only, a soak run repeats the tests and its
+        # durations would distort the history
+        self.recording = not hasattr(config, 'workerinput') and not config.getoption('--soak-duration')
+        self.runs = {}
+        self.skipped = set()
+        self.deselected = 0
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        selectors = config.getoption('--affected-by')
+        if selectors:
+            try:
+                affected = affected_tests(selectors, self.history)
+            except ValueError as error:
+                raise pytest.UsageError(str(error))
+            selected = [item for item in items if item.nodeid in affected or item.nodeid not in self.history]
+            deselected = [item for item in items if item.nodeid not in affected and item.nodeid in self.history]
+            if deselected:
+                config.hook.pytest_deselected(items=deselected)
+                items[:] = selected
+                self.deselected = len(deselected)
+
+        if config.getoption('--schedule-by-duration'):
+            expected = expected_durations((item.nodeid for item in items), self.history)
+            order = {nodeid: index for index, nodeid in enumerate(longest_first(expected, expected))}
+            items.sort(key=lambda item: order[item.nodeid])
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_make_scheduler(self, config, log):
+        if not config.getoption('--schedule-by-duration') or config.getvalue('dist') != 'load':
+            return None
+        from utils.xdist_scheduling import DurationScheduling
+
+        return DurationScheduling(config, log, self.history)
+
+    def pytest_runtest_logreport(self, report):
+        if not self.recording:
+            return
+        if report.skipped:
+            self.skipped.add(report.nodeid)
+        run = self.runs.setdefault(report.nodeid, TestDuration(report.nodeid))
+        run.duration += report.duration
+        timings = RequestTimingsPlugin.report_timings(report)
+        run.requests += sum(endpoint.count for endpoint in timings.values())
+        run.endpoints = run.endpoints.union(timings)
+
+    def pytest_sessionfinish(self, session):
+        runs = [run for nodeid, run in self.runs.items() if nodeid not in self.skipped]
+        if runs and self.recording:
+            self.store.save(runs)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        runs = len(self.runs) - len(self.skipped)
+        if runs <= 0 and not self.deselected:
+            return
+        terminalreporter.write_sep('-', 'test durations')
+        if self.deselected:
+            terminalreporter.write_line(f'{self.deselected} tests not affected by '
+                                        f'{", ".join(self.config.getoption("--affected-by"))} deselected')
+        if runs > 0:
+            terminalreporter.write_line(f'durations of {runs} tests saved to {self.store.path}')
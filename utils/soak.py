@@ -0,0 +1,452 @@
+"""
+This file contains the monitor of soak runs, which repeat the tests for hours against the same clients.
+
+The latency and the errors of every endpoint are recorded in constant memory, in the `LatencyHistogram` of an
+`OperationStats` for the whole run and in one for the current sampling window. Every `interval` seconds a
+`SoakSample` stores the statistics of the window together with the resources of the process: the memory traced by
+`tracemalloc`, the open file descriptors and sockets, the connections of the pools of the watched sessions and the
+captures kept for the outcome of a test. When the timeline is full, adjacent samples are merged and the interval
+doubles, so a run of any length keeps at most `MAX_SAMPLES` samples. The growth of the resources from the first
+to the last sample and the allocations which grew the most point to leaks.
+
+4xx responses are expected by the negative tests, so only server errors (5xx), `429 Too Many Requests` and requests
+without a response are counted as errors.
+
+`SoakPlugin` repeats the tests of a pytest run and feeds the monitor.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING, Union
+
+import pytest
+
+from utils.capture import pending_count
+from utils.histogram import LatencyHistogram
+from utils.load import PERCENTILES, OperationStats
+from utils.log import create_logger
+from utils.timing import TimingRecord
+
+if TYPE_CHECKING:
+    import requests
+
+logger = create_logger('soak')
+
+MAX_SAMPLES = 240
+# the number of allocation sites reported with the largest growth
+TOP_ALLOCATIONS = 10
+# the gauges of a sample, compared between the first and the last sample
+RESOURCES = ('traced_memory', 'open_files', 'sockets', 'open_connections', 'pending_captures')
+# the frames of the allocations which are made by the measurement itself
+_IGNORED_ALLOCATIONS = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen *>'),
+                        tracemalloc.Filter(False, '<unknown>'))
+
+
+def open_file_descriptors() -> tuple:
+    """
+    Counts the open file descriptors of the process, on Linux only.
+
+    Returns:
+        tuple: The number of open file descriptors and the number of sockets among them, (None, None) if they
+               can't be listed.
+    """
+    try:
+        descriptors = os.listdir('/proc/self/fd')
+    except OSError:
+        return None, None
+    sockets = 0
+    for descriptor in descriptors:
+        try:
+            sockets += os.readlink(f'/proc/self/fd/{descriptor}').startswith('socket:')
+        except OSError:
+            # the descriptor of the listing itself is already closed
+            pass
+    return len(descriptors), sockets
+
+
+def pool_connections(session: 'requests.Session') -> tuple:
+    """
+    Counts the connections of the pools of the adapters a session is mounted with.
+
+    Returns:
+        tuple: The number of connections which are open (idle in a pool or in use) and the number of connections
+               opened since the pools were created.
+    """
+    open_connections = opened = 0
+    for adapter in {id(adapter): adapter for adapter in session.adapters.values()}.values():
+        pools = getattr(adapter, 'poolmanager', None)
+        if pools is None:
+            continue
+        for key in pools.pools.keys():
+            pool = pools.pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            # the queue of a pool holds its idle connections and a None for every connection which isn't open yet
+            idle = sum(connection is not None for connection in list(pool.pool.queue))
+            open_connections += idle + pool.pool.maxsize - pool.pool.qsize()
+            opened += pool.num_connections
+    return open_connections, opened
+
+
+class SoakSample:
+    """
+    The requests of a sampling window and the resources of the process at its end.
+
+    Attributes:
+        elapsed (float): The time since the start of the run at the end of the window, in seconds.
+        tests (int): The number of tests run since the start of the run.
+        latency (LatencyHistogram): The latencies of the requests of the window.
+        errors (int): The number of failed requests of the window.
+        traced_memory (int): The memory allocated by Python, in bytes.
+        traced_peak (int): The peak of the allocated memory since the previous sample, in bytes.
+        open_files (Optional[int]): The number of open file descriptors.
+        sockets (Optional[int]): The number of open sockets.
+        open_connections (int): The number of open connections of the watched sessions.
+        opened_connections (int): The number of connections opened by the watched sessions since their creation.
+        pending_captures (int): The number of captures kept by the 'on_failure' capture mode.
+    """
+
+    def __init__(self, elapsed: float, tests: int, latency: LatencyHistogram, errors: int):
+        self.elapsed = elapsed
+        self.tests = tests
+        self.latency = latency
+        self.errors = errors
+        self.traced_memory = self.traced_peak = 0
+        self.open_files = self.sockets = None
+        self.open_connections = self.opened_connections = 0
+        self.pending_captures = 0
+
+    def merge(self, later: 'SoakSample') -> 'SoakSample':
+        """
+        Merges the window of the following sample into this one, the resources are those at the end of the later one.
+
+        Args:
+            later (SoakSample): The following sample.
+
+        Returns:
+            SoakSample: This sample.
+        """
+        self.latency.merge(later.latency)
+        self.errors += later.errors
+        traced_peak = max(self.traced_peak, later.traced_peak)
+        for name in ('elapsed', 'tests', *RESOURCES, 'opened_connections'):
+            setattr(self, name, getattr(later, name))
+        self.traced_peak = traced_peak
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            'elapsed_s': self.elapsed,
+            'tests': self.tests,
+            'requests': self.latency.count,
+            'errors': self.errors,
+            'error_rate': self.errors / self.latency.count if self.latency.count else 0.0,
+            **{f'p{percentile}_ms': self.latency.percentile(percentile) for percentile in PERCENTILES},
+            'traced_memory_bytes': self.traced_memory,
+            'traced_peak_bytes': self.traced_peak,
+            'open_files': self.open_files,
+            'sockets': self.sockets,
+            'open_connections': self.open_connections,
+            'opened_connections': self.opened_connections,
+            'pending_captures': self.pending_captures,
+        }
+
+
+class SoakReport:
+    """
+    The results of a soak run.
+
+    Attributes:
+        duration (float): The wall time of the run in seconds.
+        iterations (int): The number of runs of the selected tests.
+        tests (int): The number of test runs.
+        failed (int): The number of failed test runs.
+        operations (dict[str, OperationStats]): The statistics of the whole run by endpoint.
+        samples (list[SoakSample]): The timeline of the run.
+        top_allocations (list[str]): The allocation sites with the largest growth from the first to the last sample.
+    """
+
+    def __init__(self, duration: float, iterations: int, tests: int, failed: int, operations: dict,
+                 samples: [SoakSample], top_allocations: [str]):
+        self.duration = duration
+        self.iterations = iterations
+        self.tests = tests
+        self.failed = failed
+        self.operations = operations
+        self.samples = samples
+        self.top_allocations = top_allocations
+
+    def growth(self) -> dict:
+        """
+        Returns:
+            dict: The change of every resource from the first to the last sample and the change per hour,
+                  None for the resources which aren't measured.
+        """
+        growth = {}
+        if len(self.samples) < 2:
+            return growth
+        first, last = self.samples[0], self.samples[-1]
+        hours = (last.elapsed - first.elapsed) / 3600
+        for name in RESOURCES:
+            if getattr(first, name) is None or getattr(last, name) is None:
+                growth[name] = None
+                continue
+            change = getattr(last, name) - getattr(first, name)
+            growth[name] = {'first': getattr(first, name), 'last': getattr(last, name), 'change': change,
+                            'change_per_hour': change / hours if hours else None}
+        return growth
+
+    def to_dict(self) -> dict:
+        total = OperationStats()
+        for stats in self.operations.values():
+            total.merge(stats)
+        return {
+            'duration_s': self.duration,
+            'iterations': self.iterations,
+            'tests': self.tests,
+            'failed_tests': self.failed,
+            'total': {name: value for name, value in total.to_dict().items() if name != 'histogram'},
+            'operations': {name: {key: value for key, value in stats.to_dict().items() if key != 'histogram'}
+                           for name, stats in sorted(self.operations.items())},
+            'growth': self.growth(),
+            'top_allocations': self.top_allocations,
+            'samples': [sample.to_dict() for sample in self.samples],
+        }
+
+    def write_json(self, path: Union[Path, str]):
+        """
+        Writes the report to a JSON file, the parent directories are created if needed.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+
+    def format(self) -> str:
+        """
+        Returns:
+            str: The summary of the run: the latency and errors of every endpoint and the growth of the resources.
+        """
+        lines = [f'{self.iterations} iterations, {self.tests} tests ({self.failed} failed) in {self.duration:.0f}s']
+        columns = ''.join(f'{f"p{p}":>10}' for p in PERCENTILES)
+        lines.append(f'{"endpoint":<32}{"requests":>10}{"errors":>10}{columns}')
+        for name, stats in sorted(self.operations.items()):
+            values = ''.join(f'{stats.latency.percentile(p) or 0:>8.1f}ms' for p in PERCENTILES)
+            lines.append(f'{name:<32}{stats.requests:>10}{stats.error_rate:>10.2%}{values}')
+        for name, growth in self.growth().items():
+            if growth is None:
+                continue
+            # the memory is shown in KiB
+            scale, unit = (1024, ' KiB') if name == 'traced_memory' else (1, '')
+            first, last, change = (growth[key] / scale for key in ('first', 'last', 'change'))
+            per_hour = '' if growth['change_per_hour'] is None else f', {growth["change_per_hour"] / scale:+.1f}/h'
+            lines.append(f'{name}: {first:.0f} -> {last:.0f}{unit} ({change:+.0f}{per_hour})')
+        if self.top_allocations:
+            lines.append('largest allocation growth:')
+            lines.extend(f'  {allocation}' for allocation in self.top_allocations)
+        return '\n'.join(lines)
+
+
+class SoakMonitor:
+    """
+    A timing hook which records the requests of a soak run and samples the resources of the process.
+
+    Attributes:
+        interval (float): The time between two samples in seconds, it doubles whenever the timeline is full.
+        sessions (list[requests.Session]): The sessions whose connections are counted.
+        operations (dict[str, OperationStats]): The statistics of the whole run by endpoint.
+        samples (list[SoakSample]): The timeline of the run.
+        iterations (int): The number of runs of the selected tests.
+        tests (int): The number of test runs.
+    """
+
+    def __init__(self, interval: float = 60, max_samples: int = MAX_SAMPLES, trace_frames: int = 1):
+        """
+        Args:
+            interval (float, optional): The time between two samples in seconds.
+            max_samples (int, optional): The maximum number of samples, at least 2.
+            trace_frames (int, optional): The number of frames `tracemalloc` keeps of every allocation.
+
+        Raises:
+            ValueError: If the interval isn't positive or there are less than 2 samples.
+        """
+        if interval <= 0:
+            raise ValueError(f'Invalid interval {interval}, it has to be positive')
+        if max_samples < 2:
+            raise ValueError(f'Invalid max_samples {max_samples}, it has to be at least 2')
+
+        self.interval = interval
+        self.max_samples = max_samples
+        self.trace_frames = trace_frames
+        self.sessions = []
+        self.operations = {}
+        self.samples = []
+        self.iterations = 0
+        self.tests = 0
+        self._window = LatencyHistogram()
+        self._window_errors = 0
+        self._lock = threading.Lock()
+        self._started = None
+        self._next_sample = None
+        self._started_tracing = False
+        self._first_snapshot = None
+
+    def watch(self, session: 'requests.Session'):
+        """
+        Counts the connections of a session in the samples.
+        """
+        self.sessions.append(session)
+
+    def __call__(self, record: TimingRecord):
+        error = record.status is None or record.status >= 500 or record.status == 429
+        with self._lock:
+            stats = self.operations.setdefault(record.key, OperationStats())
+            stats.latency.record(record.total)
+            self._window.record(record.total)
+            if error:
+                stats.errors[str(record.status or 'no response')] += 1
+                self._window_errors += 1
+
+    def start(self):
+        """
+        Starts the run and `tracemalloc`, unless it's already tracing.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self._started_tracing = True
+        self._started = time.monotonic()
+        self._next_sample = self._started + self.interval
+        logger.info('Soak run started, sampling every %ss', self.interval)
+
+    def test_finished(self):
+        """
+        Counts a test run and takes a sample if the interval has passed.
+        """
+        self.tests += 1
+        if time.monotonic() >= self._next_sample:
+            self.sample()
+
+    def sample(self) -> SoakSample:
+        """
+        Closes the current window and records the resources of the process.
+
+        Returns:
+            SoakSample: The sample.
+        """
+        now = time.monotonic()
+        with self._lock:
+            window, errors = self._window, self._window_errors
+            self._window, self._window_errors = LatencyHistogram(), 0
+        sample = SoakSample(now - self._started, self.tests, window, errors)
+        sample.traced_memory, sample.traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        sample.open_files, sample.sockets = open_file_descriptors()
+        for session in self.sessions:
+            open_connections, opened = pool_connections(session)
+            sample.open_connections += open_connections
+            sample.opened_connections += opened
+        sample.pending_captures = pending_count()
+        if self._first_snapshot is None:
+            # the allocations of the first window (imports, caches, the first connections) are the baseline
+            self._first_snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_ALLOCATIONS)
+
+        self.samples.append(sample)
+        if len(self.samples) >= self.max_samples:
+            self.samples = [pair[0].merge(pair[1]) if len(pair) == 2 else pair[0]
+                            for pair in (self.samples[i:i + 2] for i in range(0, len(self.samples), 2))]
+            self.interval *= 2
+        self._next_sample = now + self.interval
+        logger.debug('Soak sample %s', sample.to_dict())
+        return sample
+
+    def stop(self, failed: int = 0) -> SoakReport:
+        """
+        Takes the last sample, compares the allocations with the first sample and stops `tracemalloc` if it was
+        started by the monitor.
+
+        Args:
+            failed (int, optional): The number of failed test runs.
+
+        Returns:
+            SoakReport: The results of the run.
+        """
+        self.sample()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_ALLOCATIONS)
+        top_allocations = [f'{stat.traceback}: {stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks)'
+                           for stat in snapshot.compare_to(self._first_snapshot, 'lineno')[:TOP_ALLOCATIONS]
+                           if stat.size_diff > 0]
+        self._first_snapshot = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        with self._lock:
+            operations = dict(self.operations)
+        return SoakReport(time.monotonic() - self._started, self.iterations, self.tests, failed, operations,
+                          self.samples, top_allocations)
+
+
+class SoakPlugin:
+    """
+    A pytest plugin which repeats the selected tests until the soak duration elapses and reports the run of
+    a `SoakMonitor`. The session-scoped fixtures, e.g. the clients, are set up once and live for the whole run,
+    the others are set up again in every iteration.
+
+    The tests are repeated by extending `session.items`, which the run loop of pytest iterates. The next test of
+    a test is taken from the list before the test runs, so the next iteration is queued once the second to last
+    queued test is finished, and the fixtures shared by the last and the first test stay set up. A single test
+    is queued twice from the start, so it runs at least twice.
+    """
+
+    def __init__(self, monitor: SoakMonitor, duration: float, report_path: Union[Path, str]):
+        """
+        Args:
+            monitor (SoakMonitor): The monitor of the run.
+            duration (float): The duration of the run in seconds, the last iteration starts before it elapses.
+            report_path (Path | str): The JSON file the report of the run is written to.
+        """
+        self.monitor = monitor
+        self.duration = duration
+        self.report_path = report_path
+        self.report = None
+        self._items = []
+        self._deadline = None
+        self._finished = 0
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_collection_modifyitems(self, items):
+        yield
+        # the tests which are left after the other plugins selected and ordered them are repeated
+        self._items = list(items)
+        if len(items) == 1:
+            items.extend(self._items)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtestloop(self, session):
+        if session.config.option.collectonly or not self._items:
+            yield
+            return
+        self._deadline = time.monotonic() + self.duration
+        self.monitor.start()
+        yield
+        self.report = self.monitor.stop(session.testsfailed)
+        self.report.write_json(self.report_path)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        if self._finished % len(self._items) == 0:
+            self.monitor.iterations += 1
+        yield
+        self._finished += 1
+        self.monitor.test_finished()
+        items = item.session.items
+        if self._finished == len(items) - 1 and time.monotonic() < self._deadline:
+            items.extend(self._items)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.report is None:
+            return
+        terminalreporter.write_sep('-', 'soak run')
+        for line in self.report.format().splitlines():
+            terminalreporter.write_line(line)
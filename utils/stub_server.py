@@ -0,0 +1,546 @@
+"""
+This file contains a local stub of TheCatAPI generated from the Swagger specification (`test_data/swagger.yaml`).
+
+The stub takes the routes, query parameter schemas, response schemas and error descriptions from the specification
+and serves schema-conformant data from a generated, deterministic image catalogue. The image files themselves are
+served under `/cdn/images/`, with the format and dimensions of their catalogue entries. Latency and errors can be
+injected to simulate a slow or unreliable API. Like the real API, the stub compresses its JSON and text responses
+with gzip or deflate, as negotiated by the `Accept-Encoding` header of the request.
+
+Usage:
+    python -m utils.stub_server [--port 8080] [--latency 0.05] [--error-rate 0.1] [--encodings gzip,deflate]
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import string
+import struct
+import threading
+import time
+import zlib
+from gzip import compress as gzip_compress
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from utils.log import create_logger
+from utils.swagger import load_swagger
+
+logger = create_logger('stub-server')
+
+# the image which is used by the tests as a valid one
+KNOWN_IMAGE_ID = 'D2J3R7sUq'
+MAX_LIMIT = 25
+# the rules of the query parameters which the real API enforces, but which aren't a part of the Swagger
+# specification, e.g. `limit=-1` is rejected with 400
+SEARCH_PARAMETER_RULES = {'page': {'minimum': 0}, 'limit': {'minimum': 1}}
+BREEDS = [
+    {'id': 'abys', 'name': 'Abyssinian'},
+    {'id': 'beng', 'name': 'Bengal'},
+    {'id': 'mcoo', 'name': 'Maine Coon'},
+    {'id': 'sphy', 'name': 'Sphynx'},
+]
+CATEGORIES = [{'id': 1, 'name': 'hats'}, {'id': 5, 'name': 'boxes'}]
+MIME_TYPE_EXTENSIONS = {'jpg': 'jpg', 'png': 'png', 'gifs': 'gif'}
+EXTENSION_CONTENT_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif'}
+# the content codings the stub can compress its responses with, in the order of preference
+ENCODERS = {'gzip': lambda payload: gzip_compress(payload, mtime=0), 'deflate': zlib.compress}
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def render_image(extension: str, width: int, height: int, padding: int = 0) -> bytes:
+    """
+    Renders an image file of the given format and dimensions.
+
+    PNG and GIF files are complete, blank images. JPEG files consist of the headers only (SOI, JFIF, SOF0 with
+    the dimensions and EOI), which is enough for header based checks, but they can't be decoded.
+
+    Args:
+        extension (str): The format of the image, 'jpg', 'png' or 'gif'.
+        width (int): The width of the image in pixels.
+        height (int): The height of the image in pixels.
+        padding (int, optional): The size of a comment added to the file, to simulate the size of real images.
+
+    Returns:
+        bytes: The content of the image file.
+    """
+    comment = b' ' * padding
+    if extension == 'png':
+        rows = (b'\x00' * (width + 1)) * height  # grayscale rows, each one with the 'None' filter type
+        return (b'\x89PNG\r\n\x1a\n'
+                + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+                + (_png_chunk(b'tEXt', b'Comment\x00' + comment) if padding else b'')
+                + _png_chunk(b'IDAT', zlib.compress(rows))
+                + _png_chunk(b'IEND', b''))
+    if extension == 'gif':
+        # comment extension of 255 bytes long sub-blocks
+        comment_blocks = b''.join(bytes([len(comment[i:i + 255])]) + comment[i:i + 255]
+                                  for i in range(0, len(comment), 255))
+        return (b'GIF89a' + struct.pack('<HHBBB', width, height, 0x80, 0, 0) + b'\x00\x00\x00\xff\xff\xff'
+                + (b'\x21\xfe' + comment_blocks + b'\x00' if padding else b'')
+                # a single blank pixel, the rest of the logical screen has the background color
+                + b'\x2c' + struct.pack('<HHHHB', 0, 0, 1, 1, 0) + b'\x02\x02\x44\x01\x00'
+                + b'\x3b')
+    if extension == 'jpg':
+        segments = [b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00']
+        # comment segments of at most 65533 bytes
+        segments += [b'\xff\xfe' + struct.pack('>H', len(comment[i:i + 65533]) + 2) + comment[i:i + 65533]
+                     for i in range(0, len(comment), 65533)]
+        segments.append(b'\xff\xc0' + struct.pack('>HBHHB', 17, 8, height, width, 3)
+                        + b'\x01\x22\x00\x02\x11\x01\x03\x11\x01')
+        return b'\xff\xd8' + b''.join(segments) + b'\xff\xd9'
+    raise ValueError(f'Unsupported image format {extension}')
+
+
+class InvalidParameter(Exception):
+    """
+    Raised when a request parameter doesn't conform to its schema.
+    """
+
+
+def generate_instance(schema: dict, rng: random.Random, overrides: dict = None):
+    """
+    Generates data which conforms to a schema.
+
+    Args:
+        schema (dict): The schema of the data.
+        rng (random.Random): The random generator used for the values.
+        overrides (dict, optional): Values for the properties of an object schema, used instead of generated ones.
+
+    Returns:
+        The generated data.
+    """
+    schema_type = schema.get('type')
+    if 'enum' in schema:
+        return rng.choice(schema['enum'])
+    if schema_type == 'object':
+        overrides = overrides or {}
+        return {
+            name: overrides[name] if name in overrides else generate_instance(prop_schema, rng)
+            for name, prop_schema in schema.get('properties', {}).items()
+        }
+    if schema_type == 'array':
+        items = schema.get('items')
+        return [generate_instance(items, rng) for _ in range(rng.randint(1, 3))] if items else []
+    if schema_type == 'integer':
+        return rng.randint(schema.get('minimum', 0), schema.get('maximum', 2000))
+    if schema_type == 'number':
+        return rng.uniform(schema.get('minimum', 0), schema.get('maximum', 2000))
+    if schema_type == 'boolean':
+        return rng.random() < 0.5
+    return ''.join(rng.choices(string.ascii_letters + string.digits, k=9))
+
+
+def project(data: dict, schema: dict) -> dict:
+    """
+    Keeps only the properties of the data which are described by an object schema.
+    """
+    properties = schema.get('properties', {})
+    return {name: value for name, value in data.items() if name in properties}
+
+
+def parse_parameter(value: str, schema: dict):
+    """
+    Converts a query parameter into the type of its schema and validates it.
+
+    Args:
+        value (str): The raw value of the parameter.
+        schema (dict): The schema of the parameter.
+
+    Returns:
+        The converted value.
+
+    Raises:
+        InvalidParameter: If the value doesn't conform to the schema.
+    """
+    schema_type = schema.get('type')
+    if schema_type == 'integer':
+        try:
+            parsed = int(value)
+        except ValueError:
+            raise InvalidParameter(f'{value} is not an integer')
+        if parsed < schema.get('minimum', parsed) or parsed > schema.get('maximum', parsed):
+            raise InvalidParameter(f'{value} is out of range')
+        return parsed
+    if schema_type == 'boolean':
+        lowered = value.lower()
+        if lowered not in ('true', 'false', '1', '0'):
+            raise InvalidParameter(f'{value} is not a boolean')
+        return lowered in ('true', '1')
+    if 'enum' in schema:
+        # enums of query parameters can be passed as comma separated lists, e.g. mime_types=jpg,png
+        parts = [part.strip() for part in value.split(',')]
+        if any(part not in schema['enum'] for part in parts):
+            raise InvalidParameter(f'{value} is not one of {schema["enum"]}')
+        return parts if len(parts) > 1 else parts[0]
+    return value
+
+
+class Route:
+    """
+    A route of the stub built from a path of the Swagger specification.
+
+    Attributes:
+        path (str): The path template, e.g. '/images/{image_id}'.
+        operation (dict): The Swagger operation object of the GET method.
+    """
+
+    def __init__(self, path: str, operation: dict):
+        self.path = path
+        self.operation = operation
+        self._pattern = re.compile('^' + re.sub(r'\{(\w+)}', r'(?P<\1>[^/]+)', path) + '$')
+        self.query_parameters = {
+            parameter['name']: parameter.get('schema', {})
+            for parameter in operation.get('parameters', [])
+            if parameter.get('in') == 'query'
+        }
+
+    def match(self, path: str) -> Optional[dict]:
+        """
+        Matches a request path against the route.
+
+        Returns:
+            Optional[dict]: The path parameters if the path matches the route, otherwise None.
+        """
+        match = self._pattern.match(path)
+        return {name: unquote(value) for name, value in match.groupdict().items()} if match else None
+
+    def response_description(self, status: str) -> str:
+        """
+        Returns:
+            str: The description of a response status of the route.
+        """
+        return self.operation['responses'][status]['description']
+
+    def response_schema(self, status: str = '200') -> dict:
+        """
+        Returns:
+            dict: The JSON schema of a response status of the route.
+        """
+        return self.operation['responses'][status]['content']['application/json']['schema']
+
+
+class TheCatAPIStub:
+    """
+    A local HTTP stub of TheCatAPI, which serves `/images/search` and `/images/{image_id}`.
+
+    Attributes:
+        latency (float): The delay in seconds added to every response.
+        error_rate (float): The share of requests answered with `error_status`.
+        error_status (int): The status code of the injected errors.
+        error_headers (dict): The headers of the injected errors, e.g. {'Retry-After': '1'} for 429.
+        encodings (tuple[str]): The content codings the responses are compressed with if the client accepts them,
+                                empty to serve uncompressed responses only.
+    """
+
+    def __init__(self, swagger: dict = None, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500, error_headers: dict = None,
+                 catalogue_size: int = 100, seed: int = 0, encodings: tuple = tuple(ENCODERS)):
+        """
+        Initializes a TheCatAPIStub instance and generates the image catalogue.
+
+        Args:
+            swagger (dict, optional): The dereferenced Swagger specification, loaded from 'test_data' by default.
+            host (str, optional): The host to listen on.
+            port (int, optional): The port to listen on, 0 picks a free port.
+            latency (float, optional): The delay in seconds added to every response.
+            error_rate (float, optional): The share of requests answered with `error_status`.
+            error_status (int, optional): The status code of the injected errors.
+            error_headers (dict, optional): The headers of the injected errors.
+            catalogue_size (int, optional): The number of images served by the stub.
+            seed (int, optional): The seed of the generated data.
+            encodings (tuple[str], optional): The content codings of the responses, gzip and deflate by default.
+
+        Raises:
+            ValueError: If a content coding isn't supported.
+        """
+        self.swagger = swagger if swagger is not None else load_swagger()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_headers = error_headers or {}
+        unsupported = set(encodings) - ENCODERS.keys()
+        if unsupported:
+            raise ValueError(f'Unsupported encodings {", ".join(sorted(unsupported))}, '
+                             f'the stub supports {", ".join(ENCODERS)}')
+        self.encodings = tuple(encodings)
+        self._rng = random.Random(seed)
+        self._server = None
+        self._thread = None
+
+        paths = self.swagger['paths']
+        self.search_route = Route('/images/search', paths['/images/search']['get'])
+        for name, rules in SEARCH_PARAMETER_RULES.items():
+            self.search_route.query_parameters[name] = {**self.search_route.query_parameters[name], **rules}
+        self.get_route = Route('/images/{image_id}', paths['/images/{image_id}']['get'])
+
+        # `/images/search` answers with one of [authorized, not authorized] schemas
+        self._authorized_schema, self._not_authorized_schema = [
+            schema['items'] for schema in self.search_route.response_schema()['oneOf']
+        ]
+        self._image_schema = self.get_route.response_schema()
+        self.images = self._generate_catalogue(catalogue_size)
+        self._images_by_id = {image['id']: image for image in self.images}
+
+    def _generate_catalogue(self, size: int) -> list:
+        """
+        Generates the images served by the stub, every second one has breeds.
+        """
+        images = []
+        for i in range(size):
+            image_id = KNOWN_IMAGE_ID if i == 0 else generate_instance({'type': 'string'}, self._rng)
+            has_breeds = i % 2 == 0
+            mime_type = self._rng.choice(list(MIME_TYPE_EXTENSIONS))
+            images.append(generate_instance(self._image_schema, self._rng, overrides={
+                'id': image_id,
+                'url': f'https://cdn2.thecatapi.com/images/{image_id}.{MIME_TYPE_EXTENSIONS[mime_type]}',
+                'width': self._rng.randint(200, 1600),
+                'height': self._rng.randint(200, 1600),
+                'breeds': [self._rng.choice(BREEDS)] if has_breeds else [],
+                'categories': [self._rng.choice(CATEGORIES)] if self._rng.random() < 0.2 else [],
+            }) | {'mime_type': mime_type})
+        return images
+
+    @property
+    def base_url(self) -> str:
+        """
+        Returns:
+            str: The base URL of the running stub, to be used instead of `THE_CAT_API_BASE_URL`.
+        """
+        return f'http://{self.host}:{self.port}/v1'
+
+    @property
+    def files_url(self) -> str:
+        """
+        Returns:
+            str: The URL of the image files of the running stub, it replaces the CDN of TheCatAPI.
+        """
+        return f'http://{self.host}:{self.port}/cdn/images'
+
+    def start(self) -> 'TheCatAPIStub':
+        """
+        Starts serving requests in a background thread.
+
+        Returns:
+            TheCatAPIStub: The stub itself.
+        """
+        self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        for image in self.images:
+            image['url'] = f'{self.files_url}/{image["id"]}.{MIME_TYPE_EXTENSIONS[image["mime_type"]]}'
+        self._thread = threading.Thread(target=self._server.serve_forever, name='the-cat-api-stub', daemon=True)
+        self._thread.start()
+        logger.info('TheCatAPI stub is listening on %s', self.base_url)
+        return self
+
+    def stop(self):
+        """
+        Stops the stub and closes its socket.
+        """
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, method: str, path: str, query: dict, headers: dict) -> tuple:
+        """
+        Handles a request to the stub.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path relative to the base URL.
+            query (dict): The query parameters, every parameter is a list of values.
+            headers (dict): The request headers.
+
+        Returns:
+            tuple: The status code, the response headers and the response body.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return self.error_status, dict(self.error_headers), f'Injected error {self.error_status}'
+        if method != 'GET':
+            return 405, {}, 'Method not allowed'
+
+        if path.startswith('/cdn/images/'):
+            return self._image_file(path[len('/cdn/images/'):])
+        authorized = bool(headers.get('x-api-key'))
+        query = {name: values[-1] for name, values in query.items()}
+        if self.search_route.match(path) is not None:
+            return self._images_search(query, authorized)
+        path_parameters = self.get_route.match(path)
+        if path_parameters is not None:
+            return self._images_get(path_parameters['image_id'])
+        return 404, {}, 'Not found'
+
+    def _images_search(self, query: dict, authorized: bool) -> tuple:
+        """
+        Serves `/images/search` with filtering, ordering and pagination.
+        """
+        try:
+            params = {
+                name: parse_parameter(value, self.search_route.query_parameters[name])
+                for name, value in query.items() if name in self.search_route.query_parameters
+            }
+        except InvalidParameter:
+            return 400, {}, self.search_route.response_description('400')
+
+        images = self.images
+        if 'has_breeds' in params:
+            images = [image for image in images if bool(image['breeds']) == params['has_breeds']]
+        if 'mime_types' in params:
+            mime_types = params['mime_types'] if isinstance(params['mime_types'], list) else [params['mime_types']]
+            images = [image for image in images if image['mime_type'] in mime_types]
+
+        limit = min(params.get('limit', 1), MAX_LIMIT)
+        page = params.get('page', 0)
+        order = params.get('order', 'RANDOM')
+        if order == 'RANDOM':
+            page_images = self._rng.sample(images, min(limit, len(images)))
+        else:
+            ordered = images if order == 'ASC' else images[::-1]
+            page_images = ordered[page * limit:(page + 1) * limit]
+
+        item_schema = self._authorized_schema if authorized else self._not_authorized_schema
+        headers = {
+            'Pagination-Count': str(len(images)),
+            'Pagination-Page': str(page),
+            'Pagination-Limit': str(limit),
+        }
+        return 200, headers, [project(image, item_schema) for image in page_images]
+
+    def _images_get(self, image_id: str) -> tuple:
+        """
+        Serves `/images/{image_id}`.
+        """
+        image = self._images_by_id.get(image_id)
+        if image is None:
+            return 400, {}, self.get_route.response_description('400').format(image_id=image_id)
+        return 200, {}, project(image, self._image_schema)
+
+    def _image_file(self, name: str) -> tuple:
+        """
+        Serves the file of an image, e.g. `/cdn/images/D2J3R7sUq.jpg`.
+        """
+        image_id, _, extension = name.partition('.')
+        image = self._images_by_id.get(image_id)
+        if image is None or MIME_TYPE_EXTENSIONS[image['mime_type']] != extension:
+            return 404, {}, 'Not found'
+        # about the size of a compressed photo, so the downloads aren't trivially small
+        content = render_image(extension, image['width'], image['height'], image['width'] * image['height'] // 16)
+        return 200, {'Content-Type': EXTENSION_CONTENT_TYPES[extension]}, content
+
+
+def negotiate_encoding(accept_encoding: Optional[str], encodings: tuple) -> Optional[str]:
+    """
+    Chooses the content coding of a response by the `Accept-Encoding` header of the request.
+
+    Args:
+        accept_encoding (Optional[str]): The header, e.g. 'gzip, deflate;q=0.5' or 'identity'.
+        encodings (tuple[str]): The content codings the response can be compressed with, in the order of preference.
+
+    Returns:
+        Optional[str]: The accepted coding with the highest weight (the first one of `encodings` for equal weights),
+                       None to send the response uncompressed.
+    """
+    weights = {}
+    for coding in (accept_encoding or '').split(','):
+        name, _, parameters = coding.partition(';')
+        weight = 1.0
+        if parameters.strip().startswith('q='):
+            try:
+                weight = float(parameters.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    candidates = [(weights.get(encoding, weights.get('*', 0.0)), -i, encoding)
+                  for i, encoding in enumerate(encodings)]
+    weight, _, encoding = max(candidates, default=(0.0, 0, None))
+    return encoding if weight > 0 else None
+
+
+def _make_handler(stub: TheCatAPIStub) -> type:
+    """
+    Creates a request handler class bound to a stub.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        # keeps connections alive, so the stub behaves like the real API for pooled sessions
+        protocol_version = 'HTTP/1.1'
+        # the headers and the body are written separately, with Nagle's algorithm the body of every response on
+        # a kept alive connection waits for the delayed ACK of the headers (~40 ms)
+        disable_nagle_algorithm = True
+
+        def _handle(self):
+            url = urlsplit(self.path)
+            path = url.path[len('/v1'):] if url.path.startswith('/v1') else url.path
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length:
+                self.rfile.read(content_length)
+
+            status, headers, body = stub.handle(self.command, path, parse_qs(url.query), self.headers)
+            if isinstance(body, bytes):
+                payload, content_type = body, headers.pop('Content-Type')
+            elif isinstance(body, str):
+                payload, content_type = body.encode(), 'text/plain; charset=utf-8'
+            else:
+                payload, content_type = json.dumps(body).encode(), 'application/json; charset=utf-8'
+                headers['ETag'] = f'"{hashlib.sha1(payload).hexdigest()}"'
+                if self.headers.get('If-None-Match') == headers['ETag']:
+                    status, payload = 304, b''
+            # the image files are compressed already
+            encoding = negotiate_encoding(self.headers.get('Accept-Encoding'), stub.encodings) \
+                if payload and not isinstance(body, bytes) else None
+            if encoding:
+                payload = ENCODERS[encoding](payload)
+                headers['Content-Encoding'] = encoding
+            if stub.encodings and not isinstance(body, bytes):
+                headers['Vary'] = 'Accept-Encoding'
+
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='delay in seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=500, help='status code of the injected errors')
+    parser.add_argument('--encodings', default=','.join(ENCODERS),
+                        help='comma separated content codings of the responses, empty for uncompressed responses')
+    args = parser.parse_args()
+
+    stub = TheCatAPIStub(host=args.host, port=args.port, latency=args.latency, error_rate=args.error_rate,
+                         error_status=args.error_status,
+                         encodings=tuple(filter(None, args.encodings.split(',')))).start()
+    print(f'TheCatAPI stub is listening on {stub.base_url}, press Ctrl+C to stop')
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
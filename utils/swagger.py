@@ -0,0 +1,149 @@
+"""
+This file contains utility functions for loading the Swagger specification.
+
+Parsing the YAML file and resolving all `$ref` occurrences is done once per version of the file: the dereferenced
+specification is cached on disk, keyed by the hash of the file content. The cached specification is split by
+schema path (e.g. `components/schemas/ImageAuthorizedResponse`) and every part is unpickled only when it's accessed.
+`yaml` and `jsonref` are imported only when the file is parsed, i.e. not at all when the cache is up to date.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Optional
+
+from utils.config import SWAGGER_CACHE_DIR
+from utils.log import create_logger
+
+logger = create_logger('swagger')
+
+SWAGGER_PATH = Path(__file__).parent.parent / 'test_data' / 'swagger.yaml'
+# number of key levels the cached specification is split by, e.g. components -> schemas -> <schema>
+SPLIT_DEPTH = 3
+
+
+class _Packed:
+    """
+    A pickled part of the specification.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+class LazyMapping(Mapping):
+    """
+    A read-only mapping whose values are unpickled on the first access.
+    """
+    __slots__ = ('_items', '__weakref__')
+
+    def __init__(self, items: dict):
+        self._items = items
+
+    def __getitem__(self, key):
+        value = self._items[key]
+        if isinstance(value, _Packed):
+            value = pickle.loads(value.data)
+            self._items[key] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f'LazyMapping({list(self._items)})'
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A plain copy of the mapping with all parts unpickled.
+        """
+        return {key: value.to_dict() if isinstance(value, LazyMapping) else value for key, value in self.items()}
+
+
+def _pack(node, depth: int):
+    """
+    Splits the dicts of the first `depth` levels into lazy mappings and pickles everything below them.
+    """
+    if isinstance(node, dict) and depth > 0:
+        return LazyMapping({key: _pack(value, depth - 1) for key, value in node.items()})
+    return _Packed(pickle.dumps(node, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def parse_swagger(path: Path = SWAGGER_PATH, proxies: bool = True) -> dict:
+    """
+    Loads the Swagger YAML file and replaces all `$ref` occurrences with actual references using
+    the `jsonref.replace_refs` method.
+
+    Args:
+        path (Path, optional): The path to the Swagger file, by default the one located in the 'test_data' folder.
+        proxies (bool, optional): If True, references are replaced by lazy proxies, otherwise by the referenced
+                                  objects themselves.
+
+    Returns:
+        dict: The Swagger data with all references replaced.
+    """
+    import yaml
+    from jsonref import replace_refs
+
+    with open(path, 'r') as f:
+        swagger_data = yaml.safe_load(f)
+    # replaces all $ref occurrences with actual references
+    return replace_refs(swagger_data, proxies=proxies, lazy_load=proxies)
+
+
+def swagger_cache_file(path: Path = SWAGGER_PATH, cache_dir: Optional[str] = SWAGGER_CACHE_DIR) -> Optional[Path]:
+    """
+    Returns:
+        Optional[Path]: The cache file of the current content of the Swagger file, None if caching is disabled.
+    """
+    if not cache_dir:
+        return None
+    digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    return Path(cache_dir) / f'{Path(path).stem}-{digest[:16]}.pickle'
+
+
+def load_swagger(path: Path = SWAGGER_PATH, cache_dir: Optional[str] = SWAGGER_CACHE_DIR) -> Mapping:
+    """
+    Loads the dereferenced Swagger specification from the cache or, if the file has changed since it was cached,
+    parses and caches it.
+
+    Args:
+        path (Path, optional): The path to the Swagger file, by default the one located in the 'test_data' folder.
+        cache_dir (str, optional): The cache directory, by default `SWAGGER_CACHE_DIR`. An empty value disables
+                                   caching and returns the specification with lazy jsonref proxies.
+
+    Returns:
+        Mapping: The Swagger data with all references replaced.
+    """
+    cache_file = swagger_cache_file(path, cache_dir)
+    if cache_file is None:
+        return parse_swagger(path)
+
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning('Ignoring the broken Swagger cache %s: %s', cache_file, e)
+
+    swagger = _pack(parse_swagger(path, proxies=False), SPLIT_DEPTH)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    # written to a temporary file first, so parallel sessions never read a partially written cache
+    fd, tmp_path = tempfile.mkstemp(dir=cache_file.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(swagger, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    logger.info('Cached the dereferenced Swagger specification in %s', cache_file)
+    return swagger
@@ -0,0 +1,319 @@
+"""
+This file contains the per-request timing instrumentation of API clients.
+
+Every request sent by `APIClient` produces a `TimingRecord` with the time spent in each phase:
+
+* connect - DNS resolution and the TCP handshake of a new connection (None if a pooled connection was reused),
+* tls - the TLS handshake of a new HTTPS connection,
+* ttfb - sending the request and waiting for the response headers (server time),
+* download - reading the response body,
+* client - everything else spent in the client: the response cache, logging, Allure captures, rate limiting and
+  retries.
+
+Besides the phases, a record counts the bytes of the response body on the wire and once decoded, together with
+the time spent decompressing it (part of the download phase), so the bandwidth saved by a `Content-Encoding` can be
+weighed against its CPU cost.
+
+The records are passed to the timing hooks of the client, e.g. a `TimingCollector`, which aggregates them per
+endpoint. The connection phases are measured by the connection classes of `utils.adapters.TimingHTTPAdapter` and
+handed over to the record of the request sent by the current thread. This module imports neither the HTTP stack
+nor pytest, so the records can be used by the clients without loading either of them. The timings of test runs are
+reported by `utils.timing_plugin`.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Optional
+
+from utils.histogram import LatencyHistogram
+
+if TYPE_CHECKING:
+    import requests
+
+PHASES = ('connect', 'tls', 'ttfb', 'download', 'client')
+
+# the record of the request which is being sent by the current thread
+_current = threading.local()
+
+
+class TimingRecord:
+    """
+    The timings of a single request, all durations are in seconds.
+
+    Attributes:
+        method (str): The HTTP method.
+        endpoint (str): The API endpoint, relative to the base URL.
+        status (Optional[int]): The status code, None if no response was received.
+        source (str): 'network', 'cache' for responses served from the response cache or 'replay' for responses
+                      replayed from a cassette.
+        attempts (int): The number of sent attempts, more than 1 if the request was retried.
+        reused (bool): True if the last attempt was sent over a pooled connection.
+        connect (Optional[float]): DNS resolution and TCP handshake of the last attempt.
+        tls (Optional[float]): TLS handshake of the last attempt.
+        ttfb (Optional[float]): Time from sending the last attempt to receiving the response headers.
+        download (Optional[float]): Time of reading the response body.
+        client (float): Time spent in the client besides the phases above.
+        total (float): Time of the whole `_send_request` call.
+        request_bytes (int): The size of the request line, headers and body of the last attempt.
+        response_bytes (int): The size of the status line, headers and body (as sent on the wire) of the response.
+        encoding (Optional[str]): The `Content-Encoding` of the response, 'identity' if it isn't encoded.
+        body_bytes (int): The size of the response body on the wire, 0 if it wasn't received from the network.
+        decoded_bytes (int): The size of the decoded response body.
+        decode (float): Time of decompressing the response body.
+    """
+    __slots__ = ('method', 'endpoint', 'status', 'source', 'attempts', 'reused', 'connect', 'tls', 'ttfb',
+                 'download', 'client', 'total', 'request_bytes', 'response_bytes', 'encoding', 'body_bytes',
+                 'decoded_bytes', 'decode', '_started', '_headers_at')
+
+    def __init__(self, method: str, endpoint: str):
+        self.method = method.upper()
+        self.endpoint = endpoint
+        self.status = None
+        self.source = 'network'
+        self.attempts = 0
+        self.reused = True
+        self.connect = self.tls = self.ttfb = self.download = None
+        self.client = self.total = 0.0
+        self.request_bytes = self.response_bytes = 0
+        self.encoding = None
+        self.body_bytes = self.decoded_bytes = 0
+        self.decode = 0.0
+        self._started = time.perf_counter()
+        self._headers_at = None
+
+    def start_attempt(self):
+        """
+        Resets the phases of the previous attempt before the request is sent again.
+        """
+        self.attempts += 1
+        self.reused = True
+        self.connect = self.tls = self.ttfb = self.download = None
+        self.decode = 0.0
+        self._headers_at = None
+
+    def body_read(self, resp: 'requests.Response'):
+        """
+        Marks the end of the body download of the last attempt, unless the body of the response is streamed
+        (`stream=True`) and is read by the caller later.
+        """
+        if self._headers_at is not None and getattr(resp, '_content_consumed', True):
+            self.download = time.perf_counter() - self._headers_at
+
+    def finish(self, resp: Optional['requests.Response']):
+        """
+        Completes the record once the response is returned to the caller. A streamed body which hasn't been read
+        yet isn't downloaded for the record, only the bytes received so far are counted.
+
+        Args:
+            resp (Optional[requests.Response]): The response, None if the request failed.
+        """
+        self.total = time.perf_counter() - self._started
+        self.client = max(self.total - sum(getattr(self, phase) or 0.0 for phase in PHASES[:-1]), 0.0)
+        if resp is None:
+            return
+        self.status = resp.status_code
+        self.encoding = resp.headers.get('Content-Encoding', 'identity').lower()
+        consumed = getattr(resp, '_content_consumed', True)
+        self.decoded_bytes = len(resp.content or b'') if consumed else 0
+        if self.source == 'network' and self._headers_at is None:
+            # the response didn't come from the network adapter, e.g. it was replayed from a cassette
+            self.source = 'replay'
+        if self.source == 'network':
+            tell = getattr(resp.raw, 'tell', None)
+            body = self.body_bytes = tell() if tell is not None else self.decoded_bytes
+            self.response_bytes = (len(f'HTTP/1.1 {resp.status_code} {resp.reason}\r\n\r\n')
+                                   + sum(len(name) + len(value) + 4 for name, value in resp.headers.items()) + body)
+
+    @property
+    def key(self) -> str:
+        """
+        Returns:
+            str: The name the request is aggregated under, e.g. 'GET /images/search'.
+        """
+        return f'{self.method} {self.endpoint}'
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A JSON serializable representation with the durations in milliseconds.
+        """
+        record = {name: getattr(self, name) for name in ('method', 'endpoint', 'status', 'source', 'attempts',
+                                                         'reused', 'request_bytes', 'response_bytes', 'encoding',
+                                                         'body_bytes', 'decoded_bytes')}
+        for phase in (*PHASES, 'decode', 'total'):
+            value = getattr(self, phase)
+            record[f'{phase}_ms'] = None if value is None else value * 1000
+        return record
+
+
+# a callable which receives the record of every request sent by a client
+TimingHook = Callable[[TimingRecord], None]
+
+
+def current_record() -> Optional[TimingRecord]:
+    """
+    Returns:
+        Optional[TimingRecord]: The record of the request which is being sent by the current thread, if any.
+    """
+    return getattr(_current, 'record', None)
+
+
+@contextmanager
+def timed_request(record: Optional[TimingRecord]):
+    """
+    Makes a record the target of the connection timings measured in the current thread.
+
+    Args:
+        record (Optional[TimingRecord]): The record of the request which is about to be sent, None disables
+                                         the timings.
+    """
+    previous = getattr(_current, 'record', None)
+    _current.record = record
+    try:
+        yield record
+    finally:
+        _current.record = previous
+
+
+class EndpointTimings:
+    """
+    The aggregated timings of the requests to an endpoint.
+
+    Attributes:
+        latency (LatencyHistogram): The total times of the requests.
+        phases (dict[str, float]): The summed time of every phase in seconds.
+        sources (dict[str, int]): The number of requests by source ('network', 'cache' or 'replay').
+        new_connections (int): The number of network requests which opened a new connection.
+        retries (int): The number of retried attempts.
+        request_bytes (int): The summed size of the requests.
+        response_bytes (int): The summed size of the responses.
+        encodings (dict[str, int]): The number of network responses by `Content-Encoding`.
+        body_bytes (int): The summed size of the response bodies on the wire.
+        decoded_bytes (int): The summed size of the decoded response bodies of the network responses.
+        decode (float): The summed time of decompressing the response bodies in seconds.
+    """
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.sources = {}
+        self.new_connections = 0
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.encodings = {}
+        self.body_bytes = 0
+        self.decoded_bytes = 0
+        self.decode = 0.0
+
+    @property
+    def count(self) -> int:
+        return self.latency.count
+
+    def add(self, record: TimingRecord):
+        """
+        Adds a timing record.
+        """
+        self.latency.record(record.total)
+        for phase in PHASES:
+            self.phases[phase] += getattr(record, phase) or 0.0
+        self.sources[record.source] = self.sources.get(record.source, 0) + 1
+        if record.source == 'network' and not record.reused:
+            self.new_connections += 1
+        self.retries += max(record.attempts - 1, 0)
+        self.request_bytes += record.request_bytes
+        self.response_bytes += record.response_bytes
+        if record.source == 'network' and record.encoding is not None:
+            self.encodings[record.encoding] = self.encodings.get(record.encoding, 0) + 1
+            self.body_bytes += record.body_bytes
+            self.decoded_bytes += record.decoded_bytes
+            self.decode += record.decode
+
+    def merge(self, other: 'EndpointTimings') -> 'EndpointTimings':
+        """
+        Adds the timings of another aggregate, e.g. those of another test or process.
+
+        Returns:
+            EndpointTimings: This aggregate.
+        """
+        self.latency.merge(other.latency)
+        for phase in PHASES:
+            self.phases[phase] += other.phases[phase]
+        for source, count in other.sources.items():
+            self.sources[source] = self.sources.get(source, 0) + count
+        self.new_connections += other.new_connections
+        self.retries += other.retries
+        self.request_bytes += other.request_bytes
+        self.response_bytes += other.response_bytes
+        for encoding, count in other.encodings.items():
+            self.encodings[encoding] = self.encodings.get(encoding, 0) + count
+        self.body_bytes += other.body_bytes
+        self.decoded_bytes += other.decoded_bytes
+        self.decode += other.decode
+        return self
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A JSON serializable representation with the latency percentiles and the phase times
+                  in milliseconds, which can be loaded by `from_dict`.
+        """
+        network = self.sources.get('network', 0)
+        return {
+            'requests': self.count,
+            'sources': dict(self.sources),
+            'connection_reuse_rate': 1 - self.new_connections / network if network else None,
+            'retries': self.retries,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'encodings': dict(self.encodings),
+            'body_bytes': self.body_bytes,
+            'decoded_bytes': self.decoded_bytes,
+            'compression_ratio': self.decoded_bytes / self.body_bytes if self.body_bytes else None,
+            'decode_ms': self.decode * 1000,
+            'phases_ms': {phase: seconds * 1000 for phase, seconds in self.phases.items()},
+            'latency': self.latency.summary(),
+            'new_connections': self.new_connections,
+            'histogram': self.latency.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'EndpointTimings':
+        timings = cls()
+        timings.latency = LatencyHistogram.from_dict(data['histogram'])
+        timings.phases = {phase: ms / 1000 for phase, ms in data['phases_ms'].items()}
+        timings.sources = dict(data['sources'])
+        timings.new_connections = data['new_connections']
+        timings.retries = data['retries']
+        timings.request_bytes = data['request_bytes']
+        timings.response_bytes = data['response_bytes']
+        timings.encodings = dict(data['encodings'])
+        timings.body_bytes = data['body_bytes']
+        timings.decoded_bytes = data['decoded_bytes']
+        timings.decode = data['decode_ms'] / 1000
+        return timings
+
+
+class TimingCollector:
+    """
+    A timing hook which aggregates the records per endpoint until they are taken, e.g. at the end of every test.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: TimingRecord):
+        with self._lock:
+            self._endpoints.setdefault(record.key, EndpointTimings()).add(record)
+
+    def take(self) -> dict:
+        """
+        Returns the aggregated timings and starts a new aggregation.
+
+        Returns:
+            dict[str, EndpointTimings]: The timings by endpoint (e.g. 'GET /images/search').
+        """
+        with self._lock:
+            endpoints, self._endpoints = self._endpoints, {}
+        return endpoints
@@ -0,0 +1,141 @@
+"""
+This file contains the report of the request timings of a test run.
+
+`RequestTimingsPlugin` collects the `EndpointTimings` attached to the test reports (also those of pytest-xdist
+workers) into a `TimingsReport` and writes it to the terminal, the `--timings-report` file and the pytest-html
+report. It's kept apart from `utils.timing`, so the clients don't import pytest.
+"""
+import html
+import json
+from pathlib import Path
+from typing import Union
+
+import pytest
+
+from utils.timing import PHASES, EndpointTimings
+
+
+class TimingsReport:
+    """
+    The request timings of a test run, aggregated per test and per endpoint.
+
+    Attributes:
+        tests (dict[str, dict[str, EndpointTimings]]): The timings by test node ID and endpoint.
+        endpoints (dict[str, EndpointTimings]): The timings of all tests by endpoint.
+    """
+
+    def __init__(self):
+        self.tests = {}
+        self.endpoints = {}
+
+    def add(self, nodeid: str, endpoints: dict):
+        """
+        Adds the timings of (a phase of) a test.
+
+        Args:
+            nodeid (str): The node ID of the test.
+            endpoints (dict[str, EndpointTimings]): The timings by endpoint.
+        """
+        test = self.tests.setdefault(nodeid, {})
+        for endpoint, timings in endpoints.items():
+            test.setdefault(endpoint, EndpointTimings()).merge(timings)
+            self.endpoints.setdefault(endpoint, EndpointTimings()).merge(timings)
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A JSON serializable representation of the report.
+        """
+        return {
+            'endpoints': {endpoint: timings.to_dict() for endpoint, timings in sorted(self.endpoints.items())},
+            'tests': {nodeid: {endpoint: timings.to_dict() for endpoint, timings in sorted(endpoints.items())}
+                      for nodeid, endpoints in self.tests.items()},
+        }
+
+    def write_json(self, path: Union[Path, str]):
+        """
+        Writes the report to a JSON file, the parent directories are created if needed.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+
+
+class RequestTimingsPlugin:
+    """
+    Aggregates the request timings attached to the test reports (also those of pytest-xdist workers) per test
+    and per endpoint, writes them to the `--timings-report` file and adds them to the pytest-html report.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.report = TimingsReport()
+
+    @staticmethod
+    def report_timings(report) -> dict:
+        """
+        Returns:
+            dict[str, EndpointTimings]: The request timings attached to a test report, by endpoint, empty for
+                                        the reports of the collection, which have no user properties.
+        """
+        for name, value in getattr(report, 'user_properties', ()):
+            if name == 'request_timings':
+                return {endpoint: EndpointTimings.from_dict(timings) for endpoint, timings in value.items()}
+        return {}
+
+    def pytest_runtest_logreport(self, report):
+        timings = self.report_timings(report)
+        if timings:
+            self.report.add(report.nodeid, timings)
+
+    def pytest_sessionfinish(self, session):
+        path = self.config.getoption('--timings-report')
+        # with pytest-xdist the report is written by the controller only
+        if path and self.report.endpoints and not hasattr(self.config, 'workerinput'):
+            self.report.write_json(path)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.report.endpoints:
+            return
+        terminalreporter.write_sep('-', 'request timings')
+        for endpoint, timings in sorted(self.report.endpoints.items()):
+            latency = timings.latency
+            line = (f'{endpoint}: {timings.count} requests, p50 {latency.percentile(50):.1f} ms, '
+                    f'p95 {latency.percentile(95):.1f} ms, max {latency.max / 1000:.1f} ms')
+            if timings.body_bytes:
+                line += (f', {timings.body_bytes} B on the wire ({timings.decoded_bytes} B decoded, '
+                         f'{", ".join(sorted(timings.encodings))}), decode {timings.decode * 1000:.1f} ms')
+            terminalreporter.write_line(line)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_html_results_table_header(self, cells):
+        cells.insert(3, '<th class="sortable" data-column-type="requests">Requests</th>')
+        cells.insert(4, '<th class="sortable" data-column-type="httpTime">HTTP time</th>')
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_html_results_table_row(self, report, cells):
+        timings = self.report_timings(report).values()
+        total_ms = sum(endpoint.latency.total for endpoint in timings) / 1000
+        cells.insert(3, f'<td class="col-requests">{sum(endpoint.count for endpoint in timings)}</td>')
+        cells.insert(4, f'<td class="col-httpTime">{total_ms:.0f} ms</td>')
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_html_results_summary(self, prefix, summary, postfix, session):
+        if not self.report.endpoints:
+            return
+        header = ''.join(f'<th>{name}</th>' for name in ('Endpoint', 'Requests', 'p50', 'p95', 'p99',
+                                                         *(f'avg {phase}' for phase in PHASES),
+                                                         'Connection reuse', 'Sent', 'Received', 'Decoded',
+                                                         'Decode time'))
+        rows = []
+        for endpoint, timings in sorted(self.report.endpoints.items()):
+            data = timings.to_dict()
+            reuse = data['connection_reuse_rate']
+            cells = [html.escape(endpoint), timings.count,
+                     *(f'{timings.latency.percentile(p):.1f} ms' for p in (50, 95, 99)),
+                     *(f'{data["phases_ms"][phase] / timings.count:.1f} ms' for phase in PHASES),
+                     '-' if reuse is None else f'{reuse:.0%}',
+                     f'{timings.request_bytes} B', f'{timings.response_bytes} B', f'{timings.decoded_bytes} B',
+                     f'{timings.decode * 1000:.1f} ms']
+            rows.append('<tr>' + ''.join(f'<td>{cell}</td>' for cell in cells) + '</tr>')
+        postfix.append(f'<h2>Request timings</h2><table><tr>{header}</tr>{"".join(rows)}</table>')
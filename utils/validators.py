@@ -1,35 +1,486 @@
 """
 This file contains utility functions for different validations.
+
+`jsonschema` is imported only when the first schema is compiled, so importing this module (e.g. by a test module
+while collecting the tests) doesn't load the validation stack.
+
+List responses can be validated item by item (`validate_response_items`): every item is checked against the item
+schema of the list, all errors are collected with the index of the item and their JSON path, and large lists can be
+split across worker processes. Items which were valid once aren't validated again, e.g. when a test is rerun.
 """
+import hashlib
+import json
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+import allure
 import pytest
-from jsonschema import validate, ValidationError
 
+from utils.config import SCHEMA_VALIDATOR_BACKEND, SCHEMA_VALIDATOR_CACHE_SIZE, SCHEMA_VALIDATOR_PROCESSES
+
+BACKENDS = ('jsonschema', 'fastjsonschema')
+# the number of items remembered as valid by default, by backend: the code-generated validators of fastjsonschema
+# validate an item faster than its digest is computed
+VALID_ITEMS_SIZES = {'jsonschema': 10000, 'fastjsonschema': 0}
+# lists shorter than this are validated in the current process, starting the workers would take longer
+PROCESS_MIN_ITEMS = 200
+# the maximum number of errors listed in the failure message, all of them are attached to the Allure report
+MAX_REPORTED_ERRORS = 10
+
+
+class ItemError:
+    """
+    A schema error of an item of a list response.
+
+    Attributes:
+        index (Optional[int]): The index of the item in the list, None if the response itself isn't a list.
+        path (str): The JSON path of the invalid value, e.g. '$[3].breeds[0].id'.
+        message (str): The message of the validator.
+        validator (str): The failed schema keyword, e.g. 'type' or 'required'.
+    """
+    __slots__ = ('index', 'path', 'message', 'validator')
+
+    def __init__(self, index: Optional[int], path: str, message: str, validator: str):
+        self.index = index
+        self.path = path
+        self.message = message
+        self.validator = validator
+
+    @classmethod
+    def from_validation_error(cls, error, index: Optional[int] = None) -> 'ItemError':
+        """
+        Args:
+            error (ValidationError): The error of the item.
+            index (Optional[int], optional): The index of the item in the list.
+
+        Returns:
+            ItemError: The error with the JSON path of the value within the list.
+        """
+        path = '$' if index is None else f'$[{index}]'
+        for key in error.absolute_path:
+            path += f'[{key}]' if isinstance(key, int) else f'.{key}'
+        return cls(index, path, error.message, str(error.validator))
 
-def validate_response(response_data: dict, schema_path_keys: [str], swagger: dict):
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: A JSON serializable representation of the error.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'{self.path}: {self.message}'
+
+
+class ValidatorRegistry:
+    """
+    A registry of compiled validators for the schemas of a Swagger specification.
+
+    Every schema path is resolved and compiled only once, the schema itself is checked at compile time instead of
+    on every validation. Compiled validators are kept in a bounded LRU cache.
+
+    Attributes:
+        swagger (Mapping): The Swagger specification the schemas are taken from.
+        backend (str): The validator backend, either 'jsonschema' or 'fastjsonschema' (code-generated validators).
+        maxsize (int): The maximum number of compiled validators kept in the cache.
+        valid_items_size (int): The maximum number of items remembered as valid by `validate_items`, 0 to validate
+                                every item on every call.
+    """
+
+    def __init__(self, swagger: Mapping, backend: str = 'jsonschema', maxsize: int = 128,
+                 valid_items_size: Optional[int] = None):
+        """
+        Initializes a ValidatorRegistry instance.
+
+        Args:
+            swagger (Mapping): The Swagger specification the schemas are taken from.
+            backend (str, optional): The validator backend, either 'jsonschema' or 'fastjsonschema'.
+            maxsize (int, optional): The maximum number of compiled validators kept in the cache.
+            valid_items_size (int, optional): The maximum number of items remembered as valid, by default the one
+                                              of the backend in `VALID_ITEMS_SIZES`.
+
+        Raises:
+            ValueError: If an unknown backend is specified.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown validator backend {backend}, expected one of {BACKENDS}')
+
+        self.swagger = swagger
+        self.backend = backend
+        self.maxsize = maxsize
+        self.valid_items_size = VALID_ITEMS_SIZES[backend] if valid_items_size is None else valid_items_size
+        self._validators = OrderedDict()
+        # digests of the items which conformed to an item schema, by the path of the schema
+        self._valid_items = OrderedDict()
+
+    def get_schema(self, schema_path_keys: [str]) -> dict:
+        """
+        Retrieves a schema from the Swagger specification by its path.
+
+        Args:
+            schema_path_keys (list[str]): A list of keys used to navigate through the Swagger specification.
+
+        Returns:
+            dict: The schema.
+
+        Raises:
+            ValueError: If the provided schema path is invalid or doesn't exist in the Swagger specification.
+        """
+        schema = self.swagger
+        for key in schema_path_keys:
+            try:
+                schema = schema[key]
+            except KeyError:
+                raise ValueError(f'Invalid path {schema_path_keys} for the schema')
+        return schema
+
+    def get(self, schema_path_keys: [str]) -> Callable[[Any], None]:
+        """
+        Returns the compiled validator for a schema path, compiling it on the first use.
+
+        Args:
+            schema_path_keys (list[str]): A list of keys used to navigate through the Swagger specification.
+
+        Returns:
+            Callable: A function which raises `ValidationError` if the passed data doesn't conform to the schema.
+
+        Raises:
+            ValueError: If the provided schema path is invalid or doesn't exist in the Swagger specification.
+        """
+        return self._cached(('validate', *schema_path_keys),
+                            lambda: self._compile(self.get_schema(schema_path_keys)))
+
+    def get_collector(self, schema_path_keys: [str]) -> Callable[[Any], list]:
+        """
+        Returns the compiled collector of the errors for a schema path, compiling it on the first use.
+
+        Args:
+            schema_path_keys (list[str]): A list of keys used to navigate through the Swagger specification.
+
+        Returns:
+            Callable: A function which returns the `ValidationError`s of the passed data, empty if it conforms to
+                      the schema. The fastjsonschema backend stops at the first error, so it returns one at most.
+
+        Raises:
+            ValueError: If the provided schema path is invalid or doesn't exist in the Swagger specification.
+        """
+        return self._cached(('collect', *schema_path_keys),
+                            lambda: self._compile(self.get_schema(schema_path_keys), collect=True))
+
+    def _cached(self, key: tuple, compile_: Callable[[], Callable]) -> Callable:
+        try:
+            self._validators.move_to_end(key)
+            return self._validators[key]
+        except KeyError:
+            pass
+
+        validator = compile_()
+        self._validators[key] = validator
+        if len(self._validators) > self.maxsize:
+            self._validators.popitem(last=False)
+        return validator
+
+    def _compile(self, schema: dict, collect: bool = False) -> Callable:
+        """
+        Compiles a schema with the configured backend.
+
+        Lazy jsonref proxies are resolved on every access, so a plain copy of the schema is compiled.
+
+        Args:
+            schema (dict): The schema to compile.
+            collect (bool, optional): Whether to compile a collector of all errors instead of a validator.
+
+        Returns:
+            Callable: A function which raises `ValidationError` if the passed data doesn't conform to the schema
+                      or, if `collect` is set, which returns the list of the errors.
+        """
+        schema = _to_plain(schema)
+        if self.backend == 'fastjsonschema':
+            validate = self._compile_fastjsonschema(schema)
+            return _first_error(validate) if collect else validate
+
+        from jsonschema.exceptions import best_match
+        from jsonschema.validators import validator_for
+
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        validator = cls(schema)
+
+        if collect:
+            return lambda instance: list(validator.iter_errors(instance))
+
+        def validate(instance):
+            error = best_match(validator.iter_errors(instance))
+            if error is not None:
+                raise error
+
+        return validate
+
+    @staticmethod
+    def _compile_fastjsonschema(schema: dict) -> Callable[[Any], None]:
+        """
+        Compiles a schema into generated Python code with the optional `fastjsonschema` package.
+
+        Args:
+            schema (dict): The schema to compile.
+
+        Returns:
+            Callable: A function which raises `ValidationError` if the passed data doesn't conform to the schema.
+
+        Raises:
+            ImportError: If `fastjsonschema` isn't installed.
+        """
+        try:
+            import fastjsonschema
+        except ImportError:
+            raise ImportError('The \'fastjsonschema\' validator backend requires `pip install fastjsonschema`')
+        from jsonschema import ValidationError
+
+        compiled = fastjsonschema.compile(schema)
+
+        def validate(instance):
+            try:
+                compiled(instance)
+            except fastjsonschema.JsonSchemaValueException as e:
+                path = [int(key) if key.isdigit() else key for key in e.path[1:]]
+                raise ValidationError(e.message, path=path, instance=e.value, validator=e.rule)
+
+        return validate
+
+    def validate(self, instance, schema_path_keys: [str]):
+        """
+        Validates the data against a schema from the Swagger specification.
+
+        Args:
+            instance: The data to validate.
+            schema_path_keys (list[str]): A list of keys used to navigate through the Swagger specification.
+
+        Raises:
+            ValueError: If the provided schema path is invalid or doesn't exist in the Swagger specification.
+            ValidationError: If the data does not conform to the schema.
+        """
+        self.get(schema_path_keys)(instance)
+
+    def validate_items(self, items: list, schema_path_keys: [str], processes: int = 0) -> [ItemError]:
+        """
+        Validates a list against a list schema and every item of it against the item schema, and collects all errors.
+
+        The list itself is validated against the schema without its `items`, e.g. its `type`, `minItems`,
+        `maxItems` and `uniqueItems`. If it's a list, its items are validated one by one. Items which conformed
+        to the item schema before aren't validated again. The remaining ones are validated in `processes` worker
+        processes if there are at least `PROCESS_MIN_ITEMS` of them, otherwise in this process.
+
+        Args:
+            items (list): The list to validate, e.g. a response body, which may also be something else than a list.
+            schema_path_keys (list[str]): The path of the list schema, e.g. `['components', 'schemas',
+                                          'ImagesSearchAuthorizedResponse']`.
+            processes (int, optional): The number of worker processes, 0 or 1 to validate in this process.
+
+        Returns:
+            list[ItemError]: The errors of the list (without an index) followed by the errors of the items in
+                             the order of the items, empty if the list and all its items are valid.
+
+        Raises:
+            ValueError: If the provided schema path is invalid or isn't a schema of a list.
+        """
+        schema, item_path = self.get_schema(schema_path_keys), [*schema_path_keys, 'items']
+        if not isinstance(schema, Mapping) or 'items' not in schema:
+            raise ValueError(f'The schema {schema_path_keys} isn\'t a schema of a list')
+        collect_list = self._cached(('collect-list', *schema_path_keys), lambda: self._compile(
+            {keyword: value for keyword, value in schema.items() if keyword != 'items'}, collect=True))
+        list_errors = [ItemError.from_validation_error(error) for error in collect_list(items)]
+        if not isinstance(items, list):
+            return list_errors
+
+        valid = self._valid_items.setdefault(tuple(item_path), OrderedDict())
+        digests = [_digest(item) for item in items] if self.valid_items_size else [None] * len(items)
+        pending = [index for index, digest in enumerate(digests) if digest not in valid]
+
+        if processes > 1 and len(pending) >= PROCESS_MIN_ITEMS:
+            chunks = [pending[start::processes] for start in range(processes)]
+            with ProcessPoolExecutor(processes, initializer=_init_worker,
+                                     initargs=(_to_plain(self.get_schema(item_path)), self.backend)) as executor:
+                results = executor.map(_collect_chunk, [[(index, items[index]) for index in chunk]
+                                                        for chunk in chunks])
+                errors = [error for chunk_errors in results for error in chunk_errors]
+            errors.sort(key=lambda error: error.index)
+        else:
+            errors = _collect_errors(self.get_collector(item_path), [(index, items[index]) for index in pending])
+
+        if self.valid_items_size:
+            invalid = {error.index for error in errors}
+            for index in pending:
+                if index not in invalid:
+                    valid[digests[index]] = None
+            while len(valid) > self.valid_items_size:
+                valid.popitem(last=False)
+        return list_errors + errors
+
+    def cache_clear(self):
+        """
+        Removes all compiled validators and the items remembered as valid from the cache.
+        """
+        self._validators.clear()
+        self._valid_items.clear()
+
+
+def _first_error(validate: Callable[[Any], None]) -> Callable[[Any], list]:
+    """
+    Turns a validator which raises the first error into a collector of the errors.
+    """
+    from jsonschema import ValidationError
+
+    def collect(instance):
+        try:
+            validate(instance)
+        except ValidationError as e:
+            return [e]
+        return []
+
+    return collect
+
+
+def _digest(item) -> bytes:
+    """
+    Returns:
+        bytes: The digest of the canonical JSON of an item, equal items have equal digests.
+    """
+    canonical = json.dumps(item, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+
+
+def _collect_errors(collect: Callable[[Any], list], items: [tuple]) -> [ItemError]:
+    """
+    Args:
+        collect (Callable): The collector of the errors of the item schema.
+        items (list[tuple]): The items to validate with their indexes in the list.
+
+    Returns:
+        list[ItemError]: The errors of the items.
+    """
+    return [ItemError.from_validation_error(error, index) for index, item in items for error in collect(item)]
+
+
+# the collector of the errors of a worker process, compiled once by `_init_worker`
+_worker_collector = None
+
+
+def _init_worker(schema: dict, backend: str):
+    global _worker_collector
+    _worker_collector = ValidatorRegistry({'schema': schema}, backend).get_collector(['schema'])
+
+
+def _collect_chunk(items: [tuple]) -> [ItemError]:
+    return _collect_errors(_worker_collector, items)
+
+
+def _to_plain(data):
+    """
+    Recursively copies (dereferenced) data into plain dicts and lists.
+    """
+    if isinstance(data, Mapping):
+        return {key: _to_plain(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_to_plain(value) for value in data]
+    return data
+
+
+# the registries by the `id` of their specification. A registry refers to its specification through a weak proxy
+# and is dropped once the specification is garbage collected, so the `id` can't be reused by another specification
+# while the registry is kept. Specifications which can't be weakly referenced (plain dicts) are kept with their
+# registry for the lifetime of the process.
+_registries = {}
+
+
+def get_validator_registry(swagger: Mapping) -> ValidatorRegistry:
+    """
+    Returns the registry of compiled validators for a Swagger specification, creating it on the first use.
+
+    The backend and the cache size are taken from `SCHEMA_VALIDATOR_BACKEND` and `SCHEMA_VALIDATOR_CACHE_SIZE`.
+
+    Args:
+        swagger (Mapping): The Swagger specification.
+
+    Returns:
+        ValidatorRegistry: The registry for the specification.
+    """
+    key = id(swagger)
+    try:
+        return _registries[key]
+    except KeyError:
+        pass
+    try:
+        spec = weakref.proxy(swagger)
+        weakref.finalize(swagger, _registries.pop, key, None)
+    except TypeError:
+        spec = swagger
+    registry = _registries[key] = ValidatorRegistry(spec, SCHEMA_VALIDATOR_BACKEND, SCHEMA_VALIDATOR_CACHE_SIZE)
+    return registry
+
+
+def validate_response(response_data: dict, schema_path_keys: [str], swagger: Mapping):
     """
     Validates the response data against a schema from the Swagger specification.
 
-    This function traverses the Swagger specification using the provided schema path keys,
-    retrieves the corresponding schema, and validates the response data against it.
+    This function retrieves the compiled validator for the provided schema path keys from the registry of
+    the Swagger specification and validates the response data with it. The schema is compiled only once per
+    session.
 
     Args:
         response_data (dict): The response data to validate.
         schema_path_keys (list[str]): A list of keys used to navigate through the Swagger
                                       specification to locate the desired schema.
-        swagger (dict): The Swagger specification (the full API documentation in JSON/YAML format).
+        swagger (Mapping): The Swagger specification (the full API documentation in JSON/YAML format).
 
     Raises:
         ValueError: If the provided schema path is invalid or doesn't exist in the Swagger specification.
         pytest.fail: If the response data does not conform to the schema.
     """
-    schema = swagger
-    for key in schema_path_keys:
-        try:
-            schema = schema[key]
-        except KeyError:
-            raise ValueError(f'Invalid path {schema_path_keys} for the schema')
+    from jsonschema import ValidationError
 
     try:
-        validate(instance=response_data, schema=schema)
+        get_validator_registry(swagger).validate(response_data, schema_path_keys)
     except ValidationError as e:
         pytest.fail(f'Invalid response: {e.message}')
+
+
+def validate_response_items(response_data: list, schema_path_keys: [str], swagger: Mapping,
+                            processes: int = SCHEMA_VALIDATOR_PROCESSES):
+    """
+    Validates the items of a list response against the item schema of a list schema from the Swagger specification.
+
+    Unlike `validate_response`, every item is validated and all errors are collected with the index of the item and
+    their JSON path, together with the errors of the list itself (e.g. `type` or `maxItems`). They are reported
+    at once: attached to an Allure step of the whole response and listed in the failure message.
+
+    Args:
+        response_data (list): The response data to validate.
+        schema_path_keys (list[str]): A list of keys used to navigate through the Swagger
+                                      specification to locate the schema of the list.
+        swagger (Mapping): The Swagger specification (the full API documentation in JSON/YAML format).
+        processes (int, optional): The number of worker processes for long lists, configured by
+                                   `SCHEMA_VALIDATOR_PROCESSES` (0 by default, validates in the test process).
+
+    Raises:
+        ValueError: If the provided schema path is invalid or isn't a schema of a list.
+        pytest.fail: If the response data does not conform to the schema.
+    """
+    registry = get_validator_registry(swagger)
+    with allure.step(f'Validate the items of the response against {schema_path_keys[-1]}'):
+        errors = registry.validate_items(response_data, schema_path_keys, processes)
+        if not errors:
+            return
+        allure.attach(json.dumps([error.to_dict() for error in errors], indent=2), 'Schema errors',
+                      allure.attachment_type.JSON)
+
+    invalid_items = {error.index for error in errors} - {None}
+    places = ['the response'] if any(error.index is None for error in errors) else []
+    if invalid_items:
+        places.append(f'{len(invalid_items)} of {len(response_data)} items')
+    lines = [f'{error.path}: {error.message}' for error in errors[:MAX_REPORTED_ERRORS]]
+    if len(errors) > MAX_REPORTED_ERRORS:
+        lines.append(f'... and {len(errors) - MAX_REPORTED_ERRORS} more')
+    pytest.fail(f'Invalid response: {len(errors)} schema error(s) in {" and ".join(places)}\n' + '\n'.join(lines))
@@ -0,0 +1,71 @@
+"""
+This file contains a pytest-xdist scheduler which distributes the tests by their expected durations.
+"""
+from typing import Mapping
+
+import pytest
+from xdist.scheduler import LoadScheduling
+
+from utils.scheduling import TestDuration, expected_durations
+
+# the number of tests queued on a worker: the running one, the next one, which a worker has to know before it
+# runs a test, and one more so the worker doesn't wait for the next test after every test
+QUEUE_SIZE = 3
+
+
+class DurationScheduling(LoadScheduling):
+    """
+    Distributes the tests like `--dist load`, but longest first and a few at a time.
+
+    The pending tests are ordered by their expected durations from the history of the previous runs, longest first.
+    Every worker gets only `QUEUE_SIZE` tests at first and one more whenever it finishes one, so the next longest
+    test goes to the worker which becomes free first. Slow tests are started at the beginning of the run and the
+    short ones fill the gaps at its end, instead of a worker getting a chunk of slow tests while the others are idle.
+    """
+
+    def __init__(self, config: pytest.Config, log, history: Mapping[str, TestDuration]):
+        """
+        Args:
+            config (pytest.Config): The pytest config.
+            log: The logger of pytest-xdist.
+            history (Mapping[str, TestDuration]): The history of the test durations.
+        """
+        super(DurationScheduling, self).__init__(config, log)
+        self.history = history
+
+    def check_schedule(self, node, duration: float = 0):
+        if node.shutting_down:
+            return
+        if self.pending:
+            self._send_tests(node, QUEUE_SIZE - len(self.node2pending[node]))
+        else:
+            node.shutdown()
+        self.log('num items waiting for node:', len(self.pending))
+
+    def schedule(self):
+        assert self.collection_is_completed
+        # the initial distribution already happened, new nodes get their tests
+        if self.collection is not None:
+            for node in self.nodes:
+                self.check_schedule(node)
+            return
+        if not self._check_nodes_have_same_collection():
+            self.log('**Different tests collected, aborting run**')
+            return
+
+        self.collection = next(iter(self.node2collection.values()))
+        expected = expected_durations(self.collection, self.history)
+        durations = [expected[nodeid] for nodeid in self.collection]
+        self.pending[:] = sorted(range(len(self.collection)), key=lambda index: -durations[index])
+
+        # the longest tests go to the worker with the least queued time
+        queued = dict.fromkeys(self.nodes, 0.0)
+        while self.pending and queued:
+            node = min(queued, key=queued.get)
+            queued[node] += durations[self.pending[0]]
+            self._send_tests(node, 1)
+            if len(self.node2pending[node]) >= QUEUE_SIZE:
+                del queued[node]
+        if not self.pending:
+            for node in self.nodes:
+                node.shutdown()